@@ -1,7 +1,7 @@
 #!/bin/bash
 
 sudo apt-get update
-sudo apt-get install -y python3-serial python3-bluez
+sudo apt-get install -y python3-serial python3-bluez python3-numpy
 
 sudo cp mie-printer.service /etc/systemd/system/
 sudo systemctl daemon-reload
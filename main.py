@@ -1,10 +1,11 @@
 import os
 import sys
 from pathlib import Path
-from octo_src.utils import ConfigManager, setup_logger
+from octo_src.utils import ConfigManager, setup_logger, metrics, PrometheusFileExporter
 from octo_src.bluetooth import BluetoothServer
-from octo_src.octoprint import OctoPrintClient
+from octo_src.octoprint import OctoPrintClient, OctoPrintPushClient, PrinterSnapshotService
 from octo_src.octoprint.temp_monitor import TemperatureMonitor
+from octo_src.octoprint.temp_log import TemperatureLog
 from octo_src.gcode import GCodeManager
 import time
 import threading
@@ -16,7 +17,13 @@ logger = setup_logger(
     error_log_file='/home/c9lee/rpi/logs/printer-error.log'
 )
 
-def check_printer_connection(octoprint_client, max_retries=3, retry_delay=5):
+def _get_printer_status(octoprint_client, snapshot_service=None):
+    """공유 스냅샷이 있으면 그것을, 없으면 OctoPrint에서 직접 프린터 상태 조회"""
+    if snapshot_service:
+        return snapshot_service.get_status()
+    return octoprint_client.get_printer_status()
+
+def check_printer_connection(octoprint_client, max_retries=3, retry_delay=5, snapshot_service=None):
     """프린터 연결 상태 확인 및 재연결 시도"""
     for attempt in range(max_retries):
         try:
@@ -32,7 +39,7 @@ def check_printer_connection(octoprint_client, max_retries=3, retry_delay=5):
             
             # Operational, Printing, Paused 상태면 프린터 상태만 확인
             if current_state in ['Operational', 'Printing', 'Paused']:
-                printer_status = octoprint_client.get_printer_status()
+                printer_status = _get_printer_status(octoprint_client, snapshot_service)
                 if printer_status:
                     logger.debug(f"Printer is in valid state: {current_state}")
                     return True
@@ -61,7 +68,7 @@ def check_printer_connection(octoprint_client, max_retries=3, retry_delay=5):
                             logger.debug(f"Waiting for printer to become ready... Current state: {current_state}")
                             
                             if current_state in ['Operational', 'Printing', 'Paused']:
-                                printer_status = octoprint_client.get_printer_status()
+                                printer_status = _get_printer_status(octoprint_client, snapshot_service)
                                 if printer_status:
                                     logger.info("Successfully connected to printer and verified status")
                                     return True
@@ -97,7 +104,7 @@ def wait_for_octoprint(base_url, api_key, max_attempts=None, delay=5):
     
     while True:
         try:
-            response = requests.get(f"{base_url}/api/version", headers={"X-Api-Key": api_key})
+            response = requests.get(f"{base_url}/api/version", headers={"X-Api-Key": api_key}, timeout=delay)
             if response.status_code == 200:
                 logger.info("OctoPrint is now available")
                 return True
@@ -111,13 +118,13 @@ def wait_for_octoprint(base_url, api_key, max_attempts=None, delay=5):
         
         time.sleep(delay)
 
-def wait_for_printer_connection(octoprint_client, max_retries=12, retry_delay=5):
+def wait_for_printer_connection(octoprint_client, max_retries=12, retry_delay=5, snapshot_service=None):
     """프린터 연결이 설정될 때까지 대기"""
     logger.info("Waiting for printer connection...")
     
     retry_count = 0
     while retry_count < max_retries:
-        if check_printer_connection(octoprint_client):
+        if check_printer_connection(octoprint_client, snapshot_service=snapshot_service):
             logger.info("Printer connection established")
             return True
         
@@ -140,36 +147,92 @@ def main():
         return
 
     try:
-        # OctoPrint 클라이언트 초기화
-        octoprint_client = OctoPrintClient(
+        # GCode 매니저 초기화. 분석 프로세스 풀을 fork로 만들므로 다른 스레드를 시작하기 전에 먼저 생성
+        upload_folder = config.get('upload.folder') or '/home/c9lee/.octoprint/uploads'
+        state_folder = config.get('upload.state_folder') or f"{os.path.normpath(upload_folder)}_state"
+        gcode_manager = GCodeManager(
+            upload_folder=upload_folder,
+            max_window=config.get('upload.max_window', 32),
+            state_folder=config.get('upload.state_folder'),
+            max_sessions=config.get('upload.max_sessions', 4),
+            max_inflight_bytes=config.get('upload.max_inflight_bytes', 256 * 1024 * 1024),
+            analysis_workers=config.get('upload.analysis_workers', 1),
+            kinematics=config.get('printer.kinematics'),
+            transform=config.get('upload.transform')
+        )
+
+        # OctoPrint 클라이언트 초기화 (push 모드면 푸시 API로 상태를 받아 메모리에서 응답)
+        client_class = OctoPrintPushClient if config.get('octoprint.push', False) else OctoPrintClient
+        octoprint_client = client_class(
             api_key=config.get('octoprint.api_key'),
-            base_url=base_url
+            base_url=base_url,
+            pool_size=config.get('octoprint.pool_size', 4),
+            connect_timeout=config.get('octoprint.connect_timeout', 3.05),
+            read_timeout=config.get('octoprint.read_timeout', 10),
+            upload_folder=upload_folder,
+            fan_max_age=config.get('octoprint.fan_max_age', 60.0)
         )
+        if isinstance(octoprint_client, OctoPrintPushClient):
+            octoprint_client.start()
         
         # 프린터 연결 확인 및 재시도
         if not wait_for_printer_connection(octoprint_client):
             logger.error("Could not establish printer connection. Exiting...")
+            gcode_manager.close()
             return
 
+        # 메트릭을 Prometheus 텍스트 파일로 주기적으로 기록 (설정된 경우에만)
+        if config.get('metrics.prometheus_file'):
+            metrics_exporter = PrometheusFileExporter(
+                metrics,
+                config.get('metrics.prometheus_file'),
+                interval=config.get('metrics.interval', 15.0)
+            )
+            metrics_exporter.start()
+
+        # 모든 사용처가 공유하는 프린터 상태 스냅샷
+        snapshot_service = PrinterSnapshotService(
+            octoprint_client,
+            interval=config.get('octoprint.snapshot_interval', 1.0),
+            ttl=config.get('octoprint.snapshot_ttl', 2.0)
+        )
+        snapshot_service.start()
+
         # 연결 모니터링 스레드 시작
-        connection_monitor = ConnectionMonitor(octoprint_client)
+        connection_monitor = ConnectionMonitor(octoprint_client, snapshot_service=snapshot_service)
         connection_monitor.start()
 
+        # 온도 이력 디스크 기록 (기본 위치는 업로드 상태 폴더 아래)
+        temperature_log = None
+        if config.get('temperature.persist', True):
+            temperature_log = TemperatureLog(
+                config.get('temperature.log_folder') or os.path.join(state_folder, 'temperature'),
+                segment_records=config.get('temperature.segment_records', 86400),
+                max_segments=config.get('temperature.max_segments', 8),
+                flush_interval=config.get('temperature.flush_interval', 60.0)
+            )
+
         # 온도 모니터 초기화 및 시작
-        temp_monitor = TemperatureMonitor(octoprint_client)
-        temp_monitor.start()
-        
-        # GCode 매니저 초기화
-        gcode_manager = GCodeManager(
-            upload_folder=config.get('upload.folder') or '/home/c9lee/.octoprint/uploads'
+        temp_monitor = TemperatureMonitor(
+            octoprint_client,
+            update_interval=config.get('temperature.update_interval', 5.0),
+            fast_interval=config.get('temperature.fast_interval', 1.0),
+            idle_interval=config.get('temperature.idle_interval', 10.0),
+            history_size=config.get('temperature.history_size', 86400),
+            snapshot_service=snapshot_service,
+            temperature_log=temperature_log
         )
+        temp_monitor.start()
         
         # 블루투스 서버 초기화 (temp_monitor 전달)
         bt_server = BluetoothServer(
             octoprint_client=octoprint_client,
             gcode_manager=gcode_manager,
             temp_monitor=temp_monitor,
-            service_name=config.get('bluetooth.service_name')
+            service_name=config.get('bluetooth.service_name'),
+            snapshot_service=snapshot_service,
+            max_workers=config.get('bluetooth.max_workers', 4),
+            max_pending=config.get('bluetooth.max_pending', 16)
         )
 
         # 서버 시작
@@ -181,11 +244,20 @@ def main():
             temp_monitor.stop()
         if 'connection_monitor' in locals():
             connection_monitor.stop()
+        if 'snapshot_service' in locals():
+            snapshot_service.stop()
+        if 'metrics_exporter' in locals():
+            metrics_exporter.stop()
+        if 'gcode_manager' in locals():
+            gcode_manager.close()
+        if 'octoprint_client' in locals():
+            octoprint_client.close()
 
 # 새로운 ConnectionMonitor 클래스 추가
 class ConnectionMonitor:
-    def __init__(self, octoprint_client, check_interval=30):
+    def __init__(self, octoprint_client, check_interval=30, snapshot_service=None):
         self.octoprint_client = octoprint_client
+        self.snapshot_service = snapshot_service
         self.check_interval = check_interval
         self.running = False
         self.monitor_thread = None
@@ -205,9 +277,10 @@ class ConnectionMonitor:
 
     def _monitor_connection(self):
         while self.running:
-            if not check_printer_connection(self.octoprint_client):
-                logger.warning("Printer connection lost, attempting to reconnect...")
-                wait_for_printer_connection(self.octoprint_client)
+            with metrics.timer('poller_loop_seconds', loop='connection'):
+                if not check_printer_connection(self.octoprint_client, snapshot_service=self.snapshot_service):
+                    logger.warning("Printer connection lost, attempting to reconnect...")
+                    wait_for_printer_connection(self.octoprint_client, snapshot_service=self.snapshot_service)
             time.sleep(self.check_interval)
 
 if __name__ == "__main__":
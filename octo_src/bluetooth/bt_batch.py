@@ -0,0 +1,48 @@
+from .bt_commands import BTCommands
+
+# BATCH 하나에 담을 수 있는 최대 명령 수
+MAX_BATCH_SIZE = 32
+
+# 하나의 /api/printer/command 요청으로 합쳐 보내도 개별 처리와 결과가 같은 명령.
+# EXTRUDE/RETRACT는 출력 중 거부하는 /api/printer/tool을 거쳐야 하고,
+# SET_FAN_SPEED는 응답에 상태를 담으므로 개별 처리로 실행한다.
+GCODE_COMMANDS = {
+    BTCommands.SET_TEMP.value,
+    BTCommands.SET_FLOW_RATE.value,
+}
+
+
+def command_to_gcode(command):
+    """G-code로 바꿀 수 있는 명령을 G-code 목록으로 변환
+
+    개별 명령 처리와 같은 검사를 하며, 잘못된 값이면 같은 오류 메시지로 ValueError를 발생시킨다.
+    """
+    cmd_type = command.get('type')
+
+    if cmd_type == BTCommands.SET_TEMP.value:
+        target = command.get('target')
+        temp = command.get('temperature')
+        if not target or temp is None:
+            raise ValueError("Missing target or temperature")
+        if target not in ['bed', 'nozzle']:
+            raise ValueError("Invalid target. Must be 'bed' or 'nozzle'")
+        temp = _to_float(temp, "Invalid temperature value")
+        return [f"{'M140' if target == 'bed' else 'M104'} S{temp:g}"]
+
+    if cmd_type == BTCommands.SET_FLOW_RATE.value:
+        rate = command.get('rate')
+        if rate is None:
+            raise ValueError("Missing flow rate")
+        rate = _to_float(rate, "Invalid flow rate value")
+        if not 75 <= rate <= 125:
+            raise ValueError("Flow rate must be between 75 and 125")
+        return [f"M221 S{rate:g}"]
+
+    raise ValueError(f"Not a G-code command: {cmd_type}")
+
+
+def _to_float(value, message):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(message)
@@ -2,12 +2,15 @@ from enum import Enum
 
 class BTCommands(Enum):
     GET_STATUS = "GET_STATUS"
+    SUBSCRIBE_STATUS = "SUBSCRIBE_STATUS"
     GET_TEMP_HISTORY = "GET_TEMP_HISTORY"
     START_PRINT = "START_PRINT"
     PAUSE = "PAUSE"
     RESUME = "RESUME"
     CANCEL = "CANCEL"
     UPLOAD_GCODE = "UPLOAD_GCODE"
+    RESUME_UPLOAD = "RESUME_UPLOAD"
+    HAS_FILE = "HAS_FILE"
     SET_TEMP = "SET_TEMP"
     SET_FAN_SPEED = "SET_FAN_SPEED"
     SET_FLOW_RATE = "SET_FLOW_RATE"
@@ -16,6 +19,8 @@ class BTCommands(Enum):
     MOVE_AXIS = "MOVE_AXIS"
     HOME_AXIS = "HOME_AXIS"
     GET_POSITION = "GET_POSITION"
+    BATCH = "BATCH"
+    GET_METRICS = "GET_METRICS"
 
 class BTResponse:
     @staticmethod
@@ -0,0 +1,62 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..utils.metrics import metrics
+
+logger = logging.getLogger('mie_printer.bluetooth')
+
+
+class ClientConnection:
+    """블루투스 클라이언트 연결 하나의 상태
+
+    id가 있는 요청은 연결별 작업자 풀에서 동시에 처리된다. 처리 중이거나 대기 중인
+    요청이 max_pending개가 되면 submit이 블록되어 수신 스레드가 소켓 읽기를 멈춘다.
+    """
+
+    def __init__(self, sock, info, max_workers=4, max_pending=16):
+        self.sock = sock
+        self.info = info
+        # 메트릭 레이블용 주소 (RFCOMM은 (주소, 채널) 튜플)
+        self.address = str(info[0] if isinstance(info, tuple) else info)
+        # 이 연결에서 시작한 업로드 세션 (연결 해제 시 중단 처리)
+        self.upload_ids = set()
+        # SUBSCRIBE_STATUS로 등록한 상태 푸시
+        self.subscription = None
+        self._send_lock = threading.Lock()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bt-request')
+        self._pending = threading.BoundedSemaphore(max(max_pending, max_workers))
+
+    def submit(self, handler, *args):
+        """요청을 작업자 풀에서 실행하고 결과를 끝나는 대로 전송"""
+        self._pending.acquire()
+        try:
+            self._workers.submit(self._run, handler, *args)
+        except RuntimeError:
+            # 연결 종료 중
+            self._pending.release()
+            raise
+
+    def _run(self, handler, *args):
+        try:
+            self.send(handler(*args))
+        except OSError as e:
+            logger.debug(f"Dropping response for {self.info}: {e}")
+        except Exception as e:
+            logger.error(f"Error handling request from {self.info}: {e}")
+        finally:
+            self._pending.release()
+
+    def drain(self):
+        """처리 중인 요청이 모두 끝날 때까지 대기하고 작업자 풀 종료"""
+        self._workers.shutdown(wait=True)
+
+    def send(self, text):
+        """응답 전송. 여러 스레드에서 호출해도 메시지가 섞이지 않도록 직렬화"""
+        data = (text + '\n').encode('utf-8')
+        with self._send_lock:
+            self.sock.sendall(data)
+        metrics.inc('bt_bytes_sent_total', len(data), client=self.address)
+
+    def close(self):
+        """소켓 닫기"""
+        self.sock.close()
@@ -0,0 +1,175 @@
+import json
+import logging
+import re
+import struct
+from collections import namedtuple
+
+logger = logging.getLogger('mie_printer.bluetooth')
+
+# 바이너리 프레임 시작 바이트: UTF-8 연속 바이트라 JSON 메시지 경계에는 나타나지 않음
+BINARY_FRAME_MAGIC = 0xB7
+
+# 바이너리 프레임 종류
+FRAME_UPLOAD_CHUNK = 0x01
+
+# magic(1) + frame_type(1) + upload_id(4) + offset(8) + length(4), 네트워크 바이트 순서
+BINARY_FRAME_HEADER = struct.Struct('!BBIQI')
+
+BinaryFrame = namedtuple('BinaryFrame', ['frame_type', 'upload_id', 'offset', 'payload'])
+
+# 객체 외부에서는 '{'와 바이너리 프레임 시작, 객체 내부에서는 괄호/따옴표/이스케이프만 의미가 있음
+_FRAME_START = re.compile(rb'[{\xb7]')
+_SPECIAL_BYTES = re.compile(rb'[{}"\\]')
+
+DEFAULT_MAX_MESSAGE_SIZE = 256 * 1024
+DEFAULT_MAX_PAYLOAD_SIZE = 64 * 1024
+
+
+def encode_binary_frame(frame_type, upload_id, offset, payload):
+    """바이너리 프레임 인코딩 (테스트 및 클라이언트 구현 참고용)"""
+    header = BINARY_FRAME_HEADER.pack(
+        BINARY_FRAME_MAGIC, frame_type, upload_id, offset, len(payload)
+    )
+    return header + bytes(payload)
+
+
+class MessageDecoder:
+    """RFCOMM 바이트 스트림을 JSON 메시지 단위로 잘라내는 증분 디코더
+
+    줄바꿈으로 구분된 메시지와 구분자 없이 이어 붙은 메시지를 모두 처리한다.
+    괄호 깊이와 문자열 상태를 recv 사이에 유지하므로 각 바이트는 한 번만
+    검사되고, 완성된 메시지는 한 번만 파싱된다.
+
+    메시지 사이에는 BINARY_FRAME_HEADER로 시작하는 바이너리 프레임이 올 수 있으며,
+    이 경우 페이로드는 디코딩 없이 BinaryFrame으로 그대로 전달된다.
+    """
+
+    def __init__(self, max_message_size=DEFAULT_MAX_MESSAGE_SIZE,
+                 max_payload_size=DEFAULT_MAX_PAYLOAD_SIZE):
+        self.max_message_size = max_message_size
+        self.max_payload_size = max_payload_size
+        self._buffer = bytearray()
+        self._pos = 0          # 다음에 검사할 위치
+        self._start = -1       # 현재 메시지 시작 위치 (-1이면 메시지 밖)
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, data):
+        """수신 데이터를 추가하고 완성된 메시지(dict 또는 BinaryFrame) 목록 반환"""
+        self._buffer += data
+        messages = []
+        buf = self._buffer
+
+        while self._pos < len(buf):
+            if self._start < 0:
+                # 메시지 밖: 다음 '{' 또는 바이너리 프레임까지 건너뜀 (줄바꿈, 잡음 등)
+                match = _FRAME_START.search(buf, self._pos)
+                if match is None:
+                    self._pos = len(buf)
+                    break
+                start = match.start()
+                if buf[start] == BINARY_FRAME_MAGIC:
+                    frame, consumed = self._read_binary_frame(buf, start)
+                    if consumed == 0:
+                        # 프레임이 아직 다 도착하지 않음
+                        self._pos = start
+                        break
+                    self._pos = start + consumed
+                    if frame is not None:
+                        messages.append(frame)
+                    continue
+                self._start = start
+                self._depth = 1
+                self._pos = start + 1
+                continue
+
+            if self._escape:
+                self._escape = False
+                self._pos += 1
+                continue
+
+            match = _SPECIAL_BYTES.search(buf, self._pos)
+            if match is None:
+                self._pos = len(buf)
+                break
+
+            char = match.group()
+            self._pos = match.end()
+
+            if self._in_string:
+                if char == b'\\':
+                    self._escape = True
+                elif char == b'"':
+                    self._in_string = False
+            elif char == b'"':
+                self._in_string = True
+            elif char == b'{':
+                self._depth += 1
+            elif char == b'}':
+                self._depth -= 1
+                if self._depth == 0:
+                    message = self._parse(buf[self._start:self._pos])
+                    if message is not None:
+                        messages.append(message)
+                    self._start = -1
+
+        self._compact()
+        return messages
+
+    def _read_binary_frame(self, buf, start):
+        """바이너리 프레임 읽기. (frame, 소비한 바이트 수) 반환, 미완성이면 소비 0"""
+        end_of_header = start + BINARY_FRAME_HEADER.size
+        if len(buf) < end_of_header:
+            return None, 0
+
+        _, frame_type, upload_id, offset, length = BINARY_FRAME_HEADER.unpack_from(buf, start)
+        if length > self.max_payload_size:
+            # 헤더가 손상된 경우: 시작 바이트만 버리고 다음 메시지를 찾음
+            logger.error(f"Binary frame payload too large ({length} bytes), skipping")
+            return None, 1
+
+        end = end_of_header + length
+        if len(buf) < end:
+            return None, 0
+        return BinaryFrame(frame_type, upload_id, offset, bytes(buf[end_of_header:end])), end - start
+
+    def _parse(self, raw):
+        """완성된 메시지를 한 번만 파싱"""
+        try:
+            message = json.loads(bytes(raw))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"Invalid JSON: {e} in message: {bytes(raw)[:200]!r}")
+            return None
+        if not isinstance(message, dict):
+            logger.error(f"Ignoring non-object message: {message!r}")
+            return None
+        return message
+
+    def _compact(self):
+        """처리가 끝난 앞부분을 버퍼에서 제거"""
+        if self._start < 0:
+            del self._buffer[:self._pos]
+            self._pos = 0
+            if len(self._buffer) > BINARY_FRAME_HEADER.size + self.max_payload_size:
+                logger.error("Incomplete binary frame exceeds payload limit, discarding")
+                self.reset()
+            return
+
+        if self._start > 0:
+            del self._buffer[:self._start]
+            self._pos -= self._start
+            self._start = 0
+
+        if len(self._buffer) > self.max_message_size:
+            logger.error(f"Message exceeds {self.max_message_size} bytes, discarding")
+            self.reset()
+
+    def reset(self):
+        """디코더 상태 초기화"""
+        self._buffer.clear()
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
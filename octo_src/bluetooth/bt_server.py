@@ -2,18 +2,41 @@ import bluetooth
 import json
 import logging
 import threading
+import time
 import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from .bt_commands import BTCommands, BTResponse
+from .bt_batch import MAX_BATCH_SIZE, GCODE_COMMANDS, command_to_gcode
+from .bt_framing import MessageDecoder, BinaryFrame, FRAME_UPLOAD_CHUNK
+from .bt_connection import ClientConnection
+from .bt_subscription import StatusSubscription
+from ..gcode.gcode_manager import DEFAULT_CHUNK_SIZE, UploadLimitError
+from ..gcode.upload_session import negotiate_codec
+from ..utils.metrics import metrics
+
+# GET_TEMP_HISTORY 응답의 기본/최대 점 수 (기본값은 예전 이력 크기와 같음)
+DEFAULT_HISTORY_POINTS = 720
+MAX_HISTORY_POINTS = 2000
+
+# 메트릭 레이블로 쓰는 명령 이름 (알 수 없는 명령은 'unknown'으로 묶어서 레이블 수 제한)
+_COMMAND_TYPES = frozenset(command.value for command in BTCommands)
 
 # 로거 설정을 DEBUG 레벨로 변경
 logger = logging.getLogger('mie_printer.bluetooth')
 logger.setLevel(logging.DEBUG)
 
 class BluetoothServer:
-    def __init__(self, octoprint_client, gcode_manager, temp_monitor, service_name="SCARA 3D Printer"):
+    def __init__(self, octoprint_client, gcode_manager, temp_monitor, service_name="SCARA 3D Printer",
+                 snapshot_service=None, max_workers=4, max_pending=16):
         self.octoprint_client = octoprint_client
         self.gcode_manager = gcode_manager
         self.temp_monitor = temp_monitor
+        self.snapshot_service = snapshot_service
+        # 연결별로 id가 있는 요청을 동시에 처리하는 작업자 수와 최대 대기 요청 수
+        self.max_workers = max_workers
+        self.max_pending = max_pending
         self.server_sock = None
         self.is_running = True
         self.uuid = "00001101-0000-1000-8000-00805F9B34FB"
@@ -47,28 +70,39 @@ class BluetoothServer:
             logger.error(f"Failed to setup bluetooth server: {e}")
             return False
 
-    def handle_command(self, command_str):
-        """수신된 명령 처리"""
+    def handle_command(self, command, client=None):
+        """수신된 명령 처리 (파싱된 dict 또는 JSON 문자열). JSON 응답 문자열 반환"""
         try:
-            logger.debug(f"Processing command: {command_str!r}")
-            command = json.loads(command_str)
+            if isinstance(command, (str, bytes)):
+                command = json.loads(command)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSONDecodeError: {e} - Raw command: {command!r}")
+            return json.dumps(BTResponse.error(f"Invalid JSON data: {str(e)}"))
+        return json.dumps(self._dispatch(command, client))
+
+    def _dispatch(self, command, client=None):
+        """파싱된 명령 하나를 처리하고 응답 dict 반환"""
+        cmd_type = None
+        started = time.monotonic()
+        try:
+            logger.debug(f"Processing command: {command!r}")
             cmd_type = command.get('type')
             logger.debug(f"Command type: {cmd_type}")
             
             if cmd_type == BTCommands.PAUSE.value:
-                return json.dumps(
+                return (
                     BTResponse.success() if self.octoprint_client.pause_print()
                     else BTResponse.error("Failed to pause print")
                 )
                 
             elif cmd_type == BTCommands.RESUME.value:
-                return json.dumps(
+                return (
                     BTResponse.success() if self.octoprint_client.resume_print()
                     else BTResponse.error("Failed to resume print")
                 )
                 
             elif cmd_type == BTCommands.CANCEL.value:
-                return json.dumps(
+                return (
                     BTResponse.success() if self.octoprint_client.cancel_print()
                     else BTResponse.error("Failed to cancel print")
                 )
@@ -77,77 +111,132 @@ class BluetoothServer:
                 # 파일이 이미 존재하는지 확인
                 filename = command.get('filename')
                 action = command.get('action')
+                file_hash = command.get('sha256')
+
+                # 같은 내용의 파일이 다른 이름으로 있으면 전송 없이 하드 링크
+                # (변환 중인 파일은 find_by_hash가 자기 자신을 돌려줄 수 있으므로 건너뜀)
+                if action == 'start' and filename and file_hash \
+                        and not self.gcode_manager.is_processing(filename) \
+                        and not self.gcode_manager.is_file_ready(filename, file_hash):
+                    existing = self.gcode_manager.find_by_hash(file_hash)
+                    if existing and existing != filename and self.gcode_manager.link_file(existing, filename):
+                        return BTResponse.success(message="File already exists")
                 
-                # 파일이 이미 존재하면 모든 업로드 관련 명령을 성공으로 처리
-                if filename and self.gcode_manager.is_file_ready(filename):
+                # 파일이 이미 존재하고 진행 중인 업로드가 없으면 업로드 관련 명령을 성공으로 처리
+                # (해시가 주어지면 manifest에 기록된 내용이 같을 때만 건너뜀. 기록이 없으면 해시 계산은
+                # 백그라운드로 예약하고 업로드를 진행)
+                if filename and self.gcode_manager.is_file_ready(filename, file_hash) \
+                        and (action == 'start' or self.gcode_manager.get_upload_progress(command.get('upload_id'), filename) is None):
                     logger.info(f"File {filename} already exists, skipping upload")
                     if action == 'start':
-                        return json.dumps(BTResponse.success(message="File already exists"))
+                        return BTResponse.success(message="File already exists")
                     elif action == 'chunk':
-                        return json.dumps(BTResponse.success(message="Chunk skipped"))
+                        return BTResponse.success(message="Chunk skipped")
                     elif action == 'finish':
-                        return json.dumps(BTResponse.success(message="Upload skipped"))
+                        return BTResponse.success(message="Upload skipped")
                     
                 # 파일이 없는 경우에만 업로드 처리
-                return self._handle_gcode_upload(command)
+                return self._handle_gcode_upload(command, client)
+
+            elif cmd_type == BTCommands.RESUME_UPLOAD.value:
+                if not command.get('filename') or not command.get('total_size'):
+                    return BTResponse.error("Missing filename or total_size")
+                return self._start_upload(command, client, resume_only=True)
+                
+            elif cmd_type == BTCommands.HAS_FILE.value:
+                file_hash = command.get('sha256')
+                filename = command.get('filename')
+                if not file_hash:
+                    return BTResponse.error("Missing sha256")
+
+                existing = self.gcode_manager.find_by_hash(file_hash)
+                linked = False
+                if existing and filename and existing != filename:
+                    linked = self.gcode_manager.link_file(existing, filename)
+                    if linked:
+                        existing = filename
+                return BTResponse.success(data={
+                    'exists': existing is not None,
+                    'filename': existing,
+                    'linked': linked,
+                    # 업로드는 끝났고 크기 줄이기 변환 중 (끝나면 exists가 됨)
+                    'processing': bool(filename) and self.gcode_manager.is_processing(filename),
+                    'metadata': self.gcode_manager.get_file_metadata(existing) if existing else None
+                })
                 
             elif cmd_type == BTCommands.START_PRINT.value:
                 filename = command.get('filename')
                 if not filename:
-                    return json.dumps(BTResponse.error("Missing filename"))
+                    return BTResponse.error("Missing filename")
                     
                 # 파일 존재 확인
                 if not self.gcode_manager.is_file_ready(filename):
-                    return json.dumps(BTResponse.error("File not found or incomplete"))
+                    return BTResponse.error("File not found or incomplete")
                     
                 # 출력 시작
-                return json.dumps(
+                return (
                     BTResponse.success() if self.octoprint_client.start_print(filename)
                     else BTResponse.error("Failed to start print")
                 )
                 
             elif cmd_type == BTCommands.GET_STATUS.value:
-                status = self.octoprint_client.get_printer_status()
-                if status:
-                    response_data = {
-                        'temperature': status['temperature'],
-                        'fan_speed': status['fan_speed'],
-                        'progress': status['progress'],
-                        'currentFile': status['currentFile'],
-                        'timeLeft': status['timeLeft'],
-                        'currentLayer': status['currentLayer'],
-                        'totalLayers': status['totalLayers']
-                    }
-                    return json.dumps(BTResponse.success(data=response_data))
+                response_data = self.get_status_data()
+                if response_data:
+                    return BTResponse.success(data=response_data)
                 else:
-                    return json.dumps(BTResponse.error("Failed to get printer status"))
+                    return BTResponse.error("Failed to get printer status")
+
+            elif cmd_type == BTCommands.SUBSCRIBE_STATUS.value:
+                if client is None:
+                    return BTResponse.error("Subscriptions require a client connection")
+                interval = command.get('interval', 1.0)
+                try:
+                    interval = float(interval or 0)
+                except (TypeError, ValueError):
+                    return BTResponse.error("Invalid interval value")
+
+                if client.subscription:
+                    client.subscription.stop()
+                    client.subscription = None
+                if interval <= 0:
+                    return BTResponse.success(message="Unsubscribed")
+
+                client.subscription = StatusSubscription(client, self.get_status_data, interval)
+                client.subscription.start()
+                return BTResponse.success(
+                    data={'interval': client.subscription.interval},
+                    message="Subscribed"
+                )
                 
             elif cmd_type == BTCommands.SET_TEMP.value:
                 target = command.get('target')
                 temp = command.get('temperature')
                 if not target or temp is None:
-                    return json.dumps(BTResponse.error("Missing target or temperature"))
+                    return BTResponse.error("Missing target or temperature")
                 
                 if target not in ['bed', 'nozzle']:
-                    return json.dumps(BTResponse.error("Invalid target. Must be 'bed' or 'nozzle'"))
+                    return BTResponse.error("Invalid target. Must be 'bed' or 'nozzle'")
                 
                 try:
                     temp = float(temp)
                     if target == 'bed':
-                        self.octoprint_client.set_bed_temp(temp)
+                        success = self.octoprint_client.set_bed_temp(temp)
                     else:
-                        self.octoprint_client.set_nozzle_temp(temp)
-                    return json.dumps(BTResponse.success())
+                        success = self.octoprint_client.set_nozzle_temp(temp)
+                    if success:
+                        # 가열 구간을 촘촘히 기록하도록 다음 온도 조회를 앞당김
+                        self.temp_monitor.wake()
+                    return BTResponse.success() if success else BTResponse.error("Failed to set temperature")
                 except ValueError:
-                    return json.dumps(BTResponse.error("Invalid temperature value"))
+                    return BTResponse.error("Invalid temperature value")
                 except Exception as e:
-                    return json.dumps(BTResponse.error(f"Failed to set temperature: {str(e)}"))
+                    return BTResponse.error(f"Failed to set temperature: {str(e)}")
 
             elif cmd_type == BTCommands.SET_FAN_SPEED.value:
                 speed = command.get('speed')
                 if speed is None:
                     logger.error("Missing fan speed value")
-                    return json.dumps(BTResponse.error("Missing fan speed"))
+                    return BTResponse.error("Missing fan speed")
                 
                 try:
                     # 들어오는 값이 이미 PWM 값(0-255)이므로 변환하지 않음
@@ -156,138 +245,277 @@ class BluetoothServer:
                     
                     if isinstance(result, dict):
                         # 성공적으로 설정되고 상태가 반환된 경우
-                        return json.dumps(BTResponse.success(data=result))
+                        return BTResponse.success(data=result)
                     elif result:
                         # 성공했지만 상태가 없는 경우
-                        return json.dumps(BTResponse.success())
+                        return BTResponse.success()
                     else:
                         # 실패한 경우
-                        return json.dumps(BTResponse.error("Failed to set fan speed"))
+                        return BTResponse.error("Failed to set fan speed")
                 except Exception as e:
                     logger.error(f"Error setting fan speed: {e}")
-                    return json.dumps(BTResponse.error(f"Failed to set fan speed: {str(e)}"))
+                    return BTResponse.error(f"Failed to set fan speed: {str(e)}")
 
             elif cmd_type == BTCommands.SET_FLOW_RATE.value:
                 rate = command.get('rate')
                 if rate is None:
-                    return json.dumps(BTResponse.error("Missing flow rate"))
+                    return BTResponse.error("Missing flow rate")
                 
                 try:
                     rate = float(rate)
                     if not 75 <= rate <= 125:  # 일반적인 안전 범위
-                        return json.dumps(BTResponse.error("Flow rate must be between 75 and 125"))
+                        return BTResponse.error("Flow rate must be between 75 and 125")
                     
-                    self.octoprint_client.set_flow_rate(rate)
-                    return json.dumps(BTResponse.success())
+                    if not self.octoprint_client.set_flow_rate(rate):
+                        return BTResponse.error("Failed to set flow rate")
+                    return BTResponse.success()
                 except ValueError:
-                    return json.dumps(BTResponse.error("Invalid flow rate value"))
+                    return BTResponse.error("Invalid flow rate value")
                 except Exception as e:
-                    return json.dumps(BTResponse.error(f"Failed to set flow rate: {str(e)}"))
+                    return BTResponse.error(f"Failed to set flow rate: {str(e)}")
 
             elif cmd_type in [BTCommands.EXTRUDE.value, BTCommands.RETRACT.value]:
                 amount = command.get('amount')
                 if amount is None:
-                    return json.dumps(BTResponse.error("Missing amount"))
+                    return BTResponse.error("Missing amount")
                 
                 try:
                     amount = float(amount)
                     if not 0 < abs(amount) <= 100:  # 안전을 위한 최대값 제한
-                        return json.dumps(BTResponse.error("Amount must be between 0 and 100"))
+                        return BTResponse.error("Amount must be between 0 and 100")
                     
                     # Retract일 경우 음수로 변환
                     if cmd_type == BTCommands.RETRACT.value:
                         amount = -amount
                     
-                    self.octoprint_client.extrude(amount)
-                    return json.dumps(BTResponse.success())
+                    if not self.octoprint_client.extrude(amount):
+                        return BTResponse.error("Failed to extrude/retract")
+                    return BTResponse.success()
                 except ValueError:
-                    return json.dumps(BTResponse.error("Invalid amount value"))
+                    return BTResponse.error("Invalid amount value")
                 except Exception as e:
-                    return json.dumps(BTResponse.error(f"Failed to extrude/retract: {str(e)}"))
+                    return BTResponse.error(f"Failed to extrude/retract: {str(e)}")
 
             elif cmd_type == BTCommands.GET_TEMP_HISTORY.value:
                 minutes = command.get('minutes', 60)  # 기본값 60분
-                history = self.temp_monitor.get_temperature_history(minutes)
+                if 'since_seq' in command:
+                    # 마지막으로 받은 순번 이후의 샘플만 열 단위로 전송 (첫 요청은 since_seq=null)
+                    since_seq = command['since_seq']
+                    if since_seq is not None:
+                        try:
+                            since_seq = int(since_seq)
+                        except (TypeError, ValueError):
+                            return BTResponse.error("Invalid since_seq value")
+                    return BTResponse.success(
+                        data=self.temp_monitor.get_history_since(since_seq, command.get('stream'), minutes)
+                    )
+
+                max_points = command.get('max_points')
+                if max_points is not None:
+                    try:
+                        max_points = min(int(max_points), MAX_HISTORY_POINTS)
+                    except (TypeError, ValueError):
+                        return BTResponse.error("Invalid max_points value")
+                    if max_points < 2:
+                        return BTResponse.error("max_points must be at least 2")
+                    return BTResponse.success(
+                        data=self.temp_monitor.get_downsampled_history(minutes, max_points)
+                    )
+
+                # max_points가 없으면 기존 형식을 유지하되 응답 크기는 DEFAULT_HISTORY_POINTS로 제한
+                window = self.temp_monitor.get_temperature_window(minutes, max_points=DEFAULT_HISTORY_POINTS)
+                offset = self.temp_monitor.wall_clock_offset()
                 
                 # 온도 데이터를 JSON 직렬화 가능한 형식으로 변환
                 history_data = [
                     {
-                        'timestamp': data.timestamp.isoformat(),
+                        'timestamp': datetime.fromtimestamp(timestamp + offset).isoformat(),
                         'tool0': {
-                            'actual': data.tool0_actual,
-                            'target': data.tool0_target
+                            'actual': tool0_actual,
+                            'target': tool0_target
                         },
                         'bed': {
-                            'actual': data.bed_actual,
-                            'target': data.bed_target
+                            'actual': bed_actual,
+                            'target': bed_target
                         }
                     }
-                    for data in history
+                    for timestamp, tool0_actual, tool0_target, bed_actual, bed_target in zip(*window)
                 ]
                 
-                return json.dumps(BTResponse.success(data=history_data))
+                return BTResponse.success(data=history_data)
                 
             elif cmd_type == BTCommands.GET_POSITION.value:
-                response = self.octoprint_client.get_position()
-                return json.dumps(BTResponse.success(data=response))
+                if self.snapshot_service:
+                    status = self.snapshot_service.get_status()
+                    response = status['position'] if status else None
+                else:
+                    response = self.octoprint_client.get_position()
+                return BTResponse.success(data=response)
                 
             elif cmd_type == BTCommands.MOVE_AXIS.value:
                 axis = command.get('axis')
                 distance = command.get('distance')
                 
                 if not axis or distance is None:
-                    return json.dumps(BTResponse.error("Missing axis or distance"))
+                    return BTResponse.error("Missing axis or distance")
                 
                 try:
                     success = self.octoprint_client.move_axis(axis, float(distance))
                     logger.debug(f"Moving {axis} axis by {distance}mm")
-                    return json.dumps(
+                    return (
                         BTResponse.success() if success
                         else BTResponse.error(f"Failed to move {axis} axis")
                     )
                 except ValueError:
-                    return json.dumps(BTResponse.error("Invalid distance value"))
+                    return BTResponse.error("Invalid distance value")
                 except Exception as e:
                     logger.error(f"Error moving axis: {e}")
-                    return json.dumps(BTResponse.error(str(e)))
+                    return BTResponse.error(str(e))
                     
             elif cmd_type == BTCommands.HOME_AXIS.value:
                 axes = command.get('axes', ['x', 'y', 'z'])  # 기본값으로 모든 축
                 try:
                     success = self.octoprint_client.home_axis(axes)
                     logger.debug(f"Homing axes: {axes}")
-                    return json.dumps(
+                    return (
                         BTResponse.success() if success
                         else BTResponse.error("Failed to home axes")
                     )
                 except Exception as e:
                     logger.error(f"Error homing axes: {e}")
-                    return json.dumps(BTResponse.error(str(e)))
+                    return BTResponse.error(str(e))
+
+            elif cmd_type == BTCommands.GET_METRICS.value:
+                return BTResponse.success(data=metrics.snapshot())
+
+            elif cmd_type == BTCommands.BATCH.value:
+                return self._handle_batch(command, client)
 
             else:
-                return json.dumps(BTResponse.error(f"Unknown command: {cmd_type}"))
+                return BTResponse.error(f"Unknown command: {cmd_type}")
                 
-        except json.JSONDecodeError as e:
-            logger.error(f"JSONDecodeError: {e} - Raw command: {command_str}")
-            return json.dumps(BTResponse.error(f"Invalid JSON data: {str(e)}"))
         except Exception as e:
-            logger.error(f"Error handling command: {e} - Raw command: {command_str}")
-            return json.dumps(BTResponse.error(str(e)))
+            logger.error(f"Error handling command: {e} - Raw command: {command!r}")
+            return BTResponse.error(str(e))
+        finally:
+            metrics.observe(
+                'bt_command_seconds', time.monotonic() - started,
+                command=cmd_type if cmd_type in _COMMAND_TYPES else 'unknown'
+            )
+
+    def _handle_batch(self, command, client=None):
+        """여러 명령을 한 번에 처리하고 명령별 응답 목록 반환
+
+        연속된 G-code 명령(SET_TEMP, SET_FLOW_RATE)은 하나의 /api/printer/command 요청으로
+        합쳐 보내고, 나머지는 개별 명령과 같은 처리를 거친다. parallel이 참이면 묶음들을
+        동시에 실행하며, 이때 실행 순서는 보장되지 않는다.
+        """
+        items = command.get('commands')
+        if not isinstance(items, list) or not items:
+            return BTResponse.error("Missing commands")
+        if len(items) > MAX_BATCH_SIZE:
+            return BTResponse.error(f"Too many commands in batch (max {MAX_BATCH_SIZE})")
+
+        results = [None] * len(items)
+        tasks = []
+        gcode_run = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = BTResponse.error("Invalid command")
+                continue
+            if item.get('type') == BTCommands.BATCH.value:
+                results[index] = BTResponse.error("Nested BATCH is not allowed")
+                continue
+            if item.get('type') in GCODE_COMMANDS:
+                try:
+                    gcode_run.append((index, item['type'], command_to_gcode(item)))
+                except ValueError as e:
+                    results[index] = BTResponse.error(str(e))
+                continue
+            if gcode_run:
+                tasks.append(partial(self._send_gcode_run, gcode_run, results))
+                gcode_run = []
+            tasks.append(partial(self._run_batch_item, index, item, client, results))
+        if gcode_run:
+            tasks.append(partial(self._send_gcode_run, gcode_run, results))
+
+        if command.get('parallel') and len(tasks) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(tasks), self.max_workers)) as executor:
+                for future in [executor.submit(task) for task in tasks]:
+                    future.result()
+        else:
+            for task in tasks:
+                task()
+
+        for item, result in zip(items, results):
+            if isinstance(item, dict) and item.get('id') is not None:
+                result['id'] = item['id']
+        return BTResponse.success(data=results)
 
-    def _handle_gcode_upload(self, command):
+    def _run_batch_item(self, index, item, client, results):
+        results[index] = self._dispatch(item, client)
+
+    def _send_gcode_run(self, run, results):
+        """변환된 G-code 명령들을 한 번에 전송하고 각 명령의 결과 기록"""
+        commands = [gcode for _, _, gcodes in run for gcode in gcodes]
+        logger.debug(f"Sending batched G-code: {commands}")
+        success = self.octoprint_client.send_commands(commands)
+        if success and any(cmd_type == BTCommands.SET_TEMP.value for _, cmd_type, _ in run):
+            # 개별 SET_TEMP와 같이 다음 온도 조회를 앞당김
+            self.temp_monitor.wake()
+        for index, _, _ in run:
+            results[index] = BTResponse.success() if success else BTResponse.error("Failed to send G-code")
+
+    def get_status_data(self):
+        """앱에 전달할 프린터 상태 (GET_STATUS 응답 및 상태 푸시에 사용)"""
+        if self.snapshot_service:
+            status = self.snapshot_service.get_status()
+        else:
+            status = self.octoprint_client.get_printer_status()
+        if not status:
+            return None
+        total_layers = status['totalLayers']
+        current_layer = status['currentLayer']
+        layer_progress = None
+        time_left = status['timeLeft']
+        if status['currentFile']:
+            # OctoPrint 분석 결과가 없으면 업로드 후 직접 분석한 결과 사용
+            if not total_layers:
+                meta = self.gcode_manager.get_file_metadata(status['currentFile'])
+                if meta:
+                    total_layers = meta['layers']
+            # 현재 레이어는 전송 위치(filepos)로 레이어 색인에서 찾음
+            layer = self.gcode_manager.get_layer_progress(status['currentFile'], status.get('filepos'))
+            if layer:
+                current_layer, layer_progress = layer
+                # OctoPrint 예상값 대신 업로드 시 계산한 레이어별 출력 시간 사용
+                estimate = self.gcode_manager.get_time_left(status['currentFile'], status.get('filepos'))
+                if estimate is not None:
+                    time_left = estimate
+        return {
+            'temperature': status['temperature'],
+            'fan_speed': status['fan_speed'],
+            'fan_speed_age': status.get('fan_speed_age'),
+            'progress': status['progress'],
+            'currentFile': status['currentFile'],
+            'timeLeft': time_left,
+            'currentLayer': current_layer,
+            'totalLayers': total_layers,
+            'layerProgress': layer_progress
+        }
+
+    def _handle_gcode_upload(self, command, client=None):
         """G-code 파일 업로드 처리"""
         try:
             action = command.get('action')
+            upload_id = command.get('upload_id')
             
             if action == 'start':
                 filename = command.get('filename')
                 total_size = command.get('total_size')
                 if not filename or not total_size:
-                    return json.dumps(BTResponse.error("Missing filename or total_size"))
-                success = self.gcode_manager.init_upload(filename, total_size)
-                if not success:
-                    return json.dumps(BTResponse.error("Failed to initialize upload"))
-                return json.dumps(BTResponse.success(message="Upload initialized"))
+                    return BTResponse.error("Missing filename or total_size")
+                return self._start_upload(command, client)
                 
             elif action == 'chunk':
                 chunk_data = command.get('data')
@@ -296,64 +524,184 @@ class BluetoothServer:
                 is_last = command.get('is_last', True)
                 
                 if not chunk_data:
-                    return json.dumps(BTResponse.error("Empty chunk data"))
+                    return BTResponse.error("Empty chunk data")
+
+                progress = self.gcode_manager.get_upload_progress(upload_id, command.get('filename'))
+                if progress is None:
+                    return BTResponse.error("No active upload session")
                     
                 success = self.gcode_manager.append_chunk(
                     chunk_data, 
                     chunk_index=chunk_index,
                     total_chunks=total_chunks,
-                    is_last=is_last
+                    is_last=is_last,
+                    upload_id=progress['upload_id']
                 )
                 if not success:
-                    return json.dumps(BTResponse.error("Failed to append chunk"))
-                return json.dumps(BTResponse.success(message="Chunk received"))
+                    return BTResponse.error("Failed to append chunk")
+                offset = int(chunk_index) * progress['chunk_size']
+                return self._upload_ack(progress, offset, offset + progress['chunk_size'])
                 
+            elif action == 'abort':
+                # 이전 버전 앱은 upload_id 없이 filename만 보냄
+                progress = self.gcode_manager.get_upload_progress(upload_id, command.get('filename'))
+                if progress is None or not self.gcode_manager.abort_upload(progress['upload_id']):
+                    return BTResponse.error("No active upload session")
+                if client is not None:
+                    client.upload_ids.discard(progress['upload_id'])
+                return BTResponse.success(message="Upload aborted")
+
             elif action == 'finish':
                 filename = command.get('filename')
                 if not filename:
-                    return json.dumps(BTResponse.error("Missing filename"))
-                success = self.gcode_manager.finalize_upload(filename)
+                    return BTResponse.error("Missing filename")
+                # 마지막 청크에서 이미 완료되어 백그라운드 변환 중이면 성공으로 처리
+                if self.gcode_manager.is_processing(filename) \
+                        and self.gcode_manager.get_upload_progress(upload_id, filename) is None:
+                    return BTResponse.success(message="Upload completed")
+                success = self.gcode_manager.finalize_upload(filename, upload_id)
                 if not success:
-                    return json.dumps(BTResponse.error("Failed to finalize upload"))
-                return json.dumps(BTResponse.success(message="Upload completed"))
+                    return BTResponse.error("Failed to finalize upload")
+                return BTResponse.success(message="Upload completed")
                 
             else:
-                return json.dumps(BTResponse.error(f"Unknown upload action: {action}"))
+                return BTResponse.error(f"Unknown upload action: {action}")
                 
         except Exception as e:
             logger.error(f"Error handling gcode upload: {e}")
+            return BTResponse.error(str(e))
+
+    def _start_upload(self, command, client=None, resume_only=False):
+        """업로드 시작 또는 중단된 업로드 이어받기. 응답에 아직 받지 못한 구간 포함"""
+        filename = command.get('filename')
+        total_size = command.get('total_size')
+        file_hash = command.get('sha256')
+        resumed = self.gcode_manager.find_resumable(filename, total_size, file_hash)
+        if resume_only and not resumed:
+            return BTResponse.error("No resumable upload")
+
+        try:
+            upload_id = self.gcode_manager.init_upload(
+                filename,
+                total_size,
+                chunk_size=command.get('chunk_size', DEFAULT_CHUNK_SIZE),
+                window=command.get('window', 1),
+                file_hash=file_hash,
+                codec=negotiate_codec(command.get('compression')),
+                raw_size=command.get('raw_size')
+            )
+        except (UploadLimitError, ValueError) as e:
+            return BTResponse.error(str(e))
+        if upload_id is None:
+            return BTResponse.error("Failed to initialize upload")
+        if client is not None:
+            client.upload_ids.add(upload_id)
+        progress = self.gcode_manager.get_upload_progress(upload_id)
+        # 압축 업로드는 기록이 있어도 처음부터 다시 받음
+        resumed = resumed and progress['received_size'] > 0
+        return BTResponse.success(
+            data={
+                'upload_id': upload_id,
+                'binary_frames': True,
+                'resumed': resumed,
+                'missing': progress['missing'],
+                'received_size': progress['received_size'],
+                'total_size': progress['total_size'],
+                'codec': progress['codec'],
+                'raw_size': progress['raw_size'],
+                'chunk_size': progress['chunk_size'],
+                'window': progress['window']
+            },
+            message="Upload resumed" if resumed else "Upload initialized"
+        )
+
+    def _upload_ack(self, progress, start, end):
+        """청크 응답 생성: 누적 ACK(ack)와 이번 청크 구간(sack)을 함께 전달"""
+        upload_id = progress['upload_id']
+        current = self.gcode_manager.get_upload_progress(upload_id)
+        if current is None:
+            # 마지막 청크로 업로드가 자동 완료됨
+            total_size = progress['total_size']
+            return BTResponse.success(
+                data={
+                    'upload_id': upload_id,
+                    'ack': total_size,
+                    'received_size': total_size,
+                    'total_size': total_size
+                },
+                message="Upload completed"
+            )
+        return BTResponse.success(
+            data={
+                'upload_id': upload_id,
+                'ack': current['ack'],
+                'sack': [start, min(end, current['total_size'])],
+                'received_size': current['received_size'],
+                'total_size': current['total_size'],
+                'decoded_size': current['decoded_size'],
+                'raw_size': current['raw_size']
+            },
+            message="Chunk received"
+        )
+
+    def handle_binary_frame(self, frame):
+        """바이너리 프레임 처리 (JSON 디코딩 없이 페이로드를 파일에 기록)"""
+        started = time.monotonic()
+        try:
+            if frame.frame_type != FRAME_UPLOAD_CHUNK:
+                return json.dumps(BTResponse.error(f"Unknown frame type: {frame.frame_type}"))
+
+            progress = self.gcode_manager.get_upload_progress(frame.upload_id)
+            if progress is None:
+                return json.dumps(BTResponse.error(f"Unknown upload id: {frame.upload_id}"))
+
+            success = self.gcode_manager.write_chunk(frame.upload_id, frame.offset, frame.payload)
+            if not success:
+                return json.dumps(BTResponse.error("Failed to write chunk"))
+            return json.dumps(self._upload_ack(progress, frame.offset, frame.offset + len(frame.payload)))
+        except Exception as e:
+            logger.error(f"Error handling binary frame: {e}")
             return json.dumps(BTResponse.error(str(e)))
+        finally:
+            metrics.observe('bt_command_seconds', time.monotonic() - started, command='BINARY_FRAME')
+
+    def handle_request(self, message, client):
+        """id가 있는 요청 처리. 응답에 같은 id를 붙여서 반환 (응답 순서가 요청 순서와 다를 수 있음)"""
+        response = self._dispatch(message, client)
+        response['id'] = message['id']
+        return json.dumps(response)
 
     def handle_client(self, client_sock, client_info):
-        """클라이언트 연결 처리"""
-        data_buffer = ""
+        """클라이언트 연결 처리
+
+        id가 없는 요청과 바이너리 프레임은 받은 순서대로 바로 처리하고,
+        id가 있는 요청은 작업자 풀에서 동시에 처리해 끝나는 대로 응답한다.
+        """
+        client = ClientConnection(client_sock, client_info, self.max_workers, self.max_pending)
+        decoder = MessageDecoder()
         try:
             while True:
                 try:
-                    data = client_sock.recv(1024).decode('utf-8')
+                    data = client_sock.recv(1024)
                     if not data:
                         logger.debug("No data received, client disconnected")
                         break
                     
-                    logger.debug(f"Received raw data: {data!r}")
-                    data_buffer += data
-                    
-                    while '{' in data_buffer and '}' in data_buffer:
-                        start = data_buffer.find('{')
-                        end = data_buffer.find('}', start) + 1
-                        if start != -1 and end != 0:
-                            message = data_buffer[start:end]
-                            data_buffer = data_buffer[end:]
-                            logger.debug(f"Processing message: {message!r}")
-                            
-                            try:
-                                # JSON 유효성 검사
-                                json.loads(message)
-                                response = self.handle_command(message)
-                                logger.debug(f"Sending response: {response!r}")
-                                client_sock.send((response + '\n').encode('utf-8'))
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Invalid JSON: {e} in message: {message!r}")
+                    logger.debug(f"Received {len(data)} bytes")
+                    metrics.inc('bt_bytes_received_total', len(data), client=client.address)
+                    decode_started = time.monotonic()
+                    messages = decoder.feed(data)
+                    metrics.observe('bt_decode_seconds', time.monotonic() - decode_started)
+                    for message in messages:
+                        if isinstance(message, BinaryFrame):
+                            response = self.handle_binary_frame(message)
+                        elif message.get('id') is not None:
+                            client.submit(self.handle_request, message, client)
+                            continue
+                        else:
+                            response = self.handle_command(message, client)
+                        logger.debug(f"Sending response: {response!r}")
+                        client.send(response)
                                 
                 except Exception as e:
                     logger.error(f"Error receiving data: {e}")
@@ -362,7 +710,14 @@ class BluetoothServer:
         except Exception as e:
             logger.error(f"Error handling client {client_info}: {e}")
         finally:
-            client_sock.close()
+            if client.subscription:
+                client.subscription.stop()
+            # 처리 중인 요청이 끝난 뒤에 업로드를 중단해야 기록이 맞음
+            client.drain()
+            # 이 연결의 업로드는 삭제하지 않고 중단 처리 (재연결 후 이어받기 가능)
+            for upload_id in client.upload_ids:
+                self.gcode_manager.suspend_upload(upload_id)
+            client.close()
             logger.info(f"Connection with {client_info} closed.")
 
     def start(self):
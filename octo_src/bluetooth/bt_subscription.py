@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import time
+from ..utils.metrics import metrics
+
+logger = logging.getLogger('mie_printer.bluetooth')
+
+MIN_INTERVAL = 0.5
+MAX_INTERVAL = 60.0
+
+# 이 범위 안의 온도 변화는 센서 노이즈로 보고 보내지 않음
+TEMPERATURE_TOLERANCE = 0.5
+
+
+def _same_temperature(old, new):
+    """목표 온도가 같고 실제 온도 차이가 허용 범위 안이면 True"""
+    if not isinstance(old, dict) or not isinstance(new, dict) or old.keys() != new.keys():
+        return old == new
+    for heater, values in new.items():
+        previous = old[heater]
+        if not isinstance(values, dict) or not isinstance(previous, dict):
+            if previous != values:
+                return False
+            continue
+        if previous.get('target') != values.get('target'):
+            return False
+        try:
+            if abs(float(previous.get('actual') or 0) - float(values.get('actual') or 0)) > TEMPERATURE_TOLERANCE:
+                return False
+        except (TypeError, ValueError):
+            if previous.get('actual') != values.get('actual'):
+                return False
+    return True
+
+
+class StatusSubscription:
+    """클라이언트에게 프린터 상태를 주기적으로 보내는 구독
+
+    직전에 보낸 값과 달라진 항목만 보내며, 바뀐 것이 없으면 아무것도 보내지 않는다.
+    """
+
+    def __init__(self, client, fetch_status, interval=1.0):
+        self.client = client
+        self.fetch_status = fetch_status
+        self.interval = min(MAX_INTERVAL, max(MIN_INTERVAL, float(interval)))
+        self.seq = 0
+        self._last_sent = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """푸시 스레드 시작"""
+        self._thread = threading.Thread(target=self._push_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Status subscription started for {self.client.info} ({self.interval}s)")
+
+    def stop(self):
+        """푸시 스레드 중지"""
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+
+    def _changed_fields(self, status):
+        """직전에 보낸 상태와 다른 항목만 추출"""
+        changed = {}
+        for key, value in status.items():
+            if key not in self._last_sent:
+                changed[key] = value
+            elif key == 'temperature':
+                if not _same_temperature(self._last_sent[key], value):
+                    changed[key] = value
+            elif self._last_sent[key] != value:
+                changed[key] = value
+        return changed
+
+    def _push_loop(self):
+        """상태 푸시 루프"""
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                status = self.fetch_status()
+                if status is not None:
+                    changed = self._changed_fields(status)
+                    if changed:
+                        self.seq += 1
+                        self.client.send(json.dumps({
+                            'type': 'STATUS',
+                            'status': 'ok',
+                            'seq': self.seq,
+                            'data': changed
+                        }))
+                        self._last_sent.update(changed)
+            except OSError as e:
+                # 소켓이 닫힌 경우: 연결 처리 스레드가 정리함
+                logger.debug(f"Stopping status push for {self.client.info}: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Error pushing status: {e}")
+            metrics.observe('poller_loop_seconds', time.monotonic() - started, loop='status_push')
+            self._stop_event.wait(self.interval)
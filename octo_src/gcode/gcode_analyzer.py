@@ -0,0 +1,477 @@
+import os
+import math
+import mmap
+import json
+import time
+import shutil
+import bisect
+import logging
+import threading
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from .print_time import MoveTimer, load_kinematics
+
+logger = logging.getLogger('mie_printer.gcode')
+
+# 메타데이터 형식 버전 (분석 내용이 바뀌면 올려서 기존 파일을 다시 분석)
+META_VERSION = 4
+
+# 이 높이(mm) 이상 올라간 Z에서 압출이 시작되면 새 레이어로 봄 (Z-hop 등 작은 흔들림 무시)
+MIN_LAYER_STEP = 0.01
+
+
+def analyze_gcode(path, kinematics=None):
+    """G-code 파일을 한 번 읽으면서 레이어 수, 레이어별 Z, 압출량, 출력 범위, 첫 레이어 온도,
+    예상 출력 시간 계산 (kinematics는 프린터 프로필, print_time.DEFAULT_KINEMATICS 참고)
+
+    별도 프로세스에서 실행되므로 로그를 남기지 않고 결과 dict만 반환한다.
+    layer_offsets는 레이어마다 첫 압출 줄의 바이트 위치이며, 메타데이터와 별도로 저장된다.
+    레이어는 압출하는 이동이 이전 레이어보다 높은 Z에서 처음 나올 때 시작된 것으로 본다.
+    G90/G91은 E축까지, M82/M83은 E축만 절대/상대 좌표로 바꾼다 (Marlin 동작).
+    G2/G3 원호는 끝점으로 이동한 것으로 보고, 시간만 원호 길이로 계산한다.
+    """
+    started = time.monotonic()
+    x = y = z = e = 0.0
+    absolute = True
+    relative_e = False
+    extruded = 0.0
+    layer = 0
+    layer_z = []
+    layer_offsets = array('Q')
+    offset = 0
+    timer = MoveTimer(kinematics)
+    add_move = timer.add
+    feedrate = timer.kinematics['default_feedrate']
+    nozzle = bed = None
+    first_layer = {'nozzle': None, 'bed': None}
+    min_x = min_y = min_z = float('inf')
+    max_x = max_y = max_z = float('-inf')
+    lines = 0
+
+    with open(path, 'rb') as f:
+        for raw in f:
+            lines += 1
+            line_offset = offset
+            offset += len(raw)
+            line = raw.split(b';', 1)[0]
+            words = line.split()
+            if not words:
+                continue
+            code = words[0].upper()
+
+            if code in (b'G0', b'G1', b'G2', b'G3'):
+                values = _parse_words(words)
+                start_x, start_y, start_z = x, y, z
+                if 'X' in values:
+                    x = values['X'] if absolute else x + values['X']
+                if 'Y' in values:
+                    y = values['Y'] if absolute else y + values['Y']
+                if 'Z' in values:
+                    z = values['Z'] if absolute else z + values['Z']
+                delta_e = 0.0
+                if 'E' in values:
+                    if relative_e:
+                        delta_e = values['E']
+                        e += delta_e
+                    else:
+                        delta_e = values['E'] - e
+                        e = values['E']
+                    extruded += delta_e
+                if 'F' in values:
+                    feedrate = values['F']
+
+                if delta_e > 0 and (x != start_x or y != start_y):
+                    if not layer or z >= layer_z[-1] + MIN_LAYER_STEP:
+                        if not layer:
+                            first_layer = {'nozzle': nozzle, 'bed': bed}
+                        layer += 1
+                        layer_z.append(z)
+                        layer_offsets.append(line_offset)
+                    # 출력 범위는 압출하는 이동의 양 끝점으로 계산
+                    min_x = min(min_x, start_x, x)
+                    max_x = max(max_x, start_x, x)
+                    min_y = min(min_y, start_y, y)
+                    max_y = max(max_y, start_y, y)
+                    if z < min_z:
+                        min_z = z
+                    if z > max_z:
+                        max_z = z
+
+                dx, dy = x - start_x, y - start_y
+                if code in (b'G2', b'G3'):
+                    dx, dy = _arc_deltas(start_x, start_y, x, y, values, code == b'G2')
+                add_move(dx, dy, z - start_z, delta_e, feedrate, layer)
+
+            elif code == b'G4':
+                values = _parse_words(words)
+                timer.add_time(values.get('S', 0.0) + values.get('P', 0.0) / 1000.0, layer)
+            elif code == b'G92':
+                values = _parse_words(words)
+                if not values:
+                    x = y = z = e = 0.0
+                x = values.get('X', x)
+                y = values.get('Y', y)
+                z = values.get('Z', z)
+                e = values.get('E', e)
+            elif code == b'G28':
+                axes = {word[:1].upper() for word in words[1:]} & {b'X', b'Y', b'Z'}
+                if not axes or b'X' in axes:
+                    x = 0.0
+                if not axes or b'Y' in axes:
+                    y = 0.0
+                if not axes or b'Z' in axes:
+                    z = 0.0
+            elif code == b'G90':
+                absolute, relative_e = True, False
+            elif code == b'G91':
+                absolute, relative_e = False, True
+            elif code == b'M82':
+                relative_e = False
+            elif code == b'M83':
+                relative_e = True
+            elif code in (b'M104', b'M109', b'M140', b'M190'):
+                values = _parse_words(words)
+                if values.get('T', 0) != 0:
+                    continue
+                target = values.get('S', values.get('R'))
+                if target is None:
+                    continue
+                if code in (b'M104', b'M109'):
+                    nozzle = target
+                else:
+                    bed = target
+
+    # 레이어별 시작 시각 (첫 레이어 전 준비 동작 포함 누적)
+    timer.flush()
+    layer_times = timer.layer_times + [0.0] * (layer + 1 - len(timer.layer_times))
+    elapsed = layer_times[0]
+    layer_start_times = []
+    for seconds in layer_times[1:]:
+        layer_start_times.append(round(elapsed, 1))
+        elapsed += seconds
+
+    bbox = None
+    if layer_z:
+        bbox = {
+            'min': [round(min_x, 3), round(min_y, 3), round(min_z, 3)],
+            'max': [round(max_x, 3), round(max_y, 3), round(max_z, 3)]
+        }
+    return {
+        'version': META_VERSION,
+        'layers': layer,
+        'layer_z': [round(z, 3) for z in layer_z],
+        'layer_offsets': layer_offsets.tobytes(),
+        'filament_mm': round(extruded, 2),
+        'bbox': bbox,
+        'first_layer': first_layer,
+        'kinematics': timer.kinematics,
+        'print_time': round(elapsed, 1),
+        'layer_start_times': layer_start_times,
+        'lines': lines,
+        'analysis_seconds': round(time.monotonic() - started, 3)
+    }
+
+
+# 단어 첫 바이트 -> 대문자 축/인자 이름
+_LETTERS = {ord(letter): letter for letter in 'EFIJPRSTXYZ'}
+_LETTERS.update({ord(letter.lower()): letter for letter in 'EFIJPRSTXYZ'})
+
+
+def _arc_deltas(start_x, start_y, x, y, values, clockwise):
+    """G2/G3 이동을 시간 계산용 (dx, dy)로 변환: 현 방향을 유지하면서 길이만 원호 길이로 늘림"""
+    if 'I' not in values and 'J' not in values:
+        # R 형식은 현 길이로 근사
+        return x - start_x, y - start_y
+    center_x = start_x + values.get('I', 0.0)
+    center_y = start_y + values.get('J', 0.0)
+    radius = math.hypot(start_x - center_x, start_y - center_y)
+    sweep = math.atan2(y - center_y, x - center_x) - math.atan2(start_y - center_y, start_x - center_x)
+    if clockwise:
+        sweep = -sweep
+    sweep %= 2 * math.pi
+    if sweep == 0:
+        # 시작점과 끝점이 같으면 전체 원
+        sweep = 2 * math.pi
+    length = radius * sweep
+    chord = math.hypot(x - start_x, y - start_y)
+    if not chord:
+        return length, 0.0
+    return (x - start_x) * length / chord, (y - start_y) * length / chord
+
+
+def _parse_words(words):
+    """b'X10.5' 같은 단어 목록을 {'X': 10.5} 로 변환 (모르는 인자나 숫자가 아닌 단어는 무시)"""
+    values = {}
+    for word in words[1:]:
+        letter = _LETTERS.get(word[0])
+        if letter is None:
+            continue
+        try:
+            values[letter] = float(word[1:])
+        except ValueError:
+            continue
+    return values
+
+
+class GCodeAnalyzer:
+    """업로드된 파일을 별도 프로세스에서 분석하고 결과를 메타데이터 파일로 보관
+
+    분석은 CPU를 오래 쓰므로 프로세스 풀에서 실행해서 블루투스 스레드가 GIL을 기다리지 않게 한다.
+    메타데이터 파일에는 분석한 파일의 크기와 수정 시각을 함께 저장해서, 파일이 바뀌었으면 무효로 본다.
+    """
+
+    def __init__(self, folder, upload_folder, max_workers=1, kinematics=None):
+        self.folder = folder
+        self.upload_folder = upload_folder
+        self.max_workers = max_workers
+        # 출력 시간 계산에 쓰는 프린터 프로필 (바뀌면 기존 분석 결과는 무효)
+        self.kinematics = load_kinematics(kinematics)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._pending = {}
+        # 분석에 실패한 파일 상태 (같은 파일을 반복해서 분석하지 않도록)
+        self._failed = {}
+        # 출력 중인 파일의 레이어 위치 색인: (파일명, 파일 상태, mmap, uint64 memoryview)
+        self._index = None
+        self._index_lock = threading.Lock()
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+            logger.info(f"Created G-code metadata folder: {self.folder}")
+
+    def start(self):
+        """작업 프로세스를 미리 fork해 둠. 다른 스레드가 시작되기 전에 호출해야 한다
+
+        스레드가 잡고 있던 잠금(로거 등)은 fork된 자식에서 풀리지 않으므로, 스레드가 하나뿐일 때
+        작업 프로세스를 모두 만든다. fork 컨텍스트의 ProcessPoolExecutor는 첫 작업을 받을 때
+        max_workers개를 한꺼번에 만들고 이후에는 새로 만들지 않는다.
+        """
+        if self.max_workers < 1:
+            return
+        with self._lock:
+            future = self._get_executor().submit(os.getpid)
+        future.result()
+
+    def _get_executor(self):
+        """프로세스 풀 생성 (self._lock을 잡은 상태에서 호출)
+
+        start()를 부르지 않았으면 처음 분석할 때 만든다 (스레드가 없는 스크립트용).
+        """
+        if self._executor is None:
+            # spawn/forkserver는 main.py를 다시 import해서 로거 설정이 반복되므로 fork 사용.
+            # 작업 프로세스는 analyze_gcode 등 파일만 다루는 함수를 실행하며 로그나 잠금을 쓰지 않는다.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('fork')
+            )
+        return self._executor
+
+    def run(self, func, *args):
+        """func(*args)를 작업 프로세스에서 실행하고 결과를 기다림 (max_workers가 0이면 현재 스레드에서 실행)"""
+        if self.max_workers < 1:
+            return func(*args)
+        with self._lock:
+            future = self._get_executor().submit(func, *args)
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        with self._index_lock:
+            self._close_index()
+
+    def meta_path(self, filename):
+        return os.path.join(self.folder, f"{filename}.json")
+
+    def index_path(self, filename):
+        """레이어 시작 위치 색인 (little-endian uint64 배열)"""
+        return os.path.join(self.folder, f"{filename}.layers")
+
+    def _stat(self, filename):
+        try:
+            st = os.stat(os.path.join(self.upload_folder, filename))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def submit(self, filename):
+        """파일 분석 예약. 같은 상태의 파일을 이미 분석 중이면 무시"""
+        stat = self._stat(filename)
+        if stat is None or self.max_workers < 1:
+            return
+        with self._lock:
+            if stat in (self._pending.get(filename), self._failed.get(filename)):
+                return
+            self._pending[filename] = stat
+            future = self._get_executor().submit(
+                analyze_gcode, os.path.join(self.upload_folder, filename), self.kinematics
+            )
+        future.add_done_callback(lambda done: self._store(filename, stat, done))
+
+    def _store(self, filename, stat, future):
+        """분석이 끝나면 결과를 메타데이터 파일로 저장"""
+        with self._lock:
+            if self._pending.get(filename) == stat:
+                del self._pending[filename]
+        try:
+            meta = future.result()
+        except Exception as e:
+            logger.error(f"Error analyzing {filename}: {e}")
+            with self._lock:
+                self._failed[filename] = stat
+            return
+        if self._stat(filename) != stat:
+            # 분석하는 동안 파일이 바뀐 경우
+            return
+
+        meta['size'], meta['mtime'] = stat
+        offsets = meta.pop('layer_offsets')
+        # 메타데이터가 있으면 색인도 있도록 색인을 먼저 저장
+        if not self._write_index(filename, offsets) or not self._write(filename, meta):
+            return
+        logger.info(
+            f"Analyzed {filename}: {meta['layers']} layers, {meta['filament_mm']}mm filament "
+            f"in {meta['analysis_seconds']}s"
+        )
+
+    def get(self, filename, schedule=True):
+        """파일의 메타데이터 반환. 없거나 파일이 바뀌었으면 None (schedule이면 분석 예약)"""
+        stat = self._stat(filename)
+        if stat is None:
+            return None
+        with self._lock:
+            meta = self._cache.get(filename)
+        if meta is None:
+            try:
+                with open(self.meta_path(filename), 'r') as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                meta = None
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring broken metadata for {filename}: {e}")
+                meta = None
+        if meta is not None and meta.get('version') == META_VERSION and [meta['size'], meta['mtime']] == list(stat) \
+                and meta.get('kinematics') == self.kinematics:
+            with self._lock:
+                self._cache[filename] = meta
+            return meta
+        if schedule:
+            self.submit(filename)
+        return None
+
+    def link(self, source, filename):
+        """내용이 같은 파일(하드 링크/복사본)에 source의 메타데이터를 그대로 사용"""
+        meta = self.get(source, schedule=False)
+        stat = self._stat(filename)
+        if meta is None or stat is None:
+            self.submit(filename)
+            return
+        meta = dict(meta)
+        meta['size'], meta['mtime'] = stat
+        try:
+            shutil.copyfile(self.index_path(source), self.index_path(filename))
+        except OSError as e:
+            logger.error(f"Error copying layer index for {filename}: {e}")
+            return
+        self._write(filename, meta)
+
+    def _write_index(self, filename, offsets):
+        """레이어 색인 저장 (임시 파일에 쓴 뒤 교체). 성공하면 True"""
+        path = self.index_path(filename)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(offsets)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error saving layer index for {filename}: {e}")
+            return False
+        return True
+
+    def _close_index(self):
+        """열어 둔 색인 해제 (self._index_lock을 잡은 상태에서 호출)"""
+        if self._index is not None:
+            _, _, mm, view = self._index
+            view.release()
+            mm.close()
+            self._index = None
+
+    def _open_index(self, filename, stat):
+        """색인을 mmap으로 열기 (self._index_lock을 잡은 상태에서 호출). 없으면 None"""
+        self._close_index()
+        if self.get(filename) is None:
+            return None
+        try:
+            with open(self.index_path(filename), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if not size or size % 8:
+                    return None
+                mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        except OSError as e:
+            logger.warning(f"Could not open layer index for {filename}: {e}")
+            return None
+        self._index = (filename, stat, mm, memoryview(mm).cast('Q'))
+        return self._index
+
+    def layer_at(self, filename, filepos):
+        """출력 위치(filepos)가 속한 레이어 번호(1부터)와 그 레이어 안에서의 진행 비율 (0~1)
+
+        첫 레이어 전이면 (0, 0.0), 색인이 없으면 None. 출력 중에는 같은 파일을 계속 조회하므로
+        색인을 mmap으로 열어 두고 이진 탐색만 한다.
+        """
+        stat = self._stat(filename)
+        if stat is None or filepos is None:
+            return None
+        with self._index_lock:
+            index = self._index
+            if index is None or index[0] != filename or index[1] != stat:
+                index = self._open_index(filename, stat)
+                if index is None:
+                    return None
+            offsets = index[3]
+            layer = bisect.bisect_right(offsets, filepos)
+            if layer == 0:
+                return 0, 0.0
+            start = offsets[layer - 1]
+            end = offsets[layer] if layer < len(offsets) else stat[0]
+        fraction = (filepos - start) / (end - start) if end > start else 1.0
+        return layer, round(min(1.0, max(0.0, fraction)), 4)
+
+    def time_left(self, filename, filepos):
+        """출력 위치에서 남은 예상 시간(초). 분석 결과가 없으면 None
+
+        현재 레이어의 시작 시각에 레이어 진행 비율만큼의 레이어 소요 시간을 더해 경과 시간을 구한다.
+        """
+        meta = self.get(filename, schedule=False)
+        position = self.layer_at(filename, filepos)
+        if meta is None or position is None:
+            return None
+        layer, fraction = position
+        starts = meta['layer_start_times']
+        total = meta['print_time']
+        if layer == 0:
+            return int(round(total))
+        start = starts[layer - 1]
+        end = starts[layer] if layer < len(starts) else total
+        return max(0, int(round(total - (start + fraction * (end - start)))))
+
+    def _write(self, filename, meta):
+        """메타데이터 파일 저장 (임시 파일에 쓴 뒤 교체). 성공하면 True"""
+        path = self.meta_path(filename)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(meta, f, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Error saving metadata for {filename}: {e}")
+            return False
+        with self._lock:
+            self._cache[filename] = meta
+        return True
@@ -1,114 +1,540 @@
 import os
+import json
+import base64
+import binascii
+import itertools
 import logging
-import tempfile
+import threading
 import shutil
+import time
+from .upload_journal import UploadJournal
+from .upload_session import UploadSession, CODEC_NONE
+from .gcode_manifest import GCodeManifest, hash_file
+from .gcode_analyzer import GCodeAnalyzer
+from .gcode_transform import transform_gcode
+from ..utils.metrics import metrics
 
 logger = logging.getLogger('mie_printer.gcode')
 
+DEFAULT_CHUNK_SIZE = 1024
+# 클라이언트가 요청할 수 있는 최대 청크 크기 (바이너리 프레임 최대 페이로드와 같음)
+MAX_CHUNK_SIZE = 64 * 1024
+
+
+class UploadLimitError(Exception):
+    """동시 업로드 세션 수나 진행 중인 바이트 수 제한 초과"""
+
+
 class GCodeManager:
-    def __init__(self, upload_folder):
+    def __init__(self, upload_folder, max_window=32, state_folder=None,
+                 max_sessions=4, max_inflight_bytes=256 * 1024 * 1024, analysis_workers=1,
+                 kinematics=None, transform=None):
         self.upload_folder = upload_folder
-        self.active_upload = None
-        self.temp_file = None
-        
+        self.max_window = max_window
+        self.max_sessions = max_sessions
+        self.max_inflight_bytes = max_inflight_bytes
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._upload_ids = itertools.count(1)
+
         # 업로드 폴더가 없으면 생성
         if not os.path.exists(self.upload_folder):
             os.makedirs(self.upload_folder)
             logger.info(f"Created upload folder: {self.upload_folder}")
 
-    def is_file_ready(self, filename):
-        """파일이 이미 존재하고 사용 가능한지 확인"""
+        # OctoPrint가 업로드 폴더를 스캔하므로 상태 파일은 옆 폴더에 보관
+        self.state_folder = state_folder or f"{os.path.normpath(self.upload_folder)}_state"
+        self.journal = UploadJournal(os.path.join(self.state_folder, 'journal'))
+        self.journal.purge_stale()
+
+        # 업로드가 끝난 파일의 레이어/압출량 분석 결과 (analysis_workers가 0이면 분석하지 않음).
+        # 분석 프로세스는 fork로 만들므로 이 객체가 스레드를 시작하기 전에 미리 만든다
+        self.analyzer = GCodeAnalyzer(
+            os.path.join(self.state_folder, 'meta'), self.upload_folder, max_workers=analysis_workers,
+            kinematics=kinematics
+        )
+        self.analyzer.start()
+
+        # 내용 해시 목록: 시작 시 바뀐 파일만 백그라운드에서 다시 계산
+        self.manifest = GCodeManifest(os.path.join(self.state_folder, 'manifest.json'), self.upload_folder)
+        manifest_thread = threading.Thread(target=self.manifest.refresh)
+        manifest_thread.daemon = True
+        manifest_thread.start()
+
+        # 업로드가 끝난 파일의 크기 줄이기 (gcode_transform.GCodeTransformer 옵션, enabled가 아니면 하지 않음).
+        # 원본은 originals 폴더에 보관
+        transform = dict(transform or {})
+        self.transform_options = transform if transform.pop('enabled', False) else None
+        self.originals_folder = os.path.join(self.state_folder, 'originals')
+        # 백그라운드에서 변환 중인 파일명 -> 변환 순번 (끝날 때까지 준비되지 않은 파일로 봄)
+        self._transforming = {}
+        self._transform_lock = threading.Lock()
+        self._transform_ids = itertools.count(1)
+        # 파일명 -> 변환 결과 (변환하지 않은 파일은 None). 상태 조회마다 파일을 읽지 않도록 메모리에 보관
+        self._transform_stats = {}
+
+    def close(self):
+        """분석 프로세스 종료"""
+        self.analyzer.close()
+
+    def get_file_metadata(self, filename):
+        """파일 분석 결과 반환 (변환했으면 크기/줄 수 변화 'transform' 포함). 아직 분석 전이면 분석을 예약하고 None"""
+        meta = self.analyzer.get(filename)
+        if meta is None:
+            return None
+        stats = self._get_transform_stats(filename)
+        return meta if stats is None else dict(meta, transform=stats)
+
+    def get_layer_progress(self, filename, filepos):
+        """출력 위치에 해당하는 (현재 레이어, 레이어 진행 비율). 분석 결과가 없으면 None"""
+        return self.analyzer.layer_at(filename, filepos)
+
+    def get_time_left(self, filename, filepos):
+        """출력 위치에서 남은 예상 시간(초). 분석 결과가 없으면 None"""
+        return self.analyzer.time_left(filename, filepos)
+
+    def is_file_ready(self, filename, file_hash=None):
+        """파일이 이미 존재하고 사용 가능한지 확인. file_hash가 있으면 내용까지 비교
+
+        BT 스레드에서 불리므로 해시는 manifest에 있는 값만 본다. 항목이 없거나 파일이 바뀌었으면
+        백그라운드 해시 계산을 예약하고 False를 반환한다.
+        """
         try:
+            if self.is_processing(filename):
+                return False
             full_path = os.path.join(self.upload_folder, filename)
             if os.path.exists(full_path):
                 # 파일 크기가 0보다 크고 읽기 가능한지 확인
-                return os.path.getsize(full_path) > 0 and os.access(full_path, os.R_OK)
+                if not (os.path.getsize(full_path) > 0 and os.access(full_path, os.R_OK)):
+                    return False
+                if file_hash is None:
+                    return True
+                sha256 = self.manifest.hash_of(filename, compute=False)
+                if sha256 is None:
+                    self.manifest.hash_later(filename)
+                    return False
+                return sha256 == file_hash.lower()
             return False
         except Exception as e:
             logger.error(f"Error checking file readiness: {e}")
             return False
 
+    def is_processing(self, filename):
+        """업로드는 끝났지만 아직 변환 중인 파일인지 확인"""
+        with self._transform_lock:
+            return filename in self._transforming
+
+    def find_by_hash(self, file_hash):
+        """같은 내용의 파일명 반환, 없으면 None"""
+        return self.manifest.lookup(file_hash.lower())
+
+    def link_file(self, source, filename):
+        """이미 있는 파일을 다른 이름으로 하드 링크 (내용이 같은 파일 재업로드 방지)
+
+        임시 이름으로 링크한 뒤 교체하므로 링크가 실패해도 기존 대상 파일은 남는다.
+        """
+        if source == filename or self.is_processing(filename):
+            return False
+        source_path = os.path.join(self.upload_folder, source)
+        target_path = os.path.join(self.upload_folder, filename)
+        temp_path = f"{target_path}.link.tmp"
+        try:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            try:
+                os.link(source_path, temp_path)
+            except OSError:
+                # 하드 링크를 지원하지 않는 파일 시스템
+                shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, target_path)
+            self.manifest.record(filename, self.manifest.hash_of(source))
+            self.analyzer.link(source, filename)
+            logger.info(f"Linked {filename} to existing file {source}")
+            return True
+        except Exception as e:
+            logger.error(f"Error linking {filename} to {source}: {e}")
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return False
+
     def get_file_path(self, filename):
         """파일의 전체 경로 반환"""
         return os.path.join(self.upload_folder, filename)
 
-    def init_upload(self, filename, total_size):
-        """새로운 파일 업로드 초기화"""
+    def init_upload(self, filename, total_size, chunk_size=DEFAULT_CHUNK_SIZE, window=1, file_hash=None,
+                    codec=CODEC_NONE, raw_size=None):
+        """파일 업로드 초기화. 업로드 ID 반환, 실패 시 None
+
+        같은 파일명/크기/해시의 세션이 진행 중이거나 기록에 남아 있으면 이어서 받는다.
+        단, 압축 업로드는 압축 해제 상태를 저장할 수 없어서 기록이 있어도 처음부터 받는다.
+        window는 클라이언트가 응답을 기다리지 않고 보낼 수 있는 청크 수이며,
+        chunk_size와 함께 서버가 허용하는 값으로 줄여서 get_upload_progress로 전달된다.
+        chunk_size가 0 이하이거나 window가 1보다 작으면 ValueError,
+        세션 수나 진행 중인 바이트 수 제한을 넘으면 UploadLimitError를 발생시킨다.
+        """
         try:
-            if self.is_file_ready(filename):
-                # 파일이 이미 존재하면 성공으로 처리
-                logger.info(f"File {filename} already exists and is ready")
+            chunk_size, window = int(chunk_size), int(window)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid chunk_size or window") from None
+        if chunk_size <= 0 or window < 1:
+            raise ValueError(f"Invalid chunk_size {chunk_size} or window {window}")
+        chunk_size = min(chunk_size, MAX_CHUNK_SIZE)
+        window = min(window, self.max_window)
+        key = UploadJournal.make_key(filename, total_size, file_hash)
+
+        with self._sessions_lock:
+            for session in self.sessions.values():
+                if session.key == key:
+                    # 재연결한 클라이언트가 같은 세션을 다시 시작한 경우
+                    with session.lock:
+                        session.chunk_size = chunk_size
+                        session.window = window
+                    return session.upload_id
+
+            if len(self.sessions) >= self.max_sessions:
+                raise UploadLimitError(f"Too many concurrent uploads (max {self.max_sessions})")
+            inflight = sum(session.total_size for session in self.sessions.values())
+            if inflight + int(total_size) > self.max_inflight_bytes:
+                raise UploadLimitError(
+                    f"Upload size limit exceeded ({inflight + int(total_size)} > {self.max_inflight_bytes} bytes)"
+                )
+
+            try:
+                record = self.journal.load(key)
+                if record and (record.get('codec', CODEC_NONE) != CODEC_NONE or codec != CODEC_NONE):
+                    self.journal.remove(key)
+                    record = None
+                session = UploadSession(
+                    upload_id=next(self._upload_ids),
+                    key=key,
+                    filename=filename,
+                    total_size=total_size,
+                    part_path=self.journal.part_path(key),
+                    chunk_size=chunk_size,
+                    window=window,
+                    file_hash=file_hash,
+                    ranges=record['ranges'] if record else None,
+                    codec=codec,
+                    raw_size=raw_size,
+                    max_pending_bytes=window * chunk_size
+                )
+                session.flush_journal(self.journal, force=True)
+                self.sessions[session.upload_id] = session
+            except Exception as e:
+                logger.error(f"Error initializing upload: {e}")
+                return None
+
+        logger.debug(
+            f"Upload {session.upload_id} {'resumed' if record else 'initialized'} for {filename} "
+            f"(received={session.received.total()}, window={window})"
+        )
+        return session.upload_id
+
+    def find_resumable(self, filename, total_size, file_hash=None):
+        """이어받을 수 있는 세션이 있으면 True"""
+        key = UploadJournal.make_key(filename, total_size, file_hash)
+        with self._sessions_lock:
+            if any(session.key == key for session in self.sessions.values()):
                 return True
+        return self.journal.load(key) is not None
 
-            # 이전 업로드 세션 정리
-            self._cleanup_upload()
-
-            # 새 임시 파일 생성
-            self.temp_file = tempfile.NamedTemporaryFile(delete=False)
-            self.active_upload = {
-                'filename': filename,
-                'total_size': total_size,
-                'received_size': 0
-            }
-            logger.debug(f"Upload initialized for {filename}")
-            return True
-        except Exception as e:
-            logger.error(f"Error initializing upload: {e}")
-            self._cleanup_upload()
-            return False
+    def _get_session(self, upload_id=None, filename=None):
+        """업로드 세션 조회. upload_id가 없으면 filename이 같은 세션, filename도 없으면
+        유일한 세션 반환 (이전 버전 앱 호환)"""
+        with self._sessions_lock:
+            if upload_id is None:
+                if filename is not None:
+                    return next((s for s in self.sessions.values() if s.filename == filename), None)
+                if len(self.sessions) == 1:
+                    return next(iter(self.sessions.values()))
+                return None
+            return self.sessions.get(upload_id)
 
-    def append_chunk(self, chunk_data, chunk_index=0, total_chunks=1, is_last=True):
-        """청크 데이터 추가"""
+    def append_chunk(self, chunk_data, chunk_index=0, total_chunks=1, is_last=True, upload_id=None):
+        """JSON으로 전달된 base64 청크 데이터 추가 (chunk_index * chunk_size 위치에 기록)"""
         try:
-            if not self.active_upload or not self.temp_file:
-                logger.error("No active upload session or temp file missing")
-                return False
+            # 앱은 패딩 없는 URL-safe base64를 보내므로 패딩을 복원해서 디코딩
+            payload = base64.urlsafe_b64decode(chunk_data + '=' * (-len(chunk_data) % 4))
+        except (binascii.Error, ValueError) as e:
+            logger.error(f"Invalid base64 chunk data: {e}")
+            return False
 
-            self.temp_file.write(chunk_data.encode())
-            self.active_upload['received_size'] += len(chunk_data)
-            
-            if is_last and self.active_upload['received_size'] >= self.active_upload['total_size']:
-                return self.finalize_upload(self.active_upload['filename'])
-                
-            return True
-        except Exception as e:
-            logger.error(f"Error appending chunk: {e}")
-            self._cleanup_upload()
+        session = self._get_session(upload_id)
+        if session is None:
+            logger.error(f"No active upload session: {upload_id}")
             return False
+        if len(payload) > session.chunk_size:
+            # 다음 청크 위치를 덮어쓰지 않도록 거부 (chunk_size는 시작 응답으로 알려준 값)
+            logger.error(f"Chunk of {len(payload)} bytes exceeds chunk size {session.chunk_size}")
+            return False
+        offset = int(chunk_index) * session.chunk_size
+        return self.write_chunk(session.upload_id, offset, payload)
+
+    def write_chunk(self, upload_id, offset, payload):
+        """원시 바이트 청크를 offset 위치에 기록. 순서가 바뀌어 도착해도 됨
 
-    def finalize_upload(self, filename):
+        모든 바이트가 수신되면 업로드를 자동으로 완료한다.
+        """
+        session = self._get_session(upload_id)
+        if session is None:
+            logger.error(f"Unknown upload id: {upload_id}")
+            return False
+
+        with session.lock:
+            try:
+                if session.closed:
+                    logger.error(f"Upload {upload_id} is already closed")
+                    return False
+                started = time.monotonic()
+                session.write(offset, payload)
+                metrics.observe('upload_write_seconds', time.monotonic() - started)
+                metrics.inc('upload_bytes_total', len(payload))
+                if session.is_complete():
+                    return self._finalize_session(session)
+                session.flush_journal(self.journal)
+                return True
+            except ValueError as e:
+                # 범위를 벗어난 청크 등: 세션은 유지하고 이 청크만 거부
+                logger.error(f"Rejected chunk for upload {upload_id}: {e}")
+                return False
+            except Exception as e:
+                logger.error(f"Error writing chunk: {e}")
+                self._suspend_session(session)
+                return False
+
+    def get_upload_progress(self, upload_id=None, filename=None):
+        """업로드 진행 상황 반환 (바이트 단위). 세션이 없으면 None"""
+        session = self._get_session(upload_id, filename)
+        if session is None:
+            return None
+        with session.lock:
+            return session.progress()
+
+    def finalize_upload(self, filename, upload_id=None):
         """업로드 완료 및 파일 이동"""
-        try:
-            if not self.active_upload or not self.temp_file or self.active_upload['filename'] != filename:
+        session = self._get_session(upload_id, filename)
+        if session is None or session.filename != filename:
+            logger.error("Invalid upload session for finalization")
+            return False
+
+        with session.lock:
+            if session.closed:
                 logger.error("Invalid upload session for finalization")
                 return False
+            return self._finalize_session(session)
 
-            # 임시 파일 닫기
-            self.temp_file.close()
+    def _finalize_session(self, session):
+        """세션의 부분 파일을 최종 위치로 이동 (session.lock을 잡은 상태에서 호출)"""
+        try:
+            missing = session.received.missing(session.total_size)
+            if missing:
+                logger.error(f"Cannot finalize {session.filename}, missing ranges: {missing[:10]}")
+                return False
+
+            decode_error = session.decode_error()
+            if decode_error:
+                # 압축 스트림이 손상된 경우 이어받을 수 없으므로 폐기
+                logger.error(f"Cannot finalize {session.filename}: {decode_error}")
+                session.close()
+                self.journal.remove(session.key)
+                self._forget_session(session)
+                return False
+
+            # 부분 파일 닫기
+            session.close()
 
             # 최종 파일 경로 설정
-            final_path = os.path.join(self.upload_folder, filename)
+            final_path = os.path.join(self.upload_folder, session.filename)
+
+            # 같은 이름의 이전 파일을 변환 중이었다면 그 결과는 버리도록 파일을 옮기기 전에 순번 갱신
+            token = None
+            if self.transform_options is not None:
+                with self._transform_lock:
+                    token = next(self._transform_ids)
+                    self._transforming[session.filename] = token
+
+            # 부분 파일을 최종 위치로 이동
+            shutil.move(self.journal.part_path(session.key), final_path)
+            self.journal.remove(session.key, keep_part=True)
+            self._forget_session(session)
+
+            if token is not None:
+                # 변환은 오래 걸리므로 응답을 먼저 보내고 백그라운드에서 실행
+                transform_thread = threading.Thread(
+                    target=self._transform_upload, args=(session.filename, session.file_hash, token)
+                )
+                transform_thread.daemon = True
+                transform_thread.start()
+            else:
+                sha256 = self._check_hash(session.filename, session.file_hash)
+                # 같은 이름으로 예전에 변환했던 원본은 더 이상 이 파일의 원본이 아님
+                self._discard_original(session.filename)
+                self.manifest.record(session.filename, sha256)
+
+                # 레이어 수 등은 별도 프로세스에서 분석 (응답을 기다리게 하지 않음)
+                self.analyzer.submit(session.filename)
 
-            # 임시 파일을 최종 위치로 이동
-            shutil.move(self.temp_file.name, final_path)
-            
-            logger.info(f"Upload finalized: {filename}")
-            self._cleanup_upload()
+            elapsed = time.monotonic() - session.started_at
+            if elapsed > 0:
+                metrics.set('upload_last_throughput_bytes_per_second', round(session.session_bytes / elapsed))
+            metrics.inc('uploads_completed_total')
+
+            logger.info(f"Upload finalized: {session.filename}")
             return True
         except Exception as e:
             logger.error(f"Error finalizing upload: {e}")
-            self._cleanup_upload()
+            self._suspend_session(session)
             return False
 
-    def _cleanup_upload(self):
-        """업로드 세션 정리"""
+    def _check_hash(self, filename, client_hash):
+        """업로드된 파일의 SHA-256 계산. 클라이언트가 보낸 해시와 다르면 경고"""
+        sha256 = hash_file(self.get_file_path(filename))
+        if client_hash and client_hash.lower() != sha256:
+            logger.warning(f"Hash mismatch for {filename}: client {client_hash}, actual {sha256}")
+        return sha256
+
+    def _transform_upload(self, filename, client_hash, token):
+        """백그라운드 스레드: 원본 해시 계산, 변환 및 교체, manifest 기록, 분석 예약"""
+        try:
+            sha256 = self._check_hash(filename, client_hash)
+            stats = self._transform_file(filename, token)
+            with self._transform_lock:
+                if self._transforming.get(filename) != token:
+                    # 변환하는 동안 같은 이름으로 새 파일이 올라옴
+                    return
+                if stats is None:
+                    self._discard_original(filename)
+                # 변환했더라도 클라이언트가 가진 원본의 해시로 기록 (같은 파일 재업로드 확인용)
+                self.manifest.record(filename, sha256)
+                del self._transforming[filename]
+            self.analyzer.submit(filename)
+        except Exception as e:
+            logger.error(f"Error processing uploaded file {filename}: {e}")
+            with self._transform_lock:
+                if self._transforming.get(filename) == token:
+                    del self._transforming[filename]
+
+    def _transform_file(self, filename, token):
+        """업로드된 파일을 크기를 줄인 파일로 교체하고 원본은 originals 폴더에 보관.
+        실패하거나 줄어들지 않으면 원본을 그대로 사용. 변환 결과(stats) 반환, 교체하지 않았으면 None
+        """
+        final_path = self.get_file_path(filename)
+        original_path = os.path.join(self.originals_folder, filename)
+        temp_path = f"{original_path}.{token}.tmp"
+        started = time.monotonic()
         try:
-            if self.temp_file:
-                self.temp_file.close()
-                if os.path.exists(self.temp_file.name):
-                    os.unlink(self.temp_file.name)
+            os.makedirs(os.path.dirname(original_path), exist_ok=True)
+            # 변환은 CPU를 오래 쓰므로 분석과 같은 작업 프로세스에서 실행
+            stats = self.analyzer.run(transform_gcode, final_path, temp_path, self.transform_options)
+            if stats['output_bytes'] >= stats['input_bytes']:
+                os.remove(temp_path)
+                logger.info(f"Transform did not reduce {filename}, keeping original")
+                return None
+
+            with self._transform_lock:
+                if self._transforming.get(filename) != token:
+                    os.remove(temp_path)
+                    return None
+                if os.path.exists(original_path):
+                    os.unlink(original_path)
+                try:
+                    os.link(final_path, original_path)
+                except OSError:
+                    # 하드 링크를 지원하지 않는 파일 시스템
+                    shutil.copyfile(final_path, original_path)
+                shutil.move(temp_path, final_path)
+                self._save_transform_stats(filename, stats)
         except Exception as e:
-            logger.error(f"Error cleaning up upload: {e}")
+            logger.error(f"Error transforming {filename}, keeping original: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        metrics.observe('upload_transform_seconds', time.monotonic() - started)
+        metrics.inc('upload_transform_saved_bytes_total', stats['input_bytes'] - stats['output_bytes'])
+        logger.info(
+            f"Transformed {filename}: {stats['input_bytes']} -> {stats['output_bytes']} bytes, "
+            f"{stats['input_lines']} -> {stats['output_lines']} lines, {stats['arcs']} arcs"
+        )
+        return stats
+
+    def _transform_stats_path(self, filename):
+        return os.path.join(self.originals_folder, f"{filename}.json")
+
+    def _get_transform_stats(self, filename):
+        """변환 결과 반환, 없으면 None (이전 실행에서 변환한 파일은 처음 한 번만 파일에서 읽음)"""
+        if filename not in self._transform_stats:
+            try:
+                with open(self._transform_stats_path(filename), 'r') as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                stats = None
+            self._transform_stats[filename] = stats
+        return self._transform_stats[filename]
+
+    def _save_transform_stats(self, filename, stats):
+        self._transform_stats[filename] = stats
+        try:
+            stats_path = self._transform_stats_path(filename)
+            with open(stats_path + '.tmp', 'w') as f:
+                json.dump(stats, f, separators=(',', ':'))
+            os.replace(stats_path + '.tmp', stats_path)
+        except OSError as e:
+            logger.warning(f"Error saving transform stats for {filename}: {e}")
+
+    def _discard_original(self, filename):
+        self._transform_stats[filename] = None
+        for path in (os.path.join(self.originals_folder, filename), self._transform_stats_path(filename)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Error removing {path}: {e}")
+
+    def abort_upload(self, upload_id=None):
+        """업로드를 취소하고 부분 파일과 기록 삭제"""
+        session = self._get_session(upload_id)
+        if session is None:
+            return False
+        with session.lock:
+            try:
+                if not session.closed:
+                    session.close()
+                self.journal.remove(session.key)
+            except Exception as e:
+                logger.error(f"Error cleaning up upload: {e}")
+            finally:
+                self._forget_session(session)
+        return True
+
+    def suspend_upload(self, upload_id):
+        """업로드를 중단하되 이어받을 수 있도록 기록과 부분 파일은 유지"""
+        session = self._get_session(upload_id)
+        if session is None:
+            return
+        with session.lock:
+            self._suspend_session(session)
+
+    def _suspend_session(self, session):
+        """세션 중단 (session.lock을 잡은 상태에서 호출)"""
+        try:
+            if not session.closed:
+                session.flush_journal(self.journal, force=True)
+                logger.info(
+                    f"Upload of {session.filename} suspended at "
+                    f"{session.received.total()}/{session.total_size} bytes"
+                )
+        except Exception as e:
+            logger.error(f"Error suspending upload: {e}")
         finally:
-            self.active_upload = None
-            self.temp_file = None
\ No newline at end of file
+            if not session.closed:
+                session.close()
+            self._forget_session(session)
+
+    def _forget_session(self, session):
+        """세션 목록에서 제거"""
+        with self._sessions_lock:
+            self.sessions.pop(session.upload_id, None)
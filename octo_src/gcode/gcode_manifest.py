@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger('mie_printer.gcode')
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """파일의 SHA-256 해시 계산"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GCodeManifest:
+    """업로드 폴더의 파일명 -> SHA-256 목록
+
+    항목마다 크기와 수정 시각을 함께 저장해서, 파일이 바뀌었으면 그 항목은
+    무효로 취급한다. 업로드가 끝날 때마다 해당 파일만 갱신한다.
+    """
+
+    def __init__(self, path, upload_folder):
+        self.path = path
+        self.upload_folder = upload_folder
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        # 백그라운드에서 해시를 계산할 파일 (hash_later)
+        self._pending = set()
+        self._hashing = False
+
+    def _load(self):
+        """목록 파일 읽기"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring broken manifest {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        """목록 파일 저장 (self._lock을 잡은 상태에서 호출)"""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(temp_path, self.path)
+
+    def _stat(self, filename):
+        """(크기, 수정 시각) 반환. 파일이 없으면 None"""
+        try:
+            st = os.stat(os.path.join(self.upload_folder, filename))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _is_valid(self, filename, entry):
+        """항목이 현재 파일 상태와 일치하는지 확인"""
+        stat = self._stat(filename)
+        return stat is not None and [entry['size'], entry['mtime']] == list(stat)
+
+    def record(self, filename, sha256=None):
+        """파일 항목 갱신. 해시가 없으면 파일을 읽어 계산"""
+        stat = self._stat(filename)
+        if stat is None:
+            return None
+        if sha256 is None:
+            sha256 = hash_file(os.path.join(self.upload_folder, filename))
+        with self._lock:
+            self._entries[filename] = {'sha256': sha256, 'size': stat[0], 'mtime': stat[1]}
+            self._save()
+        return sha256
+
+    def remove(self, filename):
+        """파일 항목 삭제"""
+        with self._lock:
+            if self._entries.pop(filename, None) is not None:
+                self._save()
+
+    def hash_of(self, filename, compute=True):
+        """파일의 해시 반환. 목록에 없거나 파일이 바뀌었으면 다시 계산"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None and self._is_valid(filename, entry):
+                return entry['sha256']
+        if not compute or self._stat(filename) is None:
+            return None
+        return self.record(filename)
+
+    def hash_later(self, filename):
+        """파일 해시를 백그라운드 스레드에서 계산하도록 예약 (이미 예약됐으면 무시)"""
+        with self._lock:
+            self._pending.add(filename)
+            if self._hashing:
+                return
+            self._hashing = True
+        thread = threading.Thread(target=self._hash_pending)
+        thread.daemon = True
+        thread.start()
+
+    def _hash_pending(self):
+        """예약된 파일이 없을 때까지 해시 계산"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._hashing = False
+                    return
+                filename = self._pending.pop()
+            try:
+                self.hash_of(filename)
+            except OSError as e:
+                logger.warning(f"Could not hash {filename}: {e}")
+
+    def lookup(self, sha256):
+        """해시가 같은 파일명 반환, 없으면 None"""
+        with self._lock:
+            for filename, entry in self._entries.items():
+                if entry['sha256'] == sha256 and self._is_valid(filename, entry):
+                    return filename
+        return None
+
+    def refresh(self):
+        """업로드 폴더를 훑어 목록에 없거나 바뀐 파일만 해시 계산, 사라진 파일은 제거"""
+        try:
+            names = [
+                entry.name for entry in os.scandir(self.upload_folder)
+                if entry.is_file() and not entry.name.startswith('.')
+            ]
+        except OSError as e:
+            logger.error(f"Error scanning upload folder: {e}")
+            return
+
+        with self._lock:
+            stale = [name for name in self._entries if name not in names]
+            for name in stale:
+                del self._entries[name]
+            if stale:
+                self._save()
+
+        for name in names:
+            try:
+                self.hash_of(name)
+            except OSError as e:
+                logger.warning(f"Could not hash {name}: {e}")
+        logger.info(f"G-code manifest refreshed ({len(names)} files)")
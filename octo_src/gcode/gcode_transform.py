@@ -0,0 +1,380 @@
+import os
+import math
+
+# 원호로 바꿀 수 있는 최대 반지름 (mm). 이보다 크면 직선에 가까워 정밀도 문제가 생김
+MAX_ARC_RADIUS = 1000.0
+
+# 연속된 구간의 길이당 압출량이 평균에서 이 비율 이상 벗어나면 합치지 않음
+EXTRUSION_RATIO_TOLERANCE = 0.05
+
+# 원호 하나가 넘지 않을 회전각 (전체 원은 펌웨어에서 다르게 해석되므로 제외)
+MAX_ARC_ANGLE = 2 * math.pi * 0.95
+
+# 헤드를 움직이거나 이송 속도를 바꾸지 않는 G 명령 (나머지 G/T 명령 뒤에는 위치와 속도를 모르는 상태로 봄)
+STATIONARY_CODES = frozenset(('G4', 'G20', 'G21', 'G90', 'G91', 'G92'))
+
+
+def _format_number(value, digits):
+    """소수 digits자리로 반올림하고 뒤쪽 0 제거 ('-0'은 '0')"""
+    text = f"{value:.{digits}f}".rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+class GCodeTransformer:
+    """G-code를 줄 단위로 읽으면서 크기를 줄여 새 파일로 기록
+
+    - 주석과 불필요한 공백 제거
+    - 현재 위치와 같은 좌표, 바뀌지 않은 F 등 중복된 인자 제거, 남는 것이 없는 이동은 삭제
+    - 좌표는 precision, 압출량은 extrusion_precision 자리로 반올림
+    - 짧은 압출 구간이 이어지면 arc_tolerance 안에서 하나의 직선이나 G2/G3 원호로 합침
+
+    위치를 모르는 동안(파일 시작, G28 이후)은 좌표를 지우지 않으며,
+    메모리에는 합치는 중인 구간(최대 max_arc_segments개)만 보관한다.
+    """
+
+    def __init__(self, precision=3, extrusion_precision=5, fit_arcs=True, arc_tolerance=0.01,
+                 min_arc_segments=4, max_arc_segments=64, max_segment_length=5.0):
+        self.precision = int(precision)
+        self.extrusion_precision = int(extrusion_precision)
+        self.fit_arcs = fit_arcs
+        self.arc_tolerance = float(arc_tolerance)
+        self.min_arc_segments = int(min_arc_segments)
+        self.max_arc_segments = int(max_arc_segments)
+        self.max_segment_length = float(max_segment_length)
+
+    def _reset(self, output):
+        self._write = output.write
+        # None은 위치를 모르는 상태
+        self._position = {'X': None, 'Y': None, 'Z': None, 'E': None}
+        self._feedrate = None
+        self._absolute = True
+        self._relative_e = False
+        # 합치는 중인 구간: 시작점, [(x, y, de, 원래 줄)], 시작 시 E 위치, 현재 근사 결과
+        self._run_start = None
+        self._run = []
+        self._run_start_e = None
+        self._fit = None
+        self.stats = {'output_lines': 0, 'dropped_lines': 0, 'arcs': 0, 'lines_merged': 0, 'segments_merged': 0}
+
+    def transform(self, source_path, target_path):
+        """source_path를 변환해서 target_path에 기록하고 줄 수/크기 변화 반환"""
+        input_lines = 0
+        with open(source_path, 'r', encoding='utf-8', errors='surrogateescape') as source, \
+                open(target_path, 'w', encoding='utf-8', errors='surrogateescape') as target:
+            self._reset(target)
+            for line in source:
+                input_lines += 1
+                self._process(line)
+            self._flush_run()
+
+        stats = dict(self.stats)
+        stats['input_lines'] = input_lines
+        stats['input_bytes'] = os.path.getsize(source_path)
+        stats['output_bytes'] = os.path.getsize(target_path)
+        return stats
+
+    def _emit(self, line):
+        self._write(line + '\n')
+        self.stats['output_lines'] += 1
+
+    def _process(self, line):
+        content = line.split(';', 1)[0].strip()
+        if not content:
+            self.stats['dropped_lines'] += 1
+            return
+        words = content.split()
+        code = words[0].upper()
+
+        if code in ('G0', 'G1'):
+            self._process_move(code, words)
+            return
+
+        self._flush_run()
+        if code in ('G2', 'G3'):
+            # 원래 있던 원호는 그대로 두고 끝점과 속도만 따라감
+            self._track_move(self._parse(words))
+        elif code == 'G90':
+            self._absolute, self._relative_e = True, False
+        elif code == 'G91':
+            self._absolute, self._relative_e = False, True
+        elif code == 'M82':
+            self._relative_e = False
+        elif code == 'M83':
+            self._relative_e = True
+        elif code == 'G92':
+            values = self._parse(words)
+            if values is None:
+                self._position = {axis: None for axis in self._position}
+            elif not values:
+                self._position = {axis: 0.0 for axis in self._position}
+            else:
+                self._position.update({axis: value for axis, value in values.items() if axis in self._position})
+        elif code[0] in 'GNT' and code not in STATIONARY_CODES:
+            # G28 등 원점 위치나 이동 경로를 알 수 없는 명령, 줄 번호가 붙은 명령
+            self._track_move(None)
+        # 메시지나 파일명이 들어가는 명령도 있으므로 주석과 앞뒤 공백만 제거
+        self._emit(content)
+
+    @staticmethod
+    def _parse(words):
+        """{'X': 10.0, ...}. 숫자가 아닌 인자가 있으면 None (변환하지 않고 그대로 내보냄)"""
+        values = {}
+        for word in words[1:]:
+            try:
+                values[word[0].upper()] = float(word[1:])
+            except (ValueError, IndexError):
+                return None
+        return values
+
+    def _track_move(self, values):
+        """변환하지 않고 내보내는 이동 뒤의 위치와 이송 속도 갱신 (values가 None이면 모두 모르는 상태로)"""
+        position = self._position
+        if values is None:
+            self._position = {axis: None for axis in position}
+            self._feedrate = None
+            return
+        for axis in ('X', 'Y', 'Z', 'E'):
+            if axis not in values:
+                continue
+            if self._relative_e if axis == 'E' else not self._absolute:
+                if position[axis] is not None:
+                    position[axis] += values[axis]
+            else:
+                position[axis] = values[axis]
+        if 'F' in values:
+            # 원래 값 그대로 내보냈으므로 정수가 아니면 이후 F를 지우지 않도록 모르는 상태로 둠
+            feedrate = values['F']
+            self._feedrate = round(feedrate) if feedrate == round(feedrate) else None
+
+    def _process_move(self, code, words):
+        values = self._parse(words)
+        if values is None or any(letter not in 'XYZEF' for letter in values):
+            # 줄 번호나 체크섬 등이 붙은 이동은 그대로 내보냄
+            self._flush_run()
+            self._track_move(None)
+            self._emit(' '.join(words))
+            return
+
+        position = self._position
+        out = []
+        start = dict(position)
+        for axis in ('X', 'Y', 'Z'):
+            if axis not in values:
+                continue
+            value = values[axis]
+            if self._absolute:
+                value = round(value, self.precision)
+                if position[axis] is not None and value == position[axis]:
+                    continue
+                position[axis] = value
+            else:
+                if value == 0:
+                    continue
+                if position[axis] is not None:
+                    position[axis] += value
+            out.append(axis + _format_number(value, self.precision))
+
+        delta_e = 0.0
+        if 'E' in values:
+            value = values['E']
+            if self._relative_e:
+                value = round(value, self.extrusion_precision)
+                if value != 0:
+                    delta_e = value
+                    if position['E'] is not None:
+                        position['E'] += value
+                    out.append('E' + _format_number(value, self.extrusion_precision))
+            else:
+                value = round(value, self.extrusion_precision)
+                if position['E'] is None or value != position['E']:
+                    if position['E'] is not None:
+                        delta_e = value - position['E']
+                    position['E'] = value
+                    out.append('E' + _format_number(value, self.extrusion_precision))
+
+        has_feedrate = False
+        if 'F' in values:
+            feedrate = round(values['F'])
+            if feedrate != self._feedrate:
+                self._feedrate = feedrate
+                has_feedrate = True
+                out.append(f"F{feedrate}")
+
+        if not out:
+            # 이동 거리도, 압출도, 속도 변화도 없는 줄
+            self.stats['dropped_lines'] += 1
+            return
+
+        line = code + ' ' + ' '.join(out)
+        if self.fit_arcs and code == 'G1' and not has_feedrate and self._can_merge(start, delta_e):
+            self._add_segment(start, delta_e, line)
+            return
+        self._flush_run()
+        self._emit(line)
+
+    def _can_merge(self, start, delta_e):
+        """XY 평면에서 압출하며 움직이는 짧은 절대 좌표 이동인지 확인"""
+        position = self._position
+        if not self._absolute or delta_e <= 0:
+            return False
+        if None in (start['X'], start['Y'], start['Z'], position['X'], position['Y']):
+            return False
+        if position['Z'] != start['Z']:
+            return False
+        length = math.hypot(position['X'] - start['X'], position['Y'] - start['Y'])
+        return 0 < length <= self.max_segment_length
+
+    def _add_segment(self, start, delta_e, line):
+        """합치는 중인 구간에 이동 추가. 더 이상 하나로 맞출 수 없으면 이전 구간을 내보내고 새로 시작"""
+        point = (self._position['X'], self._position['Y'])
+        if not self._run:
+            self._run_start = (start['X'], start['Y'])
+            self._run_start_e = start['E']
+        previous = (self._run[-1][0], self._run[-1][1]) if self._run else self._run_start
+        self._run.append((point[0], point[1], delta_e, line))
+
+        # 지금의 직선/원에 새 점만 맞춰 보고, 벗어나면 구간 전체로 다시 맞춤
+        if len(self._run) >= 3 and not self._extend_fit(previous, point, delta_e):
+            fit = self._fit_run(self._run_start, self._run)
+            if fit is None:
+                last = self._run.pop()
+                self._flush_run()
+                self._run_start = (start['X'], start['Y'])
+                self._run_start_e = start['E']
+                self._run.append(last)
+            else:
+                self._fit = fit
+        if len(self._run) >= self.max_arc_segments:
+            self._flush_run()
+
+    def _extend_fit(self, a, b, de):
+        """현재 근사(self._fit)에 구간 a -> b가 그대로 들어맞으면 근사를 갱신하고 True"""
+        fit = self._fit
+        if fit is None:
+            return False
+        tolerance = self.arc_tolerance
+        (ax, ay), (bx, by) = a, b
+        length = math.hypot(bx - ax, by - ay)
+        ratio = (fit['e'] + de) / (fit['length'] + length)
+        if abs(de / length - ratio) > ratio * EXTRUSION_RATIO_TOLERANCE:
+            return False
+
+        if fit['kind'] == 'line':
+            sx, sy = self._run_start
+            along = (bx - sx) * fit['ux'] + (by - sy) * fit['uy']
+            # 끝점을 옮기면 직선도 조금 움직이므로 허용 오차의 절반만 사용
+            if along <= fit['along'] or abs((bx - sx) * fit['uy'] - (by - sy) * fit['ux']) > tolerance / 2:
+                return False
+            fit['along'] = along
+        else:
+            angle = self._arc_step(fit, a, b, length)
+            if angle is None or fit['angle'] + angle > MAX_ARC_ANGLE:
+                return False
+            fit['angle'] += angle
+        fit['length'] += length
+        fit['e'] += de
+        return True
+
+    def _arc_step(self, fit, a, b, length):
+        """원 위에서 a -> b 구간이 허용 오차 안이고 회전 방향이 같으면 회전각, 아니면 None"""
+        cx, cy, radius = fit['cx'], fit['cy'], fit['radius']
+        (ax, ay), (bx, by) = a, b
+        if abs(math.hypot(bx - cx, by - cy) - radius) > self.arc_tolerance:
+            return None
+        # 원호와 원래 직선 구간 사이의 최대 거리
+        if length / 2 >= radius or radius - math.sqrt(radius * radius - length * length / 4) > self.arc_tolerance:
+            return None
+        cross = (ax - cx) * (by - cy) - (ay - cy) * (bx - cx)
+        if (cross > 0) != (fit['direction'] > 0):
+            return None
+        return 2 * math.asin(length / (2 * radius))
+
+    def _fit_run(self, start, run):
+        """구간 전체를 하나의 직선이나 원호로 근사한 결과 (dict), 불가능하면 None"""
+        tolerance = self.arc_tolerance
+        points = [start] + [(x, y) for x, y, _, _ in run]
+
+        # 길이당 압출량이 일정해야 합쳐도 압출 분포가 같음
+        lengths = [math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:])]
+        total_length = sum(lengths)
+        total_e = sum(de for _, _, de, _ in run)
+        ratio = total_e / total_length
+        for length, (_, _, de, _) in zip(lengths, run):
+            if abs(de / length - ratio) > ratio * EXTRUSION_RATIO_TOLERANCE:
+                return None
+
+        (x0, y0), (xn, yn) = points[0], points[-1]
+        chord = math.hypot(xn - x0, yn - y0)
+        if chord > 0:
+            ux, uy = (xn - x0) / chord, (yn - y0) / chord
+            along = 0.0
+            for x, y in points[1:]:
+                # 되돌아가는 이동은 직선 하나로 합칠 수 없음
+                step = (x - x0) * ux + (y - y0) * uy
+                if step <= along or abs((x - x0) * uy - (y - y0) * ux) > tolerance:
+                    break
+                along = step
+            else:
+                return {'kind': 'line', 'ux': ux, 'uy': uy, 'along': along, 'length': total_length, 'e': total_e}
+
+        # 처음, 중간, 마지막 점을 지나는 원
+        xm, ym = points[len(points) // 2]
+        d = 2 * (x0 * (ym - yn) + xm * (yn - y0) + xn * (y0 - ym))
+        if abs(d) < 1e-12:
+            return None
+        cx = ((x0 * x0 + y0 * y0) * (ym - yn) + (xm * xm + ym * ym) * (yn - y0) + (xn * xn + yn * yn) * (y0 - ym)) / d
+        cy = ((x0 * x0 + y0 * y0) * (xn - xm) + (xm * xm + ym * ym) * (x0 - xn) + (xn * xn + yn * yn) * (xm - x0)) / d
+        radius = math.hypot(x0 - cx, y0 - cy)
+        if radius > MAX_ARC_RADIUS:
+            return None
+
+        cross = (x0 - cx) * (points[1][1] - cy) - (y0 - cy) * (points[1][0] - cx)
+        fit = {
+            'kind': 'arc', 'cx': cx, 'cy': cy, 'radius': radius, 'direction': 1 if cross > 0 else -1,
+            'angle': 0.0, 'length': total_length, 'e': total_e
+        }
+        for a, b, length in zip(points, points[1:], lengths):
+            angle = self._arc_step(fit, a, b, length)
+            if angle is None:
+                return None
+            fit['angle'] += angle
+        if fit['angle'] > MAX_ARC_ANGLE:
+            return None
+        return fit
+
+    def _flush_run(self):
+        """합치는 중인 구간을 직선/원호 하나로, 맞지 않으면 원래 줄들로 내보냄"""
+        run, fit = self._run, self._fit
+        if not run:
+            return
+        self._run, self._fit = [], None
+        if fit is None or len(run) < self.min_arc_segments:
+            for _, _, _, line in run:
+                self._emit(line)
+            return
+
+        x, y = run[-1][0], run[-1][1]
+        total_e = sum(de for _, _, de, _ in run)
+        if self._relative_e:
+            e = _format_number(total_e, self.extrusion_precision)
+        else:
+            e = _format_number(self._run_start_e + total_e, self.extrusion_precision)
+        words = [f"X{_format_number(x, self.precision)}", f"Y{_format_number(y, self.precision)}"]
+
+        if fit['kind'] == 'line':
+            self._emit(' '.join(['G1'] + words + [f"E{e}"]))
+            self.stats['lines_merged'] += 1
+        else:
+            start_x, start_y = self._run_start
+            words += [
+                f"I{_format_number(fit['cx'] - start_x, self.precision)}",
+                f"J{_format_number(fit['cy'] - start_y, self.precision)}"
+            ]
+            self._emit(' '.join(['G2' if fit['direction'] < 0 else 'G3'] + words + [f"E{e}"]))
+            self.stats['arcs'] += 1
+        self.stats['segments_merged'] += len(run)
+
+
+def transform_gcode(source_path, target_path, options=None):
+    """GCodeTransformer로 파일 변환 (작업 프로세스에서 호출할 수 있도록 모듈 함수로 제공)"""
+    return GCodeTransformer(**(options or {})).transform(source_path, target_path)
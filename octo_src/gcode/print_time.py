@@ -0,0 +1,132 @@
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy가 없으면 같은 계산을 순수 파이썬으로 (느림)
+    np = None
+
+# 프린터 프로필 기본값 (config.json의 printer.kinematics로 덮어씀). 속도는 mm/s, 가속도는 mm/s²
+DEFAULT_KINEMATICS = {
+    'max_feedrate': {'x': 200.0, 'y': 200.0, 'z': 12.0, 'e': 120.0},
+    'acceleration': 1000.0,
+    'travel_acceleration': 1500.0,
+    'retract_acceleration': 1500.0,
+    # 이동과 이동 사이에서 멈추지 않고 지나갈 수 있는 속도 (jerk/junction deviation 근사)
+    'junction_speed': 8.0,
+    # 파일에 F가 나오기 전의 이송 속도 (mm/min)
+    'default_feedrate': 3000.0
+}
+
+# 이만큼 이동을 모은 뒤 한 번에 계산 (메모리 사용량 제한)
+CHUNK_MOVES = 65536
+
+
+def load_kinematics(profile=None):
+    """설정의 프린터 프로필을 기본값과 합침"""
+    kinematics = dict(DEFAULT_KINEMATICS)
+    kinematics['max_feedrate'] = dict(DEFAULT_KINEMATICS['max_feedrate'])
+    for key, value in (profile or {}).items():
+        if key == 'max_feedrate':
+            kinematics['max_feedrate'].update({axis: float(v) for axis, v in value.items()})
+        else:
+            kinematics[key] = float(value)
+    return kinematics
+
+
+class MoveTimer:
+    """이동마다 사다리꼴 속도 곡선(가속-등속-감속)으로 걸리는 시간을 계산해 레이어별로 합산
+
+    각 이동은 junction_speed(이송 속도보다 크면 이송 속도)로 시작하고 끝난다고 보고,
+    이송 속도는 축별 최대 속도를 넘지 않도록 줄인다. 앞뒤 이동을 함께 보는 lookahead는 하지 않는다.
+    이동은 CHUNK_MOVES개씩 모아서 numpy로 한 번에 계산한다.
+    """
+
+    def __init__(self, kinematics=None):
+        self.kinematics = load_kinematics(kinematics)
+        # 이동마다 (dx, dy, dz, de, feedrate, layer) 6개 값을 이어 붙여 저장
+        self._moves = array('d')
+        # 레이어 번호(0은 첫 레이어 전)별 소요 시간
+        self.layer_times = [0.0]
+
+    def add(self, dx, dy, dz, de, feedrate, layer):
+        """이동 하나 추가 (각 축 이동량 mm, feedrate mm/min, layer는 현재 레이어 번호)"""
+        self._moves.extend((dx, dy, dz, de, feedrate, layer))
+        if len(self._moves) >= CHUNK_MOVES * 6:
+            self.flush()
+
+    def add_time(self, seconds, layer):
+        """이동이 아닌 대기 시간 (G4 등)"""
+        self._grow(layer)
+        self.layer_times[layer] += seconds
+
+    def _grow(self, layer):
+        if layer >= len(self.layer_times):
+            self.layer_times.extend([0.0] * (layer + 1 - len(self.layer_times)))
+
+    def flush(self):
+        """모아 둔 이동의 시간을 계산해 레이어별 합계에 반영"""
+        if not self._moves:
+            return
+        self._grow(int(self._moves[-1]))
+        if np is not None:
+            moves = np.frombuffer(self._moves, dtype=np.float64).reshape(-1, 6)
+            times = self._move_times_numpy(*moves[:, :5].T)
+            totals = np.bincount(moves[:, 5].astype(np.int64), weights=times)
+            for layer, total in enumerate(totals.tolist()):
+                self.layer_times[layer] += total
+        else:
+            for layer, seconds in self._move_times_python():
+                self.layer_times[layer] += seconds
+        self._moves = array('d')
+
+    def _move_times_numpy(self, dx, dy, dz, de, feedrate):
+        k = self.kinematics
+        xyz = np.sqrt(dx * dx + dy * dy + dz * dz)
+        e_only = xyz == 0
+        distance = np.where(e_only, np.abs(de), xyz)
+
+        speed = feedrate / 60.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for delta, axis in ((dx, 'x'), (dy, 'y'), (dz, 'z'), (de, 'e')):
+                # 축 성분이 그 축의 최대 속도를 넘지 않도록 전체 속도 제한
+                limit = k['max_feedrate'][axis] * distance / np.abs(delta)
+                speed = np.where(delta != 0, np.minimum(speed, limit), speed)
+
+        accel = np.where(e_only, k['retract_acceleration'],
+                         np.where(de > 0, k['acceleration'], k['travel_acceleration']))
+        entry = np.minimum(speed, k['junction_speed'])
+        ramp = (speed * speed - entry * entry) / accel
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trapezoid = 2 * (speed - entry) / accel + (distance - ramp) / speed
+            triangle = 2 * (np.sqrt(entry * entry + accel * distance) - entry) / accel
+        times = np.where(distance >= ramp, trapezoid, triangle)
+        return np.where((distance > 0) & (speed > 0), times, 0.0)
+
+    def _move_times_python(self):
+        """(레이어, 소요 시간) 생성"""
+        k = self.kinematics
+        max_feedrate = k['max_feedrate']
+        moves = self._moves
+        for i in range(0, len(moves), 6):
+            dx, dy, dz, de, feedrate, layer = moves[i:i + 6]
+            layer = int(layer)
+            xyz = math.sqrt(dx * dx + dy * dy + dz * dz)
+            distance = xyz if xyz else abs(de)
+            speed = feedrate / 60.0
+            if not distance or speed <= 0:
+                continue
+            for delta, axis in ((dx, 'x'), (dy, 'y'), (dz, 'z'), (de, 'e')):
+                if delta:
+                    speed = min(speed, max_feedrate[axis] * distance / abs(delta))
+            if not xyz:
+                accel = k['retract_acceleration']
+            else:
+                accel = k['acceleration'] if de > 0 else k['travel_acceleration']
+            entry = min(speed, k['junction_speed'])
+            ramp = (speed * speed - entry * entry) / accel
+            if distance >= ramp:
+                yield layer, 2 * (speed - entry) / accel + (distance - ramp) / speed
+            else:
+                yield layer, 2 * (math.sqrt(entry * entry + accel * distance) - entry) / accel
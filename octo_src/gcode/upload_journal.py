@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger('mie_printer.gcode')
+
+
+class UploadJournal:
+    """중단된 업로드를 이어받기 위한 세션 기록
+
+    세션마다 부분 파일(<key>.part)과 수신 구간 기록(<key>.json)을 보관한다.
+    키는 파일명, 전체 크기, 클라이언트가 보낸 해시로 만든다.
+    """
+
+    def __init__(self, folder, max_age=7 * 24 * 3600):
+        self.folder = folder
+        self.max_age = max_age
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+            logger.info(f"Created upload journal folder: {self.folder}")
+
+    @staticmethod
+    def make_key(filename, total_size, file_hash=None):
+        """세션 키 생성"""
+        source = f"{filename}\0{int(total_size)}\0{file_hash or ''}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def part_path(self, key):
+        """부분 파일 경로"""
+        return os.path.join(self.folder, f"{key}.part")
+
+    def record_path(self, key):
+        """구간 기록 파일 경로"""
+        return os.path.join(self.folder, f"{key}.json")
+
+    def load(self, key):
+        """세션 기록 읽기. 부분 파일이 없거나 기록이 손상되었으면 None"""
+        try:
+            if not os.path.exists(self.part_path(key)):
+                return None
+            with open(self.record_path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring broken upload journal {key}: {e}")
+            return None
+
+    def save(self, key, record):
+        """세션 기록 저장 (임시 파일에 쓴 뒤 교체하여 원자적으로 갱신)"""
+        record = dict(record, updated_at=time.time())
+        temp_path = self.record_path(key) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(temp_path, self.record_path(key))
+
+    def remove(self, key, keep_part=False):
+        """세션 기록 및 부분 파일 삭제"""
+        paths = [self.record_path(key)]
+        if not keep_part:
+            paths.append(self.part_path(key))
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def purge_stale(self):
+        """max_age보다 오래된 세션 정리"""
+        cutoff = time.time() - self.max_age
+        try:
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    logger.info(f"Removed stale upload journal file: {entry.name}")
+        except OSError as e:
+            logger.error(f"Error purging upload journal: {e}")
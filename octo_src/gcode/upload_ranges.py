@@ -0,0 +1,60 @@
+from bisect import bisect_left, bisect_right
+
+
+class ByteRanges:
+    """수신된 바이트 구간 집합 (겹치지 않는 [start, end) 구간을 정렬 상태로 유지)"""
+
+    def __init__(self, ranges=None):
+        self._starts = []
+        self._ends = []
+        for start, end in ranges or []:
+            self.add(start, end)
+
+    def add(self, start, end):
+        """구간 추가. 인접하거나 겹치는 구간은 병합"""
+        if end <= start:
+            return
+        # start 이상에서 끝나는 첫 구간부터 end 이하에서 시작하는 마지막 구간까지 병합
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def total(self):
+        """수신된 전체 바이트 수"""
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    def contiguous_end(self):
+        """0부터 끊김 없이 수신된 바이트 수 (누적 ACK 값)"""
+        if self._starts and self._starts[0] == 0:
+            return self._ends[0]
+        return 0
+
+    def covers(self, start, end):
+        """[start, end) 구간을 모두 수신했는지 확인"""
+        index = bisect_right(self._starts, start) - 1
+        return index >= 0 and self._ends[index] >= end
+
+    def missing(self, total_size):
+        """[0, total_size) 중 아직 수신하지 못한 구간 목록"""
+        gaps = []
+        position = 0
+        for start, end in zip(self._starts, self._ends):
+            if start >= total_size:
+                break
+            if start > position:
+                gaps.append([position, start])
+            position = max(position, end)
+        if position < total_size:
+            gaps.append([position, total_size])
+        return gaps
+
+    def to_list(self):
+        """JSON 직렬화용 구간 목록"""
+        return [[start, end] for start, end in zip(self._starts, self._ends)]
+
+    def __len__(self):
+        return len(self._starts)
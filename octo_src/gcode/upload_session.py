@@ -0,0 +1,189 @@
+import os
+import time
+import zlib
+import threading
+from .upload_ranges import ByteRanges
+from ..utils.metrics import metrics
+
+# 업로드 기록을 디스크에 반영하는 주기 (SD 카드 쓰기 횟수 제한)
+JOURNAL_FLUSH_BYTES = 256 * 1024
+JOURNAL_FLUSH_INTERVAL = 5.0
+
+# 압축 해제 시 한 번에 만드는 최대 출력 크기 (압축률과 관계없이 메모리 사용량 고정)
+DECOMPRESS_BLOCK_SIZE = 64 * 1024
+
+# 코덱 이름 -> zlib wbits
+CODECS = {
+    'zlib': zlib.MAX_WBITS,
+    'deflate': -zlib.MAX_WBITS,
+    'gzip': zlib.MAX_WBITS | 16,
+}
+CODEC_NONE = 'none'
+
+
+def negotiate_codec(requested):
+    """클라이언트가 요청한 코덱(문자열 또는 선호 순서 목록) 중 지원하는 첫 코덱 반환"""
+    if not requested:
+        return CODEC_NONE
+    if isinstance(requested, str):
+        requested = [requested]
+    for codec in requested:
+        codec = str(codec).lower()
+        if codec in CODECS or codec == CODEC_NONE:
+            return codec
+    return CODEC_NONE
+
+
+class UploadSession:
+    """업로드 하나의 상태 (부분 파일, 수신 구간, 세션별 잠금)
+
+    압축 업로드는 전송 바이트(압축 상태) 기준으로 구간을 추적하고, 앞에서부터
+    이어진 부분만 스트리밍으로 풀어서 파일에 기록한다. 순서가 바뀌어 도착한
+    청크는 max_pending_bytes까지만 메모리에 보관한다.
+    """
+
+    def __init__(self, upload_id, key, filename, total_size, part_path,
+                 chunk_size, window, file_hash=None, ranges=None,
+                 codec=CODEC_NONE, raw_size=None, max_pending_bytes=1024 * 1024):
+        self.upload_id = upload_id
+        self.key = key
+        self.filename = filename
+        self.total_size = int(total_size)
+        self.file_hash = file_hash
+        self.chunk_size = int(chunk_size)
+        self.window = window
+        self.codec = codec
+        self.raw_size = int(raw_size) if raw_size else None
+        self.received = ByteRanges(ranges)
+        self.lock = threading.Lock()
+        self.closed = False
+        self._unflushed_bytes = 0
+        self._flushed_at = time.monotonic()
+        # 이번 연결에서 받은 바이트 수와 시작 시각 (전송 속도 계산용)
+        self.started_at = self._flushed_at
+        self.session_bytes = 0
+
+        # 압축 해제 상태
+        self.decoded_size = 0
+        self._fed = 0
+        self._pending = {}
+        self._pending_bytes = 0
+        self.max_pending_bytes = max_pending_bytes
+        self._decompressor = zlib.decompressobj(CODECS[codec]) if codec in CODECS else None
+
+        mode = 'r+b' if ranges is not None else 'w+b'
+        self.file = open(part_path, mode, buffering=0)
+
+    @property
+    def compressed(self):
+        return self._decompressor is not None
+
+    def write(self, offset, payload):
+        """offset 위치에 청크 기록. 순서가 바뀌어 도착해도 됨"""
+        end = offset + len(payload)
+        if offset < 0 or end > self.total_size:
+            raise ValueError(f"Chunk [{offset}, {end}) outside of file size {self.total_size}")
+        if self.compressed:
+            self._write_compressed(offset, payload)
+        else:
+            os.pwrite(self.file.fileno(), payload, offset)
+            self.received.add(offset, end)
+        self._unflushed_bytes += len(payload)
+        self.session_bytes += len(payload)
+
+    def _write_compressed(self, offset, payload):
+        """압축 청크 처리: 이어지는 부분은 바로 풀고, 앞선 구간이 비어 있으면 보류"""
+        end = offset + len(payload)
+        if self.received.covers(offset, end):
+            return
+
+        if offset > self._fed:
+            if self._pending_bytes + len(payload) > self.max_pending_bytes:
+                raise ValueError("Out-of-order buffer full, retransmit later")
+            self._pending[offset] = payload
+            self._pending_bytes += len(payload)
+            self.received.add(offset, end)
+            return
+
+        self._feed(payload[self._fed - offset:])
+        self.received.add(offset, end)
+
+        # 보류 중인 청크 중 이제 이어지는 것들을 순서대로 처리
+        while True:
+            ready = sorted(o for o in self._pending if o <= self._fed)
+            if not ready:
+                break
+            for pending_offset in ready:
+                pending = self._pending.pop(pending_offset)
+                self._pending_bytes -= len(pending)
+                if pending_offset + len(pending) > self._fed:
+                    self._feed(pending[self._fed - pending_offset:])
+
+    def _feed(self, data):
+        """압축 데이터를 풀어서 파일 끝에 기록 (출력은 DECOMPRESS_BLOCK_SIZE 단위)"""
+        self._fed += len(data)
+        while data and not self._decompressor.eof:
+            output = self._decompressor.decompress(data, DECOMPRESS_BLOCK_SIZE)
+            if output:
+                os.pwrite(self.file.fileno(), output, self.decoded_size)
+                self.decoded_size += len(output)
+            data = self._decompressor.unconsumed_tail
+
+    def is_complete(self):
+        """모든 바이트를 수신했는지 확인"""
+        return self.received.contiguous_end() >= self.total_size
+
+    def decode_error(self):
+        """압축 스트림이 올바르게 끝났는지 확인. 문제가 있으면 오류 메시지 반환"""
+        if not self.compressed:
+            return None
+        if not self._decompressor.eof:
+            return "Compressed stream is truncated"
+        if self.raw_size is not None and self.decoded_size != self.raw_size:
+            return f"Decompressed size {self.decoded_size} does not match raw_size {self.raw_size}"
+        return None
+
+    def flush_journal(self, journal, force=False):
+        """수신 구간 기록 저장. 일정 바이트 수나 시간이 지났을 때만 기록"""
+        now = time.monotonic()
+        if not force and self._unflushed_bytes < JOURNAL_FLUSH_BYTES \
+                and now - self._flushed_at < JOURNAL_FLUSH_INTERVAL:
+            return
+
+        # 기록보다 데이터가 먼저 디스크에 반영되어야 전원이 꺼져도 구간 정보가 맞음
+        os.fdatasync(self.file.fileno())
+        journal.save(self.key, {
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'file_hash': self.file_hash,
+            'codec': self.codec,
+            'ranges': self.received.to_list()
+        })
+        self._unflushed_bytes = 0
+        self._flushed_at = time.monotonic()
+        metrics.observe('upload_journal_flush_seconds', self._flushed_at - now)
+
+    def progress(self):
+        """진행 상황 (바이트 단위). ack는 0부터 끊김 없이 받은 바이트 수(누적 ACK)
+
+        압축 업로드에서 received_size/total_size는 전송 바이트,
+        decoded_size/raw_size는 압축을 푼 바이트 기준이다.
+        """
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'received_size': self.received.total(),
+            'ack': self.received.contiguous_end(),
+            'missing': self.received.missing(self.total_size),
+            'total_size': self.total_size,
+            'codec': self.codec,
+            'decoded_size': self.decoded_size if self.compressed else self.received.total(),
+            'raw_size': self.raw_size if self.compressed else self.total_size,
+            'chunk_size': self.chunk_size,
+            'window': self.window
+        }
+
+    def close(self):
+        """부분 파일 닫기"""
+        self.closed = True
+        self.file.close()
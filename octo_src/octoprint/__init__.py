@@ -1,4 +1,6 @@
 from .octoprint_client import OctoPrintClient
+from .octoprint_push import OctoPrintPushClient
 from .temp_monitor import TemperatureMonitor
+from .printer_snapshot import PrinterSnapshotService
 
-__all__ = ['OctoPrintClient', 'TemperatureMonitor'] 
\ No newline at end of file
+__all__ = ['OctoPrintClient', 'OctoPrintPushClient', 'TemperatureMonitor', 'PrinterSnapshotService'] 
\ No newline at end of file
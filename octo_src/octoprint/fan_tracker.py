@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger('mie_printer.octoprint')
+
+# 작업 파일을 거꾸로 읽을 때 한 번에 읽는 크기
+SCAN_BLOCK_SIZE = 64 * 1024
+
+# 파트 쿨링 팬(P0) 명령만 추적. 주석(;) 뒤는 무시
+_FAN_COMMAND = re.compile(rb'^[ \t]*(?:N\d+[ \t]+)?M(106|107)\b([^;\r\n]*)', re.M | re.I)
+_PARAM_S = re.compile(rb'\bS(\d+(?:\.\d*)?)', re.I)
+_PARAM_P = re.compile(rb'\bP(\d+)', re.I)
+
+
+def last_fan_pwm(data):
+    """데이터 안의 마지막 팬 명령이 설정하는 PWM 값(0-255), 없으면 None"""
+    pwm = None
+    for match in _FAN_COMMAND.finditer(data):
+        code, params = match.groups()
+        fan = _PARAM_P.search(params)
+        if fan and int(fan.group(1)) != 0:
+            continue
+        if code == b'107':
+            pwm = 0
+        else:
+            speed = _PARAM_S.search(params)
+            pwm = int(max(0, min(255, round(float(speed.group(1)))))) if speed else 255
+    return pwm
+
+
+class FanTracker:
+    """팬 속도를 펌웨어에 묻지 않고 추적
+
+    직접 보낸 M106/M107과 출력 중인 작업 파일에서 이미 전송된 구간의 팬 명령으로
+    값을 갱신한다. max_age 동안 갱신되지 않은 값은 오래된 것으로 보고,
+    응답을 읽을 수 있을 때(푸시 모드)만 펌웨어(M123)에 다시 묻는다. 묻는 것도 max_age에 한 번만 한다.
+    """
+
+    def __init__(self, upload_folder=None, max_age=60.0):
+        self.upload_folder = upload_folder
+        self.max_age = max_age
+        self.pwm = None
+        self.source = None
+        self.updated_at = None
+        # 마지막으로 펌웨어에 물은 시각 (응답이 없어도 max_age 동안 다시 묻지 않음)
+        self.queried_at = None
+        self._lock = threading.Lock()
+        # 작업 파일 스캔 상태: (파일 경로, 스캔을 마친 위치)
+        self._job_path = None
+        self._job_pos = 0
+
+    def set(self, pwm, source):
+        """팬 PWM 값(0-255) 기록"""
+        with self._lock:
+            self.pwm = int(max(0, min(255, round(pwm))))
+            self.source = source
+            self.updated_at = time.monotonic()
+
+    def mark_queried(self):
+        """펌웨어에 팬 속도를 물은 시각 기록"""
+        self.queried_at = time.monotonic()
+
+    def is_stale(self):
+        """값이 없거나 max_age보다 오래됐고, max_age 안에 펌웨어에 묻지도 않았으면 True"""
+        now = time.monotonic()
+        for checked_at in (self.updated_at, self.queried_at):
+            if checked_at is not None and now - checked_at <= self.max_age:
+                return False
+        return True
+
+    def age(self):
+        """마지막 갱신 후 지난 시간 (초), 값이 없으면 None"""
+        updated_at = self.updated_at
+        return None if updated_at is None else time.monotonic() - updated_at
+
+    def percent(self):
+        """팬 속도 (퍼센트), 값이 없으면 None"""
+        pwm = self.pwm
+        return None if pwm is None else round((pwm / 255) * 100)
+
+    def observe_job(self, path, filepos):
+        """출력 중인 작업 파일의 filepos까지 전송된 팬 명령 반영
+
+        같은 파일을 앞으로 진행 중이면 지난번 위치 이후만 읽고,
+        새 파일이거나 위치가 뒤로 간 경우에는 filepos부터 거꾸로 읽어 마지막 팬 명령을 찾는다.
+        filepos가 줄 중간이면 그 줄은 다음 조회에서 줄 처음부터 다시 읽는다.
+        """
+        if not self.upload_folder or not path or filepos is None:
+            return
+        full_path = os.path.join(self.upload_folder, path)
+        filepos = int(filepos)
+        try:
+            with open(full_path, 'rb') as f:
+                if full_path == self._job_path and filepos >= self._job_pos:
+                    f.seek(self._job_pos)
+                    data = f.read(filepos - self._job_pos)
+                    # 끝나지 않은 마지막 줄은 남겨 둠
+                    complete = data.rfind(b'\n') + 1
+                    pwm = last_fan_pwm(data[:complete])
+                    if pwm is None:
+                        pwm = self.pwm
+                    scanned = self._job_pos + complete
+                else:
+                    scanned = self._line_start(f, filepos)
+                    # 작업 시작 시 팬은 꺼져 있다고 가정
+                    pwm = self._scan_backward(f, scanned)
+                    if pwm is None:
+                        pwm = 0
+        except OSError as e:
+            logger.debug(f"Cannot scan job file {full_path} for fan commands: {e}")
+            return
+
+        self._job_path = full_path
+        self._job_pos = scanned
+        self.set(pwm, 'job')
+
+    @staticmethod
+    def _line_start(f, pos):
+        """pos가 속한 줄의 시작 위치 (줄이 SCAN_BLOCK_SIZE보다 길면 pos)"""
+        start = max(0, pos - SCAN_BLOCK_SIZE)
+        f.seek(start)
+        newline = f.read(pos - start).rfind(b'\n')
+        if newline != -1:
+            return start + newline + 1
+        return 0 if start == 0 else pos
+
+    def _scan_backward(self, f, end):
+        """end부터 거꾸로 블록 단위로 읽으며 마지막 팬 명령 탐색"""
+        carry = b''
+        while end > 0:
+            start = max(0, end - SCAN_BLOCK_SIZE)
+            f.seek(start)
+            data = f.read(end - start) + carry
+            if start > 0:
+                # 블록 첫 줄은 앞 블록에서 이어지므로 다음 블록과 합쳐서 검사
+                newline = data.find(b'\n')
+                if newline == -1:
+                    carry = data
+                    end = start
+                    continue
+                carry = data[:newline + 1]
+                data = data[newline + 1:]
+            pwm = last_fan_pwm(data)
+            if pwm is not None:
+                return pwm
+            end = start
+        return None
@@ -1,34 +1,150 @@
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import json
+import time
+from .fan_tracker import FanTracker, last_fan_pwm
+from ..utils.metrics import metrics
 
 # 로거 설정
 logger = logging.getLogger('mie_printer.octoprint')
 
 class OctoPrintClient:
-    def __init__(self, api_key, base_url="http://localhost:5000", timeout=10):
+    def __init__(self, api_key, base_url="http://localhost:5000", timeout=10,
+                 pool_size=4, connect_timeout=3.05, read_timeout=None,
+                 upload_folder=None, fan_max_age=60.0):
         self.api_key = api_key
-        self.base_url = base_url
+        self.base_url = base_url.rstrip('/')
         self.timeout = timeout
+        # 연결 타임아웃은 짧게, 응답 대기는 timeout까지 (OctoPrint가 멈춰도 스레드가 묶이지 않음)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout if read_timeout is not None else timeout
         self.headers = {
             'X-Api-Key': self.api_key,
             'Content-Type': 'application/json'
         }
 
+        # keep-alive 연결 풀: 여러 스레드가 동시에 요청해도 pool_size개까지 연결을 재사용
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # get_printer_status의 독립적인 요청들을 동시에 보내기 위한 스레드 풀
+        self._status_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='octoprint-status')
+        # 마지막 상태 조회의 엔드포인트별 소요 시간 (초)
+        self.last_status_timings = {}
+
+        # 팬 속도는 직접 보낸 명령과 작업 파일로 추적하고, 오래됐고 응답을 읽을 수 있을 때만 M123으로 조회
+        self.fan_tracker = FanTracker(upload_folder, max_age=fan_max_age)
+
+    def close(self):
+        """연결 풀 정리"""
+        self._status_executor.shutdown(wait=False)
+        self.session.close()
+
+    def _reads_fan_reports(self):
+        """M123 응답(터미널 로그의 fan_speed:)을 읽을 수 있는지. REST 모드는 로그를 받지 않음"""
+        return False
+
+    def _query_fan_speed(self):
+        """M123으로 펌웨어에 팬 속도 보고를 요청. 성공하면 True
+
+        /api/printer/command는 본문 없이 204를 반환하므로 응답은 터미널 로그로만 돌아온다
+        (푸시 클라이언트가 로그에서 읽어 fan_tracker에 기록). 로그를 읽지 않으면 보내지 않는다.
+        실패해도 시도 시각을 남겨서 max_age 동안은 다시 보내지 않는다.
+        """
+        if not self._reads_fan_reports():
+            return False
+        self.fan_tracker.mark_queried()
+        try:
+            response = self._post("/api/printer/command", json={"commands": ["M123"]})
+        except requests.RequestException as e:
+            logger.debug(f"M123 request failed: {e}")
+            return False
+        if response.status_code != 204:
+            logger.debug(f"M123 request failed: {response.status_code}")
+            return False
+        return True
+
+    def _fan_speed_age(self):
+        """추적 중인 팬 속도 값의 나이 (초, 정수), 값이 없으면 None"""
+        age = self.fan_tracker.age()
+        return None if age is None else int(age)
+
+    def _observe_job_fan(self, job_data):
+        """출력 중인 로컬 작업 파일에서 이미 전송된 팬 명령 반영"""
+        job_file = (job_data.get("job") or {}).get("file") or job_data.get("file") or {}
+        filepos = (job_data.get("progress") or {}).get("filepos")
+        if job_file.get("origin") == "local" and filepos is not None:
+            self.fan_tracker.observe_job(job_file.get("path"), filepos)
+
+    def get_fan_speed(self, refresh=False):
+        """팬 속도 (퍼센트). refresh가 True이거나 추적 값이 오래됐으면 펌웨어에 조회 (푸시 모드만)"""
+        try:
+            if refresh or self.fan_tracker.is_stale():
+                self._query_fan_speed()
+            return self.fan_tracker.percent()
+        except Exception as e:
+            logger.error(f"Error getting fan speed: {e}")
+            return None
+
+    @staticmethod
+    def _layer_info(progress, job_file):
+        """작업 진행 상태와 파일 메타데이터에서 (현재 레이어, 총 레이어 수). 없으면 0"""
+        current_layer = 0
+        total_layers = 0
+
+        # 현재 레이어 정보 확인
+        if progress:
+            current_layer = progress.get("currentLayer", 0) or 0
+            if isinstance(current_layer, str):
+                try:
+                    current_layer = int(current_layer)
+                except ValueError:
+                    current_layer = 0
+
+        # 총 레이어 수 확인
+        if job_file and "metadata" in job_file:
+            gcode_analysis = job_file["metadata"].get("analysis", {})
+            total_layers = gcode_analysis.get("layers", 0)
+            if total_layers == 0:  # 대체 경로 확인
+                total_layers = job_file["metadata"].get("layerCount", 0)
+        return current_layer, total_layers
+
+    def _timed(self, timings, name, request, *args, **kwargs):
+        """요청을 실행하고 소요 시간을 timings[name]에 기록"""
+        start = time.monotonic()
+        try:
+            return request(*args, **kwargs)
+        finally:
+            timings[name] = time.monotonic() - start
+
     def get_printer_status(self):
-        """프린터의 전체 상태 정보 조회"""
+        """프린터의 전체 상태 정보 조회
+
+        /api/printer, /api/job 요청은 서로 독립적이므로 동시에 보낸다.
+        팬 속도는 fan_tracker 값과 그 나이(fan_speed_age)를 보고하고, 값이 오래됐고 M123 응답을
+        읽을 수 있을 때(푸시 모드)만 M123 보고를 함께 요청한다.
+        엔드포인트별 소요 시간은 last_status_timings에 남는다.
+        """
+        timings = {}
+        started = time.monotonic()
         try:
+            executor = self._status_executor
             # 프린터 상태 및 온도 정보 가져오기
-            printer_response = requests.get(
-                f"{self.base_url}/api/printer",
-                headers=self.headers
-            )
-            
+            printer_future = executor.submit(self._timed, timings, 'printer', self._get, "/api/printer")
             # 작업 진행 상태 가져오기
-            job_response = requests.get(
-                f"{self.base_url}/api/job",
-                headers=self.headers
-            )
+            job_future = executor.submit(self._timed, timings, 'job', self._get, "/api/job")
+            # 추적 중인 팬 속도가 오래됐고 응답을 읽을 수 있을 때만 펌웨어에 조회
+            fan_future = None
+            if self._reads_fan_reports() and self.fan_tracker.is_stale():
+                fan_future = executor.submit(self._timed, timings, 'fan', self._query_fan_speed)
+
+            printer_response = printer_future.result()
+            job_response = job_future.result()
             
             if printer_response.status_code != 200 or job_response.status_code != 200:
                 logger.error("Failed to get printer status")
@@ -54,12 +170,14 @@ class OctoPrintClient:
                     }
                 },
                 "fan_speed": 0,  # 팬 속도 추가
+                "fan_speed_age": None,
                 "position": {
                     "x": 0,
                     "y": 0,
                     "z": 0
                 },
                 "progress": 0,
+                "filepos": None,
                 "currentFile": None,
                 "timeLeft": 0,
                 "currentLayer": 0,
@@ -73,25 +191,14 @@ class OctoPrintClient:
             
             # 팬 속도 업데이트 (0-255 값을 퍼센트로 변환)
             if 'state' in printer_data:
-                # 현재 프린터의 실제 팬 상태를 가져오기 위해 커스텀 명령어 전송
-                fan_response = requests.post(
-                    f"{self.base_url}/api/printer/command",
-                    headers=self.headers,
-                    json={"commands": ["M123"]},  # M123은 팬 속도를 반환하는 커스텀 명령어
-                    timeout=self.timeout
-                )
-                
-                if fan_response.ok:
-                    # M123 응답에서 팬 속도 파싱
-                    for line in fan_response.text.split('\n'):
-                        if 'fan_speed' in line:
-                            try:
-                                fan_speed = int(line.split(':')[1].strip())
-                                status_data["fan_speed"] = round((fan_speed / 255) * 100)
-                                logger.debug(f"Fan speed from M123: {fan_speed} (raw) -> {status_data['fan_speed']}%")
-                                break
-                            except (IndexError, ValueError) as e:
-                                logger.error(f"Error parsing fan speed: {e}")
+                if fan_future is not None:
+                    fan_future.result()
+                self._observe_job_fan(job_data)
+
+                if self.fan_tracker.percent() is not None:
+                    status_data["fan_speed"] = self.fan_tracker.percent()
+                    status_data["fan_speed_age"] = self._fan_speed_age()
+                    logger.debug(f"Fan speed from {self.fan_tracker.source}: {status_data['fan_speed']}%")
 
                 # 기존의 상태 확인 코드는 백업으로 유지
                 fan_speed = 0
@@ -152,6 +259,7 @@ class OctoPrintClient:
                     # 진행률이 None이면 0으로 처리
                     progress_data = job_data["progress"]
                     status_data["progress"] = float(progress_data.get("completion", 0) or 0)
+                    status_data["filepos"] = progress_data.get("filepos")
                     
                     # 예상 남은 시간이 None이면 0으로 처리
                     time_left = progress_data.get("printTimeLeft")
@@ -165,25 +273,7 @@ class OctoPrintClient:
                     status_data["currentFile"] = job_data["file"].get("name")
                     
                     # 레이어 정보 업데이트
-                    current_layer = 0
-                    total_layers = 0
-                    
-                    # 현재 레이어 정보 확인
-                    if "progress" in job_data:
-                        current_layer = job_data["progress"].get("currentLayer", 0)
-                        if isinstance(current_layer, str):
-                            try:
-                                current_layer = int(current_layer)
-                            except ValueError:
-                                current_layer = 0
-                    
-                    # 총 레이어 수 확인
-                    if "file" in job_data and "metadata" in job_data["file"]:
-                        gcode_analysis = job_data["file"]["metadata"].get("analysis", {})
-                        total_layers = gcode_analysis.get("layers", 0)
-                        if total_layers == 0:  # 대체 경로 확인
-                            total_layers = job_data["file"]["metadata"].get("layerCount", 0)
-                    
+                    current_layer, total_layers = self._layer_info(job_data.get("progress"), job_data["file"])
                     status_data["currentLayer"] = current_layer
                     status_data["totalLayers"] = total_layers
                     
@@ -197,6 +287,12 @@ class OctoPrintClient:
         except Exception as e:
             logger.error(f"Error getting printer status: {e}")
             return None
+        finally:
+            timings['total'] = time.monotonic() - started
+            self.last_status_timings = timings
+            logger.debug(
+                "Status fetch timings: " + ", ".join(f"{name}={elapsed * 1000:.1f}ms" for name, elapsed in timings.items())
+            )
 
     def connect_printer(self, port=None, baudrate=250000):
         """프린터 연결"""
@@ -224,12 +320,7 @@ class OctoPrintClient:
                 'save': True
             }
             
-            response = requests.post(
-                f"{self.base_url}/api/connection",
-                headers=self.headers,
-                json=data,
-                timeout=self.timeout
-            )
+            response = self._post("/api/connection", json=data)
             
             if response.status_code == 204:
                 logger.info(f"Successfully connected to printer at {port} with baudrate {baudrate}")
@@ -250,24 +341,68 @@ class OctoPrintClient:
         """온도 설정 (tool0 또는 bed)"""
         try:
             data = {'command': 'target', 'target': target}
-            response = requests.post(
-                f"{self.base_url}/api/printer/{heater}/target",
-                headers=self.headers,
-                json=data
-            )
+            response = self._post(f"/api/printer/{heater}/target", json=data)
             return response.status_code == 204
         except Exception as e:
             logger.error(f"Error setting temperature: {e}")
             return False
 
+    def set_bed_temp(self, temp):
+        """베드 목표 온도 설정"""
+        try:
+            response = self._post("/api/printer/bed", json={'command': 'target', 'target': float(temp)})
+            return response.status_code == 204
+        except Exception as e:
+            logger.error(f"Error setting bed temperature: {e}")
+            return False
+
+    def set_nozzle_temp(self, temp, tool='tool0'):
+        """노즐 목표 온도 설정"""
+        try:
+            response = self._post("/api/printer/tool", json={'command': 'target', 'targets': {tool: float(temp)}})
+            return response.status_code == 204
+        except Exception as e:
+            logger.error(f"Error setting nozzle temperature: {e}")
+            return False
+
+    def set_flow_rate(self, rate):
+        """압출량 배율 설정 (퍼센트)"""
+        try:
+            response = self._post("/api/printer/tool", json={'command': 'flowrate', 'factor': float(rate)})
+            return response.status_code == 204
+        except Exception as e:
+            logger.error(f"Error setting flow rate: {e}")
+            return False
+
+    def extrude(self, amount):
+        """필라멘트 압출 (음수면 후퇴, mm)"""
+        try:
+            response = self._post("/api/printer/tool", json={'command': 'extrude', 'amount': float(amount)})
+            return response.status_code == 204
+        except Exception as e:
+            logger.error(f"Error extruding: {e}")
+            return False
+
+    def send_commands(self, commands):
+        """G-code 명령 여러 개를 한 번의 요청으로 전송"""
+        try:
+            response = self._post("/api/printer/command", json={'commands': list(commands)})
+            if response.status_code != 204:
+                logger.error(f"Failed to send commands: {response.text}")
+                return False
+            for command in commands:
+                pwm = last_fan_pwm(command.encode('ascii', 'ignore'))
+                if pwm is not None:
+                    self.fan_tracker.set(pwm, 'command')
+            return True
+        except Exception as e:
+            logger.error(f"Error sending commands: {e}")
+            return False
+
     def start_print(self, filename):
         """출력 시작"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/files/local/{filename}",
-                headers=self.headers,
-                json={'command': 'select', 'print': True}
-            )
+            response = self._post(f"/api/files/local/{filename}", json={'command': 'select', 'print': True})
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Error starting print: {e}")
@@ -276,11 +411,7 @@ class OctoPrintClient:
     def check_connection(self):
         """프린터 연결 상태 확인"""
         try:
-            response = requests.get(
-                f"{self.base_url}/api/connection",
-                headers=self.headers,
-                timeout=self.timeout
-            )
+            response = self._get("/api/connection")
             if response.status_code == 200:
                 connection_info = response.json()
                 current_state = connection_info.get('current', {}).get('state')
@@ -299,11 +430,7 @@ class OctoPrintClient:
     def disconnect_printer(self):
         """프린터 연결 해제"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/connection",
-                headers=self.headers,
-                json={'command': 'disconnect'}
-            )
+            response = self._post("/api/connection", json={'command': 'disconnect'})
             return response.status_code == 204
         except Exception as e:
             logger.error(f"Error disconnecting printer: {e}")
@@ -312,11 +439,7 @@ class OctoPrintClient:
     def pause_print(self):
         """출력 일시정지"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/job",
-                headers=self.headers,
-                json={'command': 'pause', 'action': 'pause'}
-            )
+            response = self._post("/api/job", json={'command': 'pause', 'action': 'pause'})
             return response.status_code == 204
         except Exception as e:
             logger.error(f"Error pausing print: {e}")
@@ -325,11 +448,7 @@ class OctoPrintClient:
     def resume_print(self):
         """출력 재개"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/job",
-                headers=self.headers,
-                json={'command': 'pause', 'action': 'resume'}
-            )
+            response = self._post("/api/job", json={'command': 'pause', 'action': 'resume'})
             return response.status_code == 204
         except Exception as e:
             logger.error(f"Error resuming print: {e}")
@@ -338,11 +457,7 @@ class OctoPrintClient:
     def cancel_print(self):
         """출력 취소"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/job",
-                headers=self.headers,
-                json={'command': 'cancel'}
-            )
+            response = self._post("/api/job", json={'command': 'cancel'})
             return response.status_code == 204
         except Exception as e:
             logger.error(f"Error canceling print: {e}")
@@ -353,14 +468,12 @@ class OctoPrintClient:
         try:
             logger.debug(f"Moving {axis} axis by {distance}mm")
             # OctoPrint API는 상대 이동에 jog 명령을 사용
-            response = requests.post(
-                f"{self.base_url}/api/printer/printhead",
-                headers=self.headers,
+            response = self._post(
+                "/api/printer/printhead",
                 json={
                     "command": "jog",
                     axis.lower(): float(distance)
-                },
-                timeout=self.timeout
+                }
             )
             
             if response.status_code == 204:
@@ -381,14 +494,12 @@ class OctoPrintClient:
                 axes = ["x", "y", "z"]
                 
             logger.debug(f"Homing axes: {axes}")
-            response = requests.post(
-                f"{self.base_url}/api/printer/printhead",
-                headers=self.headers,
+            response = self._post(
+                "/api/printer/printhead",
                 json={
                     "command": "home",
                     "axes": [axis.lower() for axis in axes]
-                },
-                timeout=self.timeout
+                }
             )
             
             if response.status_code == 204:
@@ -402,13 +513,32 @@ class OctoPrintClient:
             logger.error(f"Error homing axes: {e}")
             return False
 
+    def get_temperatures(self):
+        """온도만 가볍게 조회 ({'tool0': {...}, 'bed': {...}}). 실패하면 None
+
+        /api/printer에서 온도 이력과 state/sd 항목을 빼고 요청하므로 작업 조회나 M123이 없다.
+        """
+        try:
+            response = self._get("/api/printer", params={'history': 'false', 'exclude': 'state,sd'})
+            if response.status_code != 200:
+                logger.error(f"Failed to get temperatures: {response.status_code}")
+                return None
+            temperature = response.json().get('temperature') or {}
+            return {
+                heater: {
+                    'actual': (temperature.get(heater) or {}).get('actual') or 0,
+                    'target': (temperature.get(heater) or {}).get('target') or 0
+                }
+                for heater in ('tool0', 'bed')
+            }
+        except Exception as e:
+            logger.error(f"Error getting temperatures: {e}")
+            return None
+
     def get_position(self):
         """프린터의 현재 위치 정보를 가져옴"""
         try:
-            response = requests.get(
-                f"{self.base_url}/api/printer",
-                headers=self.headers
-            )
+            response = self._get("/api/printer")
             
             if response.status_code != 200:
                 logger.error(f"Failed to get position: {response.text}")
@@ -447,19 +577,31 @@ class OctoPrintClient:
             logger.error(f"Error getting position: {e}")
             return None
 
-    def _post(self, endpoint, json=None):
-        """내부 POST 요청 메소드"""
+    def _request(self, method, endpoint, **kwargs):
+        """내부 HTTP 요청 메소드. 세션의 연결을 재사용하고 항상 타임아웃 적용"""
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        # 파일명이 들어가는 경로는 하나로 묶어서 레이블 수 제한
+        label = '/api/files' if endpoint.startswith('/api/files/') else endpoint.split('?')[0]
+        start = time.monotonic()
         try:
-            response = requests.post(
-                f"{self.base_url}{endpoint}",
-                headers=self.headers,
-                json=json,
-                timeout=self.timeout
-            )
+            response = self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+            if response.status_code >= 400:
+                metrics.inc('octoprint_request_errors_total', method=method, endpoint=label)
             return response
         except Exception as e:
-            logger.error(f"Error in POST request to {endpoint}: {e}")
+            metrics.inc('octoprint_request_errors_total', method=method, endpoint=label)
+            logger.error(f"Error in {method} request to {endpoint}: {e}")
             raise
+        finally:
+            metrics.observe('octoprint_request_seconds', time.monotonic() - start, method=method, endpoint=label)
+
+    def _get(self, endpoint, params=None):
+        """내부 GET 요청 메소드"""
+        return self._request('GET', endpoint, params=params)
+
+    def _post(self, endpoint, json=None):
+        """내부 POST 요청 메소드"""
+        return self._request('POST', endpoint, json=json)
 
     def set_fan_speed(self, speed):
         """팬 속도 설정 (0-255)"""
@@ -471,16 +613,12 @@ class OctoPrintClient:
             
             # M106 명령어를 먼저 전송
             gcode = "M107" if speed == 0 else f"M106 S{speed}"
-            response = requests.post(
-                f"{self.base_url}/api/printer/command",
-                headers=self.headers,
-                json={"commands": [gcode]},
-                timeout=self.timeout
-            )
+            response = self._post("/api/printer/command", json={"commands": [gcode]})
             
             if not response.ok:
                 logger.error(f"Failed to set fan speed: {response.text}")
                 return False
+            self.fan_tracker.set(speed, 'command')
                 
             # 명령이 성공하면 상태를 강제로 업데이트
             return_data = {
@@ -497,10 +635,7 @@ class OctoPrintClient:
             }
             
             # 현재 온도 정보 가져오기
-            temp_response = requests.get(
-                f"{self.base_url}/api/printer",
-                headers=self.headers
-            )
+            temp_response = self._get("/api/printer")
             if temp_response.ok:
                 temp_data = temp_response.json()
                 if 'temperature' in temp_data:
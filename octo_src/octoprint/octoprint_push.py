@@ -0,0 +1,262 @@
+import re
+import json
+import time
+import socket
+import logging
+import threading
+from .octoprint_client import OctoPrintClient
+from .fan_tracker import last_fan_pwm
+from .push_socket import PushSocket, WebSocketClosed
+
+logger = logging.getLogger('mie_printer.octoprint')
+
+# 재연결 대기 시간 (초): 실패할 때마다 두 배, 최대 RECONNECT_MAX
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
+
+# 이 시간 동안 메시지가 없으면 ping, 두 번 연속이면 재연결
+HEARTBEAT_INTERVAL = 15.0
+
+# 전송 로그 한 줄: "Send: N123 G1 X10 Y20*45"
+_SEND_LINE = re.compile(r'^Send:\s*(?:N\d+\s+)?([^*;]*)')
+# M114 응답: "Recv: X:10.00 Y:20.00 Z:0.30 E:0.00 Count X:..."
+_POSITION_REPORT = re.compile(r'^Recv:.*?\bX:\s*(-?[\d.]+)\s+Y:\s*(-?[\d.]+)\s+Z:\s*(-?[\d.]+)')
+_FAN_REPORT = re.compile(r'^Recv:.*\bfan_speed:\s*(\d+)')
+_WORD = re.compile(r'([A-Z])\s*(-?\d*\.?\d+)')
+
+
+class OctoPrintPushClient(OctoPrintClient):
+    """OctoPrint 푸시 API(/sockjs/websocket)로 상태를 받아 메모리에 유지하는 클라이언트
+
+    current/history 메시지로 프린터/작업 상태와 온도를 갱신하고, 로그의 전송 명령
+    (G0/G1/G28/G90/G91/G92, M106/M107, M221)과 M114 응답으로 위치, 팬, flow rate를
+    추적한다. 연결이 살아 있으면 get_printer_status와 get_position은 HTTP 요청 없이
+    메모리에서 응답하고, 아직 상태를 받지 못했으면 REST 조회로 대체한다.
+    """
+
+    def __init__(self, api_key, base_url="http://localhost:5000", **kwargs):
+        super().__init__(api_key, base_url, **kwargs)
+        self.is_running = False
+        self.push_thread = None
+        self.connected = False
+        self._socket = None
+        self._model_lock = threading.Lock()
+        self._current = None
+        self._temperature = None
+        self._position = {'x': 0.0, 'y': 0.0, 'z': 0.0}
+        self._absolute = True
+        self._flow_rate = 100.0
+        self._received_at = None
+
+    def start(self):
+        """푸시 연결 스레드 시작"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.push_thread = threading.Thread(target=self._push_loop)
+        self.push_thread.daemon = True
+        self.push_thread.start()
+        logger.info("OctoPrint push client started")
+
+    def stop(self):
+        """푸시 연결 종료"""
+        self.is_running = False
+        sock = self._socket
+        if sock:
+            sock.close()
+        if self.push_thread:
+            self.push_thread.join(timeout=self.connect_timeout + 1)
+        logger.info("OctoPrint push client stopped")
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def _login(self):
+        """API 키로 passive 로그인해서 푸시 인증용 'name:session' 반환"""
+        response = self._post("/api/login", json={'passive': True})
+        if response.status_code != 200:
+            raise WebSocketClosed(f"Login failed with status {response.status_code}")
+        data = response.json()
+        return f"{data['name']}:{data['session']}"
+
+    def _push_loop(self):
+        """연결, 수신, 재연결 루프"""
+        delay = RECONNECT_MIN
+        while self.is_running:
+            try:
+                auth = self._login()
+                sock = PushSocket(self.base_url, timeout=self.connect_timeout)
+                sock.connect()
+                sock.send(json.dumps({'auth': auth}))
+                sock.settimeout(HEARTBEAT_INTERVAL)
+                self._socket = sock
+                self.connected = True
+                delay = RECONNECT_MIN
+                logger.info("Connected to OctoPrint push API")
+                self._receive(sock)
+            except (OSError, ValueError, KeyError, WebSocketClosed) as e:
+                if self.is_running:
+                    logger.warning(f"OctoPrint push connection lost: {e}, retrying in {delay:.0f}s")
+            finally:
+                self.connected = False
+                if self._socket:
+                    self._socket.close()
+                    self._socket = None
+
+            if self.is_running:
+                time.sleep(delay)
+                delay = min(RECONNECT_MAX, delay * 2)
+
+    def _receive(self, sock):
+        """메시지 수신 루프. 조용한 구간에는 ping으로 연결 확인"""
+        idle = 0
+        while self.is_running:
+            try:
+                text = sock.recv()
+            except socket.timeout:
+                idle += 1
+                if idle >= 2:
+                    raise WebSocketClosed("No data from OctoPrint")
+                sock.ping()
+                continue
+            idle = 0
+            message = json.loads(text)
+            if 'current' in message:
+                self._apply(message['current'])
+            elif 'history' in message:
+                self._apply(message['history'])
+            elif 'reauthRequired' in message:
+                raise WebSocketClosed("Re-authentication required")
+
+    def _apply(self, payload):
+        """current/history 메시지를 메모리 모델에 반영"""
+        with self._model_lock:
+            self._current = {
+                'state': payload.get('state') or {},
+                'job': payload.get('job') or {},
+                'progress': payload.get('progress') or {},
+                'currentZ': payload.get('currentZ')
+            }
+            temps = payload.get('temps') or []
+            if temps:
+                latest = temps[-1]
+                self._temperature = {
+                    heater: values for heater, values in latest.items()
+                    if heater != 'time' and isinstance(values, dict)
+                }
+            for line in payload.get('logs') or []:
+                self._apply_log_line(line)
+            self._received_at = time.monotonic()
+
+    def _apply_log_line(self, line):
+        """터미널 로그 한 줄에서 위치/팬/flow rate 변경 추적 (_model_lock을 잡은 상태에서 호출)"""
+        match = _SEND_LINE.match(line)
+        if match:
+            command = match.group(1).strip().upper()
+            if not command:
+                return
+            code = command.split()[0]
+            words = {letter: float(value) for letter, value in _WORD.findall(command[len(code):])}
+            if code in ('G0', 'G1'):
+                for axis in ('x', 'y', 'z'):
+                    value = words.get(axis.upper())
+                    if value is not None:
+                        self._position[axis] = value if self._absolute else self._position[axis] + value
+            elif code == 'G28':
+                homed = [axis for axis in ('x', 'y', 'z') if axis.upper() in command[len(code):]]
+                for axis in homed or ('x', 'y', 'z'):
+                    self._position[axis] = 0.0
+            elif code == 'G90':
+                self._absolute = True
+            elif code == 'G91':
+                self._absolute = False
+            elif code == 'G92':
+                for axis in ('x', 'y', 'z'):
+                    if axis.upper() in words:
+                        self._position[axis] = words[axis.upper()]
+            elif code in ('M106', 'M107'):
+                pwm = last_fan_pwm(command.encode('ascii', 'ignore'))
+                if pwm is not None:
+                    self.fan_tracker.set(pwm, 'push')
+            elif code == 'M221' and 'S' in words:
+                self._flow_rate = words['S']
+            return
+
+        match = _POSITION_REPORT.match(line)
+        if match:
+            x, y, z = (float(v) for v in match.groups())
+            self._position = {'x': x, 'y': y, 'z': z}
+            return
+
+        match = _FAN_REPORT.match(line)
+        if match:
+            self.fan_tracker.set(int(match.group(1)), 'firmware')
+
+    def _reads_fan_reports(self):
+        # 연결되어 있으면 M123 응답을 로그에서 읽음 (_apply_log_line)
+        return self.connected
+
+    def _has_model(self):
+        return self.connected and self._current is not None
+
+    def get_printer_status(self):
+        """메모리의 최신 상태 반환. 푸시 상태가 없으면 REST로 조회"""
+        if not self._has_model():
+            return super().get_printer_status()
+
+        with self._model_lock:
+            current = self._current
+            status_data = {
+                "temperature": dict(self._temperature) if self._temperature else {
+                    "tool0": {"actual": 0, "target": 0},
+                    "bed": {"actual": 0, "target": 0}
+                },
+                "fan_speed": self.fan_tracker.percent() or 0,
+                "fan_speed_age": self._fan_speed_age(),
+                "position": dict(self._position),
+                "progress": 0,
+                "filepos": None,
+                "currentFile": None,
+                "timeLeft": 0,
+                "currentLayer": 0,
+                "totalLayers": 0,
+                "flow_rate": self._flow_rate
+            }
+
+        # 추적 값이 오래됐으면 응답을 기다리지 않고 M123 보고만 요청 (로그로 들어오면 반영)
+        if self.fan_tracker.is_stale():
+            self._status_executor.submit(self._query_fan_speed)
+
+        if current['state'].get('text', 'Offline') != 'Offline':
+            progress = current['progress']
+            status_data["progress"] = float(progress.get("completion", 0) or 0)
+            status_data["filepos"] = progress.get("filepos")
+            time_left = progress.get("printTimeLeft")
+            status_data["timeLeft"] = int(time_left if time_left is not None else 0)
+            job_file = current['job'].get('file') or {}
+            status_data["currentFile"] = job_file.get('name')
+            # REST 모드와 같은 방식으로 레이어 정보 (없으면 0이고, 앱 응답에서는 업로드 분석 결과로 대체)
+            status_data["currentLayer"], status_data["totalLayers"] = self._layer_info(progress, job_file)
+
+        return status_data
+
+    def get_temperatures(self):
+        """메모리의 최신 온도 반환. 푸시 상태가 없으면 REST로 조회"""
+        if not self._has_model() or not self._temperature:
+            return super().get_temperatures()
+        with self._model_lock:
+            return {
+                heater: {
+                    'actual': (self._temperature.get(heater) or {}).get('actual') or 0,
+                    'target': (self._temperature.get(heater) or {}).get('target') or 0
+                }
+                for heater in ('tool0', 'bed')
+            }
+
+    def get_position(self):
+        """메모리의 최신 위치 반환. 푸시 상태가 없으면 REST로 조회"""
+        if not self._has_model():
+            return super().get_position()
+        with self._model_lock:
+            return dict(self._position)
@@ -0,0 +1,99 @@
+import threading
+import time
+import logging
+from collections import namedtuple
+from ..utils.metrics import metrics
+
+logger = logging.getLogger('mie_printer.octoprint')
+
+# status는 발행 후 수정하지 않음 (갱신 시 새 스냅샷으로 교체)
+PrinterSnapshot = namedtuple('PrinterSnapshot', ['version', 'timestamp', 'status'])
+
+
+class PrinterSnapshotService:
+    """OctoPrint 상태를 한 곳에서 조회해 모든 사용처가 공유하는 스냅샷 서비스
+
+    백그라운드 스레드가 interval마다 한 번 get_printer_status를 호출하고,
+    사용처는 ttl보다 오래되지 않은 스냅샷을 읽는다. 스냅샷이 오래됐으면
+    즉시 갱신하되, 동시에 여러 요청이 와도 OctoPrint 호출은 한 번만 한다.
+    """
+
+    def __init__(self, octoprint_client, interval=1.0, ttl=2.0):
+        self.client = octoprint_client
+        self.interval = interval
+        self.ttl = ttl
+        self.is_running = False
+        self.poll_thread = None
+        self._snapshot = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+
+    def start(self):
+        """주기적 갱신 시작"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.poll_thread = threading.Thread(target=self._poll_loop)
+        self.poll_thread.daemon = True
+        self.poll_thread.start()
+        logger.info("Printer snapshot service started")
+
+    def stop(self):
+        """주기적 갱신 중지"""
+        self.is_running = False
+        if self.poll_thread:
+            self.poll_thread.join()
+        logger.info("Printer snapshot service stopped")
+
+    def _age(self, snapshot):
+        return time.monotonic() - snapshot.timestamp
+
+    def refresh(self):
+        """OctoPrint에서 상태를 다시 읽어 새 스냅샷 발행. 실패하면 기존 스냅샷 유지"""
+        requested_at = time.monotonic()
+        with self._refresh_lock:
+            # 기다리는 동안 다른 스레드가 이미 갱신했으면 그 결과를 사용
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.timestamp >= requested_at:
+                return snapshot
+
+            status = self.client.get_printer_status()
+            if status is None:
+                return self._snapshot
+
+            self._version += 1
+            self._snapshot = PrinterSnapshot(self._version, time.monotonic(), status)
+            return self._snapshot
+
+    def get(self, max_age=None):
+        """max_age(기본 ttl)보다 오래되지 않은 스냅샷 반환. 갱신에 실패하면 마지막 스냅샷"""
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if snapshot is None or self._age(snapshot) > max_age:
+            snapshot = self.refresh()
+        return snapshot
+
+    def peek_status(self, max_age):
+        """max_age보다 오래되지 않은 상태가 이미 있으면 반환하고, 없으면 갱신하지 않고 None"""
+        snapshot = self._snapshot
+        if snapshot is None or self._age(snapshot) > max_age:
+            return None
+        return snapshot.status
+
+    def get_status(self, max_age=None):
+        """최신 프린터 상태 반환. 허용 시간 안의 상태를 얻지 못하면 None"""
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self.get(max_age)
+        if snapshot is None or self._age(snapshot) > max_age + self.interval:
+            return None
+        return snapshot.status
+
+    def _poll_loop(self):
+        """주기적 갱신 루프"""
+        while self.is_running:
+            try:
+                with metrics.timer('poller_loop_seconds', loop='snapshot'):
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing printer snapshot: {e}")
+            time.sleep(self.interval)
@@ -0,0 +1,190 @@
+import os
+import ssl
+import base64
+import hashlib
+import socket
+import struct
+import threading
+from urllib.parse import urlsplit
+
+# RFC 6455 핸드셰이크 상수
+_WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# OctoPrint 푸시 메시지 하나의 최대 크기 (history 메시지가 가장 큼)
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+class WebSocketClosed(Exception):
+    """서버가 연결을 닫았거나 프레임이 올바르지 않음"""
+
+
+class PushSocket:
+    """OctoPrint 푸시 API용 최소 웹소켓 클라이언트 (텍스트 메시지만 사용)
+
+    base_url이 http://host:port 이면 ws://host:port/sockjs/websocket 으로 연결한다.
+    recv()는 완성된 텍스트 메시지 하나를 반환하며, ping에는 자동으로 응답한다.
+    """
+
+    def __init__(self, base_url, path='/sockjs/websocket', timeout=10):
+        parts = urlsplit(base_url)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.path = (parts.path.rstrip('/') + path) or '/'
+        self.timeout = timeout
+        self.sock = None
+        self._buffer = b''
+        # 받고 있는 메시지의 앞 조각들 (recv가 타임아웃으로 끊겨도 유지)
+        self._fragments = []
+        self._send_lock = threading.Lock()
+
+    def connect(self):
+        """TCP 연결 후 웹소켓 핸드셰이크"""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+        self.sock = sock
+        self._buffer = b''
+        self._fragments = []
+
+        key = base64.b64encode(os.urandom(16))
+        request = (
+            f"GET {self.path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key.decode()}\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            "\r\n"
+        )
+        sock.sendall(request.encode('ascii'))
+
+        while b'\r\n\r\n' not in self._buffer:
+            self._fill()
+            if len(self._buffer) > 64 * 1024:
+                raise WebSocketClosed("Handshake response too large")
+        head, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+        lines = head.decode('latin-1').split('\r\n')
+        if len(lines[0].split()) < 2 or lines[0].split()[1] != '101':
+            raise WebSocketClosed(f"Handshake rejected: {lines[0]}")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode()
+        if headers.get('sec-websocket-accept') != expected:
+            raise WebSocketClosed("Handshake accept key mismatch")
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def _fill(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise WebSocketClosed("Connection closed by server")
+        self._buffer += data
+
+    def _parse_frame(self):
+        """버퍼에 프레임 하나가 다 들어와 있으면 꺼내서 (fin, opcode, payload) 반환, 아니면 None"""
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return None
+        first, second = buffer[0], buffer[1]
+        length = second & 0x7F
+        offset = 2
+        if length == 126:
+            if len(buffer) < 4:
+                return None
+            length = struct.unpack_from('!H', buffer, 2)[0]
+            offset = 4
+        elif length == 127:
+            if len(buffer) < 10:
+                return None
+            length = struct.unpack_from('!Q', buffer, 2)[0]
+            offset = 10
+        if length > MAX_MESSAGE_SIZE:
+            raise WebSocketClosed(f"Frame too large: {length} bytes")
+        mask = None
+        if second & 0x80:
+            mask = buffer[offset:offset + 4]
+            offset += 4
+        if len(buffer) < offset + length:
+            return None
+        payload = buffer[offset:offset + length]
+        self._buffer = buffer[offset + length:]
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return bool(first & 0x80), first & 0x0F, payload
+
+    def _read_frame(self):
+        """프레임 하나 수신. 프레임이 다 들어올 때까지 버퍼에서 꺼내지 않으므로
+        중간에 socket.timeout이 나도 다음 호출에서 같은 프레임을 이어서 읽는다"""
+        while True:
+            frame = self._parse_frame()
+            if frame is not None:
+                return frame
+            self._fill()
+
+    def recv(self):
+        """텍스트 메시지 하나 수신 (socket.timeout은 호출자에게 전달, 받은 부분은 다음 호출에서 이어 읽음)"""
+        fragments = self._fragments
+        while True:
+            fin, opcode, payload = self._read_frame()
+            if opcode == OPCODE_PING:
+                self._send_frame(OPCODE_PONG, payload)
+                continue
+            if opcode == OPCODE_PONG:
+                continue
+            if opcode == OPCODE_CLOSE:
+                raise WebSocketClosed("Close frame received")
+            fragments.append(payload)
+            if sum(len(f) for f in fragments) > MAX_MESSAGE_SIZE:
+                raise WebSocketClosed("Message too large")
+            if fin:
+                self._fragments = []
+                return b''.join(fragments).decode('utf-8')
+
+    def _send_frame(self, opcode, payload):
+        # 클라이언트가 보내는 프레임은 항상 마스킹
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack('!H', length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack('!Q', length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        with self._send_lock:
+            self.sock.sendall(bytes(header) + mask + masked)
+
+    def send(self, text):
+        """텍스트 메시지 전송"""
+        self._send_frame(OPCODE_TEXT, text.encode('utf-8'))
+
+    def ping(self):
+        self._send_frame(OPCODE_PING, b'')
+
+    def close(self):
+        """연결 종료 (close 프레임 전송은 최선 노력)"""
+        if self.sock is None:
+            return
+        try:
+            self._send_frame(OPCODE_CLOSE, struct.pack('!H', 1000))
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
@@ -0,0 +1,259 @@
+import time
+import threading
+from array import array
+from itertools import groupby
+from collections import namedtuple
+
+# 온도 값 열 이름
+VALUE_COLUMNS = ('tool0_actual', 'tool0_target', 'bed_actual', 'bed_target')
+
+# 원본 샘플 열 이름 (timestamp는 time.monotonic() 기준)
+COLUMNS = ('timestamp',) + VALUE_COLUMNS
+
+# 구간 조회 결과: 열마다 array('d') 하나
+TemperatureColumns = namedtuple('TemperatureColumns', COLUMNS)
+
+# 집계 구간 열 이름: 구간 시작 시각과 값 열마다 최솟값/최댓값/평균
+ROLLUP_COLUMNS = ('timestamp',) + tuple(
+    f"{name}_{stat}" for name in VALUE_COLUMNS for stat in ('min', 'max', 'mean')
+)
+RollupColumns = namedtuple('RollupColumns', ROLLUP_COLUMNS)
+
+
+class TemperatureHistory:
+    """온도 샘플을 열 단위 array('d')에 저장하는 고정 크기 링 버퍼
+
+    샘플마다 객체를 만들지 않으므로 메모리는 capacity * 열 수 * 8바이트로 고정되고,
+    시간은 단조 증가하므로 구간 조회는 이진 탐색 두 번과 배열 복사로 끝난다.
+    샘플에는 1부터 증가하는 순번(seq)이 붙으며, 순번은 위치에서 계산하므로 따로 저장하지 않는다.
+    """
+
+    def __init__(self, capacity, row_type=TemperatureColumns):
+        self.capacity = int(capacity)
+        self._row_type = row_type
+        self._columns = [array('d', bytes(8 * self.capacity)) for _ in row_type._fields]
+        self._start = 0
+        self._size = 0
+        # 지금까지 추가된 샘플 수 (= 가장 최근 샘플의 순번)
+        self._appended = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_seq(self):
+        """가장 최근 샘플의 순번 (샘플이 없으면 0)"""
+        return self._appended
+
+    def append(self, timestamp, *values):
+        """샘플 추가 (timestamp와 나머지 열 값). 가득 차면 가장 오래된 샘플을 덮어씀"""
+        values = (timestamp,) + values
+        with self._lock:
+            if self._size and timestamp < self._timestamp_at(self._size - 1):
+                raise ValueError("Timestamps must not go backwards")
+            if self._size < self.capacity:
+                index = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                index = self._start
+                self._start = (self._start + 1) % self.capacity
+            for column, value in zip(self._columns, values):
+                column[index] = value
+            self._appended += 1
+
+    def extend(self, rows):
+        """시각 순서로 정렬된 여러 샘플을 한 번에 추가 (디스크 기록에서 복원할 때)"""
+        rows = list(rows)[-self.capacity:]
+        if not rows:
+            return
+        columns = [array('d', column) for column in zip(*rows)]
+        with self._lock:
+            if self._size and rows[0][0] < self._timestamp_at(self._size - 1):
+                raise ValueError("Timestamps must not go backwards")
+            count = len(rows)
+            # 넘치는 만큼 가장 오래된 샘플을 버림
+            overflow = max(0, self._size + count - self.capacity)
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+            begin = (self._start + self._size) % self.capacity
+            head = min(count, self.capacity - begin)
+            for target, source in zip(self._columns, columns):
+                target[begin:begin + head] = source[:head]
+                if head < count:
+                    target[:count - head] = source[head:]
+            self._size += count
+            self._appended += count
+
+    def _timestamp_at(self, position):
+        return self._columns[0][(self._start + position) % self.capacity]
+
+    def _bisect(self, timestamp):
+        """timestamp 이상인 첫 샘플의 위치 (0 = 가장 오래된 샘플)"""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamp_at(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slice(self, first, last):
+        """위치 [first, last) 구간을 열마다 복사 (링 경계를 넘으면 두 조각을 이어 붙임)"""
+        begin = (self._start + first) % self.capacity
+        count = last - first
+        if begin + count <= self.capacity:
+            return self._row_type(*(column[begin:begin + count] for column in self._columns))
+        head = self.capacity - begin
+        return self._row_type(*(column[begin:] + column[:count - head] for column in self._columns))
+
+    def window(self, seconds=None, now=None):
+        """최근 seconds초 동안의 샘플 (seconds가 None이면 전체)"""
+        with self._lock:
+            if seconds is None:
+                return self._slice(0, self._size)
+            now = time.monotonic() if now is None else now
+            return self._slice(self._bisect(now - seconds), self._size)
+
+    def between(self, start, end):
+        """start 이상 end 미만 시각의 샘플 (monotonic 기준)"""
+        with self._lock:
+            return self._slice(self._bisect(start), self._bisect(end))
+
+    def since(self, seq, seconds=None, now=None):
+        """순번이 seq보다 큰 샘플을 (첫 샘플의 순번, 열) 로 반환 (seconds를 주면 최근 seconds초로 제한)
+
+        seq 다음 샘플이 이미 덮어써졌으면 남아 있는 가장 오래된 샘플부터 반환하므로,
+        첫 순번이 seq + 1이 아니면 중간이 빠진 것이다.
+        """
+        with self._lock:
+            oldest = self._appended - self._size + 1
+            first = max(0, min(seq + 1 - oldest, self._size))
+            if seconds is not None:
+                now = time.monotonic() if now is None else now
+                first = max(first, self._bisect(now - seconds))
+            return oldest + first, self._slice(first, self._size)
+
+    def latest(self):
+        """가장 최근 샘플 (값 튜플), 없으면 None"""
+        with self._lock:
+            if not self._size:
+                return None
+            index = (self._start + self._size - 1) % self.capacity
+            return tuple(column[index] for column in self._columns)
+
+
+class TemperatureRollup:
+    """고정 길이 시간 구간(bucket_seconds)별 최솟값/최댓값/평균을 샘플이 들어올 때마다 갱신
+
+    닫힌 구간은 링 버퍼에 저장되고, 진행 중인 구간은 조회 시 마지막 점으로 덧붙는다.
+    """
+
+    def __init__(self, bucket_seconds, capacity):
+        self.bucket_seconds = bucket_seconds
+        self.history = TemperatureHistory(capacity, row_type=RollupColumns)
+        self._lock = threading.Lock()
+        self._bucket = None
+        self._count = 0
+        self._min = self._max = self._sum = None
+
+    def add(self, timestamp, *values):
+        """샘플 하나 반영. 새 구간으로 넘어가면 이전 구간을 닫아서 저장"""
+        bucket = int(timestamp // self.bucket_seconds)
+        with self._lock:
+            if bucket != self._bucket:
+                if self._bucket is not None:
+                    self.history.append(*self._row())
+                self._bucket = bucket
+                self._count = 0
+                self._min = list(values)
+                self._max = list(values)
+                self._sum = [0.0] * len(values)
+            for i, value in enumerate(values):
+                if value < self._min[i]:
+                    self._min[i] = value
+                if value > self._max[i]:
+                    self._max[i] = value
+                self._sum[i] += value
+            self._count += 1
+
+    def extend(self, rows):
+        """시각 순서로 정렬된 여러 샘플을 한 번에 반영 (구간별로 묶어서 계산)"""
+        for bucket, group in groupby(rows, key=lambda row: int(row[0] // self.bucket_seconds)):
+            columns = list(zip(*group))[1:]
+            with self._lock:
+                if bucket != self._bucket:
+                    if self._bucket is not None:
+                        self.history.append(*self._row())
+                    self._bucket = bucket
+                    self._count = 0
+                    self._min = [min(column) for column in columns]
+                    self._max = [max(column) for column in columns]
+                    self._sum = [0.0] * len(columns)
+                else:
+                    self._min = [min(low, min(column)) for low, column in zip(self._min, columns)]
+                    self._max = [max(high, max(column)) for high, column in zip(self._max, columns)]
+                self._sum = [total + sum(column) for total, column in zip(self._sum, columns)]
+                self._count += len(columns[0])
+
+    def _row(self):
+        """진행 중인 구간의 값 (_lock을 잡은 상태에서 호출)"""
+        row = [self._bucket * self.bucket_seconds]
+        for minimum, maximum, total in zip(self._min, self._max, self._sum):
+            row += [minimum, maximum, total / self._count]
+        return row
+
+    def window(self, seconds, now=None):
+        """최근 seconds초 동안의 구간 (진행 중인 구간 포함)"""
+        now = time.monotonic() if now is None else now
+        start = now - seconds
+        # 시작 시각이 걸쳐 있는 구간도 포함
+        columns = self.history.between(start - self.bucket_seconds, float('inf'))
+        with self._lock:
+            if self._bucket is not None and self._bucket * self.bucket_seconds >= start - self.bucket_seconds:
+                for column, value in zip(columns, self._row()):
+                    column.append(value)
+        return columns
+
+
+def lttb(timestamps, series, threshold):
+    """Largest-Triangle-Three-Buckets 다운샘플링. 남길 샘플의 위치 목록 반환
+
+    series는 값 열 목록이며, 삼각형 넓이는 열마다 구해서 더한다 (여러 곡선의 모양을 함께 보존).
+    """
+    size = len(timestamps)
+    if threshold >= size:
+        return list(range(size))
+    if threshold < 3:
+        # 양 끝점만 남김
+        return [0, size - 1][-threshold:] if threshold > 0 else []
+
+    selected = [0]
+    bucket_size = (size - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # 다음 구간의 평균점
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, size)
+        count = next_end - next_start
+        avg_x = sum(timestamps[next_start:next_end]) / count
+        avg_ys = [sum(values[next_start:next_end]) / count for values in series]
+
+        ax = timestamps[previous]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            dx_avg = ax - avg_x
+            dx_i = timestamps[i] - ax
+            area = 0.0
+            for values, avg_y in zip(series, avg_ys):
+                ay = values[previous]
+                area += abs(dx_avg * (values[i] - ay) - (ay - avg_y) * dx_i)
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        previous = best
+    selected.append(size - 1)
+    return selected
@@ -0,0 +1,217 @@
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+from ..utils.metrics import metrics
+
+logger = logging.getLogger('mie_printer.temperature')
+
+# 세그먼트 헤더: 매직, 형식 버전, 레코드 크기 (나머지는 예약)
+HEADER = struct.Struct('<4sHH8x')
+MAGIC = b'MTLG'
+VERSION = 1
+
+# 레코드: epoch 시각(double) + tool0/bed actual/target(float32) = 24바이트
+RECORD = struct.Struct('<dffff')
+
+SEGMENT_PREFIX = 'temperature-'
+SEGMENT_SUFFIX = '.log'
+
+
+class TemperatureLog:
+    """고정 크기 레코드를 덧붙이기만 하는 온도 이력 파일 (세그먼트 단위로 교체)
+
+    샘플은 메모리에 모아 두었다가 flush_interval마다 한 번에 쓰고 fsync하므로
+    SD 카드 쓰기 횟수가 샘플 수와 무관하다. 세그먼트는 segment_records개가 차면
+    새 파일로 넘어가고, max_segments개를 넘으면 가장 오래된 것부터 지운다.
+    레코드 크기가 고정이라 구간 조회는 mmap 위에서 시각으로 이진 탐색만 하면 된다.
+    """
+
+    def __init__(self, folder, segment_records=86400, max_segments=8, flush_interval=60.0):
+        self.folder = folder
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._flushed_at = time.monotonic()
+        self._file = None
+        self._file_records = 0
+        self._last_timestamp = None
+        self._warned_backwards = False
+
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+            logger.info(f"Created temperature log folder: {self.folder}")
+
+        self._open_last_segment()
+
+    def _segment_paths(self):
+        """세그먼트 파일 경로 (오래된 것부터)"""
+        names = sorted(
+            name for name in os.listdir(self.folder)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.folder, name) for name in names]
+
+    @staticmethod
+    def _segment_index(path):
+        name = os.path.basename(path)
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    @staticmethod
+    def _check_header(f):
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, record_size = HEADER.unpack(header)
+        return magic == MAGIC and version == VERSION and record_size == RECORD.size
+
+    def _open_last_segment(self):
+        """마지막 세그먼트를 이어 쓰도록 열기. 전원이 꺼져 잘린 레코드는 잘라냄"""
+        paths = self._segment_paths()
+        if not paths:
+            self._open_new_segment(0)
+            return
+
+        path = paths[-1]
+        f = open(path, 'r+b')
+        if not self._check_header(f):
+            f.close()
+            logger.warning(f"Ignoring temperature log with bad header: {path}")
+            self._open_new_segment(self._segment_index(path) + 1)
+            return
+
+        size = os.fstat(f.fileno()).st_size
+        records = (size - HEADER.size) // RECORD.size
+        if HEADER.size + records * RECORD.size != size:
+            f.truncate(HEADER.size + records * RECORD.size)
+            logger.warning(f"Truncated partial record at end of {path}")
+        if records:
+            f.seek(HEADER.size + (records - 1) * RECORD.size)
+            self._last_timestamp = RECORD.unpack(f.read(RECORD.size))[0]
+        f.seek(0, os.SEEK_END)
+        self._file = f
+        self._file_records = records
+        if records >= self.segment_records:
+            self._rotate()
+
+    def _open_new_segment(self, index):
+        path = os.path.join(self.folder, f"{SEGMENT_PREFIX}{index:08d}{SEGMENT_SUFFIX}")
+        f = open(path, 'w+b')
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._file = f
+        self._file_records = 0
+
+    def _rotate(self):
+        """현재 세그먼트를 닫고 새 세그먼트 시작, 오래된 세그먼트 삭제"""
+        index = self._segment_index(self._file.name) + 1
+        self._file.close()
+        self._open_new_segment(index)
+        for path in self._segment_paths()[:-self.max_segments]:
+            try:
+                os.remove(path)
+                logger.info(f"Removed old temperature log segment: {path}")
+            except OSError as e:
+                logger.warning(f"Error removing temperature log segment {path}: {e}")
+
+    def append(self, timestamp, tool0_actual, tool0_target, bed_actual, bed_target):
+        """샘플 하나 추가 (timestamp는 epoch 초). flush_interval이 지났으면 디스크에 기록
+
+        시스템 시계가 뒤로 간 샘플은 시각 순서를 지키기 위해 버린다.
+        """
+        with self._lock:
+            if self._last_timestamp is not None and timestamp < self._last_timestamp:
+                if not self._warned_backwards:
+                    logger.warning("System clock went backwards, skipping temperature log samples")
+                    self._warned_backwards = True
+                return
+            self._warned_backwards = False
+            self._last_timestamp = timestamp
+            self._buffer += RECORD.pack(timestamp, tool0_actual, tool0_target, bed_actual, bed_target)
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        started = time.monotonic()
+        self._flushed_at = started
+        buffer = memoryview(self._buffer)
+        try:
+            while buffer:
+                # 세그먼트 경계에서 나누어 기록
+                count = min(len(buffer) // RECORD.size, self.segment_records - self._file_records)
+                self._file.write(buffer[:count * RECORD.size])
+                self._file_records += count
+                buffer = buffer[count * RECORD.size:]
+                if self._file_records >= self.segment_records:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._rotate()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logger.error(f"Error writing temperature log: {e}")
+        finally:
+            buffer.release()
+            self._buffer = bytearray()
+        metrics.observe('temperature_log_flush_seconds', time.monotonic() - started)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._flush_locked()
+                self._file.close()
+                self._file = None
+
+    def read_range(self, start=None, end=None):
+        """start 이상 end 미만 epoch 시각의 레코드를 (timestamp, 값 4개) 튜플로 반환 (오래된 것부터)
+
+        아직 디스크에 기록되지 않은 샘플은 포함하지 않는다.
+        """
+        with self._lock:
+            # 쓰는 중인 세그먼트도 지금까지 기록된 부분은 읽을 수 있도록
+            if self._file:
+                self._file.flush()
+            paths = self._segment_paths()
+
+        records = []
+        for path in paths:
+            try:
+                records.extend(self._read_segment(path, start, end))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Error reading temperature log segment {path}: {e}")
+        return records
+
+    def _read_segment(self, path, start, end):
+        with open(path, 'rb') as f:
+            if not self._check_header(f):
+                return []
+            size = os.fstat(f.fileno()).st_size
+            count = (size - HEADER.size) // RECORD.size
+            if not count:
+                return []
+            with mmap.mmap(f.fileno(), HEADER.size + count * RECORD.size, access=mmap.ACCESS_READ) as mm:
+                first = 0 if start is None else self._bisect(mm, count, start)
+                last = count if end is None else self._bisect(mm, count, end)
+                if first >= last:
+                    return []
+                data = mm[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size]
+        return list(RECORD.iter_unpack(data))
+
+    @staticmethod
+    def _bisect(mm, count, timestamp):
+        """timestamp 이상인 첫 레코드 위치"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('<d', mm, HEADER.size + mid * RECORD.size)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
@@ -1,8 +1,21 @@
+import uuid
 import threading
 import time
 import logging
-from collections import deque
 from datetime import datetime
+from ..utils.metrics import metrics
+from .temp_history import TemperatureHistory, TemperatureRollup, lttb
+
+# 집계 단계: (구간 길이(초), 보관할 구간 수) - 10초 단위 하루, 1분 단위 7일
+ROLLUP_TIERS = ((10, 8640), (60, 10080))
+
+# 원본 샘플 응답 열
+RAW_RESPONSE_COLUMNS = ['timestamp', 'tool0_actual', 'tool0_target', 'bed_actual', 'bed_target']
+# 집계 구간 응답 열 (actual은 평균, target은 구간 내 최댓값)
+ROLLUP_RESPONSE_COLUMNS = RAW_RESPONSE_COLUMNS + ['tool0_min', 'tool0_max', 'bed_min', 'bed_max']
+
+# 히터가 꺼져 있고 모든 온도가 이 값(°C)보다 낮으면 유휴 상태로 보고 천천히 조회
+IDLE_TEMPERATURE = 40.0
 
 logger = logging.getLogger('mie_printer.temperature')
 
@@ -15,17 +28,38 @@ class TemperatureData:
         self.bed_target = bed_target
 
 class TemperatureMonitor:
-    def __init__(self, octoprint_client, update_interval=5.0, history_size=720):  # 720초 = 12분 (5초 간격)
+    def __init__(self, octoprint_client, update_interval=5.0, history_size=86400,  # 1초 간격이면 하루
+                 snapshot_service=None, temperature_log=None, fast_interval=1.0, idle_interval=10.0,
+                 stable_band=2.0, settle_time=30.0):
         self.client = octoprint_client
+        self.snapshot_service = snapshot_service
+        # 재시작 후에도 이력을 유지하기 위한 디스크 기록 (TemperatureLog, 없으면 메모리에만 보관)
+        self.temperature_log = temperature_log
+        self._restore_lock = threading.Lock()
+        self._restored = temperature_log is None
+        # 순번을 매기는 이력의 식별자. 프로세스가 재시작되면 바뀌므로 앱은 이전 커서를 버려야 함
+        self.stream_id = uuid.uuid4().hex[:8]
+        # 조회 간격: 가열/냉각 중이거나 목표가 막 바뀌었으면 fast_interval,
+        # 목표 온도에 도달해 안정되었으면 update_interval, 히터가 꺼져 식어 있으면 idle_interval
         self.update_interval = update_interval
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        # 목표와의 차이가 stable_band(°C) 이내면 안정, 목표가 바뀐 뒤 settle_time(초) 동안은 빠르게 조회
+        self.stable_band = stable_band
+        self.settle_time = settle_time
+        self._targets = None
+        self._target_changed_at = None
+        self._wake_event = threading.Event()
         self.is_running = False
         self.monitor_thread = None
         self.last_temp_data = None
         self._connection_error_count = 0
         self.MAX_CONNECTION_ERRORS = 3
         
-        # 온도 이력 저장을 위한 deque (최대 1시간)
-        self.temp_history = deque(maxlen=history_size)
+        # 온도 이력 저장을 위한 열 단위 링 버퍼 (시각은 time.monotonic() 기준)
+        self.temp_history = TemperatureHistory(history_size)
+        # 샘플이 들어올 때마다 갱신하는 집계 단계 (세밀한 것부터)
+        self.rollups = [TemperatureRollup(seconds, capacity) for seconds, capacity in ROLLUP_TIERS]
         
     def start(self):
         """온도 모니터링 시작"""
@@ -41,39 +75,190 @@ class TemperatureMonitor:
     def stop(self):
         """온도 모니터링 중지"""
         self.is_running = False
+        self._wake_event.set()
         if self.monitor_thread:
             self.monitor_thread.join()
+        if self.temperature_log:
+            self.temperature_log.close()
         logger.info("Temperature monitoring stopped")
         
+    def wake(self):
+        """목표 온도를 바꾼 직후 등 다음 조회를 앞당길 때 호출"""
+        self._wake_event.set()
+
     def get_current_temps(self):
         """현재 온도 데이터 반환"""
         return self.last_temp_data
 
+    def record_sample(self, timestamp, tool0_actual, tool0_target, bed_actual, bed_target):
+        """샘플 하나를 원본 이력과 모든 집계 단계에 추가"""
+        self._restore_history()
+        values = (tool0_actual, tool0_target, bed_actual, bed_target)
+        self.temp_history.append(timestamp, *values)
+        for rollup in self.rollups:
+            rollup.add(timestamp, *values)
+        if self.temperature_log:
+            self.temperature_log.append(timestamp + self.wall_clock_offset(), *values)
+
+    def _restore_history(self):
+        """디스크 기록에서 메모리 이력을 한 번만 복원 (첫 샘플이나 첫 조회 때)
+
+        링 버퍼에 들어갈 만큼의 최근 구간만 mmap으로 읽어서 monotonic 시각으로 바꿔 넣는다.
+        """
+        if self._restored:
+            return
+        with self._restore_lock:
+            if self._restored:
+                return
+            started = time.monotonic()
+            offset = self.wall_clock_offset()
+            span = self.temp_history.capacity * self.fast_interval
+            try:
+                now = time.time()
+                records = self.temperature_log.read_range(now - span, now)
+            except Exception as e:
+                logger.warning(f"Error restoring temperature history: {e}")
+                records = []
+            if len(records) > self.temp_history.capacity:
+                records = records[-self.temp_history.capacity:]
+            rows = [(timestamp - offset, *values) for timestamp, *values in records]
+            self.temp_history.extend(rows)
+            for rollup in self.rollups:
+                rollup.extend(rows)
+            self._restored = True
+            logger.info(f"Restored {len(records)} temperature samples in {time.monotonic() - started:.2f}s")
+
+    def get_temperature_window(self, minutes=60, max_points=None):
+        """지정된 시간(분) 동안의 온도 이력을 열 단위(TemperatureColumns)로 반환
+
+        timestamp 열은 time.monotonic() 기준이며, wall_clock_offset()을 더하면 epoch 시각이 된다.
+        max_points보다 샘플이 많으면 LTTB로 모양을 유지하며 줄인다.
+        """
+        self._restore_history()
+        window = self.temp_history.window(minutes * 60)
+        if max_points is not None and len(window.timestamp) > max_points:
+            indices = lttb(window.timestamp, [window.tool0_actual, window.bed_actual], max_points)
+            window = type(window)(*([column[i] for i in indices] for column in window))
+        return window
+
+    def get_downsampled_history(self, minutes=60, max_points=500):
+        """최대 max_points개 점으로 줄인 온도 이력 (GET_TEMP_HISTORY의 max_points 응답)
+
+        원본, 10초, 1분 단계 중 창 안의 점 수가 max_points 이하인 가장 세밀한 단계를 고르고,
+        가장 거친 단계로도 넘치면 그 단계를 LTTB로 줄인다.
+        """
+        self._restore_history()
+        seconds = minutes * 60
+        offset = self.wall_clock_offset()
+
+        raw = self.temp_history.window(seconds)
+        if len(raw.timestamp) <= max_points:
+            return {
+                'resolution': self.fast_interval,
+                'downsampled': False,
+                'columns': RAW_RESPONSE_COLUMNS,
+                'points': [
+                    [round(timestamp + offset, 1)] + [round(value, 2) for value in values]
+                    for timestamp, *values in zip(*raw)
+                ]
+            }
+
+        for rollup in self.rollups:
+            tier = rollup.window(seconds)
+            if len(tier.timestamp) <= max_points or rollup is self.rollups[-1]:
+                break
+        indices = range(len(tier.timestamp))
+        downsampled = len(tier.timestamp) > max_points
+        if downsampled:
+            indices = lttb(tier.timestamp, [tier.tool0_actual_mean, tier.bed_actual_mean], max_points)
+
+        points = []
+        for i in indices:
+            points.append([
+                round(tier.timestamp[i] + offset, 1),
+                round(tier.tool0_actual_mean[i], 2),
+                round(tier.tool0_target_max[i], 2),
+                round(tier.bed_actual_mean[i], 2),
+                round(tier.bed_target_max[i], 2),
+                round(tier.tool0_actual_min[i], 2),
+                round(tier.tool0_actual_max[i], 2),
+                round(tier.bed_actual_min[i], 2),
+                round(tier.bed_actual_max[i], 2)
+            ])
+        return {
+            'resolution': rollup.bucket_seconds,
+            'downsampled': downsampled,
+            'columns': ROLLUP_RESPONSE_COLUMNS,
+            'points': points
+        }
+
+    def get_history_since(self, since_seq=None, stream=None, minutes=60):
+        """since_seq 이후의 새 샘플만 열 단위로 인코딩해서 반환 (GET_TEMP_HISTORY의 since_seq 응답)
+
+        since_seq가 없거나, stream이 현재 stream_id와 다르거나, 커서가 범위를 벗어났거나
+        최근 minutes분보다 오래됐으면 최근 minutes분 전체를 reset=True로 보낸다.
+        시각은 base_ts(epoch 초)와 이전 샘플과의 간격(ms) 목록으로, 온도는 히터별 actual/target 배열로 보낸다.
+        """
+        self._restore_history()
+        last_seq = self.temp_history.last_seq
+        reset = (since_seq is None or stream != self.stream_id
+                 or since_seq > last_seq or since_seq < 0)
+        if not reset:
+            first_seq, window = self.temp_history.since(since_seq, minutes * 60)
+            # 커서 다음 샘플이 이미 밀려났거나 minutes분 밖이면 전체 구간을 다시 보냄
+            reset = first_seq != since_seq + 1
+        if reset:
+            first_seq, window = self.temp_history.since(0, minutes * 60)
+
+        timestamps = window.timestamp
+        base_ts = round(timestamps[0] + self.wall_clock_offset(), 3) if timestamps else None
+        deltas = []
+        previous = timestamps[0] if timestamps else 0.0
+        for timestamp in timestamps:
+            deltas.append(int(round((timestamp - previous) * 1000)))
+            previous = timestamp
+
+        return {
+            'stream': self.stream_id,
+            'reset': reset,
+            'first_seq': first_seq,
+            'last_seq': first_seq + len(timestamps) - 1,
+            'base_ts': base_ts,
+            'dt_ms': deltas,
+            'tool0': {
+                'actual': [round(value, 2) for value in window.tool0_actual],
+                'target': [round(value, 2) for value in window.tool0_target]
+            },
+            'bed': {
+                'actual': [round(value, 2) for value in window.bed_actual],
+                'target': [round(value, 2) for value in window.bed_target]
+            }
+        }
+
+    @staticmethod
+    def wall_clock_offset():
+        """monotonic 시각을 epoch 시각으로 바꿀 때 더하는 값 (시스템 시계가 바뀌어도 이력 순서 유지)"""
+        return time.time() - time.monotonic()
+
     def get_temperature_history(self, minutes=60):
-        """지정된 시간(분) 동안의 온도 이력 반환"""
-        if not self.temp_history:
-            return []
-            
-        current_time = datetime.now()
-        history_limit = minutes * 60  # 초 단위로 변환
-        
-        # 지정된 시간 내의 데이터만 필터링
-        filtered_history = [
-            data for data in self.temp_history
-            if (current_time - data.timestamp).total_seconds() <= history_limit
+        """지정된 시간(분) 동안의 온도 이력 반환 (TemperatureData 목록)"""
+        window = self.get_temperature_window(minutes)
+        offset = self.wall_clock_offset()
+        return [
+            TemperatureData(datetime.fromtimestamp(timestamp + offset), *values)
+            for timestamp, *values in zip(*window)
         ]
         
-        return filtered_history
-        
     def _monitor_loop(self):
         """온도 모니터링 루프"""
         error_logged = False  # 에러 로그 출력 여부 추적
         
         while self.is_running:
+            started = time.monotonic()
             try:
-                printer_data = self.client.get_printer_status()
+                temperature = self._fetch_temperatures()
                 
-                if printer_data is None:
+                if temperature is None:
                     if not error_logged:  # 첫 번째 에러일 때만 로그 출력
                         self.last_temp_data = {
                             "tool0": {"actual": 0, "target": 0},
@@ -83,23 +268,20 @@ class TemperatureMonitor:
                         error_logged = True
                 else:
                     error_logged = False  # 성공하면 에러 로그 상태 초기화
-                    if 'temperature' in printer_data:
-                        self.last_temp_data = printer_data['temperature']
+                    self.last_temp_data = temperature
                         # logger.info(f"Temperature data received - Tool0: {self.last_temp_data['tool0']['actual']}°C/{self.last_temp_data['tool0']['target']}°C, Bed: {self.last_temp_data['bed']['actual']}°C/{self.last_temp_data['bed']['target']}°C")
                         # logger.info(f"Temperature data received - Tool0: {self.last_temp_data['tool0']['actual']}°C/{self.last_temp_data['tool0']['target']}°C, Bed: {self.last_temp_data['bed']['actual']}°C/{self.last_temp_data['bed']['target']}°C")
                         
                 # 온도 이력 저장 (오류가 있어도 계속 실행)
                 try:
                     if self.last_temp_data and 'tool0' in self.last_temp_data and 'bed' in self.last_temp_data:
-                        temp_data = TemperatureData(
-                            timestamp=datetime.now(),
-                            tool0_actual=self.last_temp_data['tool0'].get('actual', 0),
-                            tool0_target=self.last_temp_data['tool0'].get('target', 0),
-                            bed_actual=self.last_temp_data['bed'].get('actual', 0),
-                            bed_target=self.last_temp_data['bed'].get('target', 0)
+                        self.record_sample(
+                            time.monotonic(),
+                            self.last_temp_data['tool0'].get('actual') or 0,
+                            self.last_temp_data['tool0'].get('target') or 0,
+                            self.last_temp_data['bed'].get('actual') or 0,
+                            self.last_temp_data['bed'].get('target') or 0
                         )
-                        self.temp_history.append(temp_data)
-                        logger.debug(f"Temperature history updated. History size: {len(self.temp_history)}")
                         logger.debug(f"Temperature history updated. History size: {len(self.temp_history)}")
                     else:
                         logger.debug("온도 데이터가 유효하지 않아 이력에 추가하지 않습니다.")
@@ -111,4 +293,39 @@ class TemperatureMonitor:
                     logger.warning(f"Error in temperature monitoring: {e}")
                     error_logged = True
                 
-            time.sleep(self.update_interval)
\ No newline at end of file
+            metrics.observe('poller_loop_seconds', time.monotonic() - started, loop='temperature')
+            interval = self._next_interval(self.last_temp_data, time.monotonic())
+            metrics.set('temperature_poll_interval_seconds', interval)
+            self._wake_event.wait(max(0.0, interval - (time.monotonic() - started)))
+            self._wake_event.clear()
+
+    def _fetch_temperatures(self):
+        """온도만 조회. 공유 스냅샷이 충분히 새로우면 OctoPrint에 요청하지 않고 그 값을 사용"""
+        if self.snapshot_service:
+            status = self.snapshot_service.peek_status(self.fast_interval)
+            if status and 'temperature' in status:
+                return status['temperature']
+        return self.client.get_temperatures()
+
+    def _next_interval(self, temperature, now):
+        """현재 온도 상태에 맞는 다음 조회까지의 간격"""
+        if not temperature:
+            return self.update_interval
+
+        heaters = [temperature.get(heater) or {} for heater in ('tool0', 'bed')]
+        targets = tuple(heater.get('target') or 0 for heater in heaters)
+        if targets != self._targets:
+            if self._targets is not None:
+                self._target_changed_at = now
+            self._targets = targets
+
+        if self._target_changed_at is not None and now - self._target_changed_at < self.settle_time:
+            return self.fast_interval
+        for heater in heaters:
+            actual = heater.get('actual') or 0
+            target = heater.get('target') or 0
+            if target > 0 and abs(actual - target) > self.stable_band:
+                return self.fast_interval
+        if not any(targets) and all((heater.get('actual') or 0) < IDLE_TEMPERATURE for heater in heaters):
+            return self.idle_interval
+        return self.update_interval
\ No newline at end of file
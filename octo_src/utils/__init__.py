@@ -1,4 +1,5 @@
 from .config_manager import ConfigManager
 from .logger import setup_logger
+from .metrics import metrics, MetricsRegistry, PrometheusFileExporter
 
-__all__ = ['ConfigManager', 'setup_logger'] 
\ No newline at end of file
+__all__ = ['ConfigManager', 'setup_logger', 'metrics', 'MetricsRegistry', 'PrometheusFileExporter'] 
\ No newline at end of file
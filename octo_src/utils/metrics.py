@@ -0,0 +1,219 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('mie_printer.metrics')
+
+# 지연 시간 히스토그램 버킷 상한 (초): 100µs부터 2배씩 늘려 약 105초까지
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    """로그 간격 버킷 히스토그램 (관측 한 번에 이진 탐색 한 번)"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # 마지막 칸은 가장 큰 상한을 넘는 값 (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """q 분위수 추정값 (해당 버킷의 상한, 최댓값을 넘지 않음)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                bound = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """프로세스 안의 카운터, 게이지, 히스토그램 모음
+
+    값은 (이름, 레이블) 별로 보관하며, 갱신은 잠금 한 번과 dict 조회 한 번으로 끝난다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items())) if labels else ()
+
+    def inc(self, name, value=1, **labels):
+        """카운터 증가"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """게이지 값 설정"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """히스토그램에 값 추가"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """with 블록의 실행 시간을 히스토그램에 기록"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """JSON으로 보낼 수 있는 현재 값 (GET_METRICS 응답)"""
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+            histograms = [
+                (key, h.count, h.sum, h.max, h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                for key, h in self._histograms.items()
+            ]
+
+        result = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for (name, labels), value in counters:
+            result['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), value in gauges:
+            result['gauges'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), count, total, maximum, p50, p95, p99 in histograms:
+            result['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': count,
+                'sum': round(total, 6),
+                'mean': round(total / count, 6) if count else 0.0,
+                'p50': round(p50, 6),
+                'p95': round(p95, 6),
+                'p99': round(p99, 6),
+                'max': round(maximum, 6)
+            })
+        return result
+
+    def to_prometheus(self):
+        """Prometheus 텍스트 형식으로 변환"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, list(h.counts), h.count, h.sum, h.bounds) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            declare(name, 'gauge')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), counts, count, total, bounds in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(bounds + (float('inf'),), counts):
+                cumulative += bucket
+                le = '+Inf' if bound == float('inf') else f"{bound:.6g}"
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class PrometheusFileExporter:
+    """레지스트리 내용을 주기적으로 Prometheus 텍스트 파일로 기록 (node_exporter textfile collector용)"""
+
+    def __init__(self, registry, path, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.is_running = False
+        self.export_thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._stop_event.clear()
+        self.export_thread = threading.Thread(target=self._export_loop)
+        self.export_thread.daemon = True
+        self.export_thread.start()
+        logger.info(f"Writing metrics to {self.path} every {self.interval}s")
+
+    def stop(self):
+        self.is_running = False
+        self._stop_event.set()
+        if self.export_thread:
+            self.export_thread.join()
+
+    def export(self):
+        """파일을 원자적으로 교체 (수집기가 쓰다 만 파일을 읽지 않도록)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.registry.to_prometheus())
+        os.replace(temp_path, self.path)
+
+    def _export_loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                logger.error(f"Error writing metrics file: {e}")
+
+
+# 프로세스 전체에서 공유하는 기본 레지스트리
+metrics = MetricsRegistry()
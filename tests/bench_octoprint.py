@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import statistics
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.octoprint import OctoPrintClient
+from octo_src.utils.config_manager import ConfigManager
+
+# 요청 하나당 지연 시간 비교: 매번 새 연결 vs 연결 풀 재사용
+# 사용법: python tests/bench_octoprint.py [반복 횟수]
+
+
+def measure(label, request, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = request()
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            print(f"{label}: unexpected status {response.status_code}")
+            return None
+    samples.sort()
+    print(f"{label:<12} mean {statistics.mean(samples):7.2f} ms  "
+          f"p50 {samples[len(samples) // 2]:7.2f} ms  "
+          f"p95 {samples[int(len(samples) * 0.95) - 1]:7.2f} ms")
+    return statistics.mean(samples)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    config = ConfigManager()
+    base_url = config.get('octoprint.base_url', 'http://localhost:5000')
+    headers = {'X-Api-Key': config.get('octoprint.api_key')}
+
+    client = OctoPrintClient(
+        api_key=config.get('octoprint.api_key'),
+        base_url=base_url,
+        pool_size=config.get('octoprint.pool_size', 4),
+        connect_timeout=config.get('octoprint.connect_timeout', 3.05),
+        read_timeout=config.get('octoprint.read_timeout', 10)
+    )
+
+    print(f"GET {base_url}/api/printer x {count}")
+    fresh = measure("new conn", lambda: requests.get(f"{base_url}/api/printer", headers=headers, timeout=10), count)
+    pooled = measure("pooled", lambda: client._get("/api/printer"), count)
+    client.close()
+
+    if fresh and pooled:
+        print(f"saved {fresh - pooled:.2f} ms per call ({(1 - pooled / fresh) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import struct
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# 실제 하드웨어 없이 OctoPrint 푸시 API를 흉내 내는 서버
+# 사용법:
+#   python tests/mock_octoprint_push.py serve [port]   # 서버만 실행
+#   python tests/mock_octoprint_push.py [port]         # 서버 + OctoPrintPushClient 동작 확인
+
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class MockPrinter:
+    """가짜 프린터 상태: 온도가 목표치로 수렴하고 출력 진행률과 이동 로그가 늘어남"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tool0 = 25.0
+        self.bed = 25.0
+        self.completion = 0.0
+        self.filepos = 0
+        self.line = 0
+        self.pending_logs = ["Send: G28", "Recv: ok", "Send: G90", "Send: M106 S128"]
+
+    def tick(self):
+        with self.lock:
+            self.tool0 += (200.0 - self.tool0) * 0.2 + random.uniform(-0.3, 0.3)
+            self.bed += (60.0 - self.bed) * 0.1 + random.uniform(-0.2, 0.2)
+            self.completion = min(100.0, self.completion + 0.5)
+            self.filepos += 1024
+            self.line += 1
+            self.pending_logs.append(f"Send: N{self.line} G1 X{self.line % 100}.0 Y{self.line % 50}.5 Z0.3 E1.0*12")
+            self.pending_logs.append("Recv: ok")
+            if self.line % 20 == 0:
+                self.pending_logs.append(f"Send: N{self.line + 1} M106 S{(self.line * 7) % 256}*3")
+
+    def payload(self):
+        with self.lock:
+            logs, self.pending_logs = self.pending_logs, []
+            return {
+                'state': {'text': 'Printing', 'flags': {'printing': True, 'operational': True}},
+                'job': {'file': {'name': 'mock.gcode', 'path': 'mock.gcode', 'origin': 'local'}},
+                'progress': {
+                    'completion': self.completion,
+                    'filepos': self.filepos,
+                    'printTime': self.line,
+                    'printTimeLeft': int((100.0 - self.completion) * 10)
+                },
+                'currentZ': 0.3,
+                'temps': [{
+                    'time': int(time.time()),
+                    'tool0': {'actual': round(self.tool0, 2), 'target': 200.0},
+                    'bed': {'actual': round(self.bed, 2), 'target': 60.0}
+                }],
+                'logs': logs,
+                'messages': []
+            }
+
+
+def _send_frame(sock, text):
+    """서버 -> 클라이언트 텍스트 프레임 (마스킹 없음)"""
+    payload = text.encode('utf-8')
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(126)
+        header += struct.pack('!H', len(payload))
+    else:
+        header.append(127)
+        header += struct.pack('!Q', len(payload))
+    sock.sendall(bytes(header) + payload)
+
+
+def _read_frames(rfile, on_close):
+    """클라이언트 프레임을 읽어 버림 (auth 메시지, ping 등). 연결이 끊기면 on_close 호출"""
+    try:
+        while True:
+            head = rfile.read(2)
+            if len(head) < 2:
+                break
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', rfile.read(8))[0]
+            rfile.read(4 + length)
+            if head[0] & 0x0F == 0x8:
+                break
+    except OSError:
+        pass
+    on_close()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    printer = MockPrinter()
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if self.path == '/api/login':
+            self._json(200, {'name': 'mock', 'session': 'mock-session'})
+        else:
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def do_GET(self):
+        if self.path == '/sockjs/websocket':
+            return self._websocket()
+        payload = self.printer.payload()
+        if self.path.startswith('/api/printer'):
+            self._json(200, {'state': payload['state'], 'temperature': payload['temps'][0]})
+        elif self.path.startswith('/api/job'):
+            self._json(200, {'state': 'Printing', 'job': payload['job'], 'progress': payload['progress']})
+        else:
+            self._json(404, {})
+
+    def _websocket(self):
+        key = self.headers['Sec-WebSocket-Key'].encode()
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+
+        closed = threading.Event()
+        reader = threading.Thread(target=_read_frames, args=(self.rfile, closed.set))
+        reader.daemon = True
+        reader.start()
+
+        sock = self.connection
+        try:
+            _send_frame(sock, json.dumps({'connected': {'version': 'mock'}}))
+            _send_frame(sock, json.dumps({'history': self.printer.payload()}))
+            while not closed.wait(0.5):
+                self.printer.tick()
+                _send_frame(sock, json.dumps({'current': self.printer.payload()}))
+        except OSError:
+            pass
+        self.close_connection = True
+
+
+def serve(port=0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'serve':
+        port = int(args[1]) if len(args) > 1 else 5000
+        serve(port)
+        print(f"Mock OctoPrint push server on http://127.0.0.1:{port}")
+        while True:
+            time.sleep(1)
+
+    from octo_src.octoprint import OctoPrintPushClient
+
+    server = serve(int(args[0]) if args else 0)
+    client = OctoPrintPushClient('mock-key', f"http://127.0.0.1:{server.server_port}")
+    client.start()
+    try:
+        for _ in range(10):
+            time.sleep(1)
+            status = client.get_printer_status()
+            print(f"connected={client.connected} temp={status['temperature']} "
+                  f"fan={status['fan_speed']}% pos={client.get_position()} progress={status['progress']}")
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
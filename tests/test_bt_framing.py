@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.bluetooth.bt_framing import (
+    MessageDecoder, BinaryFrame, FRAME_UPLOAD_CHUNK, BINARY_FRAME_HEADER, encode_binary_frame
+)
+
+# 블루투스 수신 스트림 디코더가 어떻게 나뉘어 도착해도 같은 메시지를 내는지 확인
+# 사용법: python tests/test_bt_framing.py
+
+MESSAGES = [
+    {'type': 'GET_STATUS'},
+    {'type': 'UPLOAD_GCODE', 'filename': 'a {b}.gcode', 'note': 'quote " and \\ and }{'},
+    {'type': 'BATCH', 'commands': [{'type': 'SET_TEMP', 'target': 200}, {'nested': {'x': [1, {}]}}]},
+    {'type': 'UNICODE', 'text': '노즐 온도 · ✓'},
+]
+
+
+def build_stream():
+    """JSON 메시지(줄바꿈 구분, 구분자 없음 섞음)와 바이너리 프레임이 섞인 스트림과 기대 결과"""
+    frames = [
+        BinaryFrame(FRAME_UPLOAD_CHUNK, 7, 0, bytes(range(256)) * 4),
+        # 페이로드에 '{', '}', '"'와 시작 바이트가 들어 있어도 그대로 전달돼야 함
+        BinaryFrame(FRAME_UPLOAD_CHUNK, 7, 1024, b'{"a": "}' + bytes([0xB7]) * 10 + b'\n'),
+        BinaryFrame(FRAME_UPLOAD_CHUNK, 8, 2 ** 40, b''),
+    ]
+    parts = []
+    expected = []
+    for i, message in enumerate(MESSAGES):
+        encoded = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        parts.append(encoded + (b'\n' if i % 2 else b''))
+        expected.append(message)
+        if i < len(frames):
+            frame = frames[i]
+            parts.append(encode_binary_frame(frame.frame_type, frame.upload_id, frame.offset, frame.payload))
+            expected.append(frame)
+    return b''.join(parts), expected
+
+
+def feed_in_pieces(data, size):
+    decoder = MessageDecoder()
+    messages = []
+    for i in range(0, len(data), size):
+        messages.extend(decoder.feed(data[i:i + size]))
+    return messages
+
+
+def test_split_positions():
+    data, expected = build_stream()
+    for size in (1, 2, 3, 7, 17, BINARY_FRAME_HEADER.size, 1000, len(data)):
+        assert feed_in_pieces(data, size) == expected, f"pieces of {size} bytes"
+    # 모든 위치에서 두 조각으로 나눠도 같아야 함
+    for split in range(len(data) + 1):
+        decoder = MessageDecoder()
+        messages = decoder.feed(data[:split]) + decoder.feed(data[split:])
+        assert messages == expected, f"split at {split}"
+
+
+def test_invalid_messages_skipped():
+    decoder = MessageDecoder()
+    messages = decoder.feed(b'garbage\n{"bad": }\n[1, 2]{"type": "OK"}\r\n')
+    assert messages == [{'type': 'OK'}], messages
+
+
+def test_oversized_payload_header_skipped():
+    decoder = MessageDecoder(max_payload_size=16)
+    bad = BINARY_FRAME_HEADER.pack(0xB7, FRAME_UPLOAD_CHUNK, 1, 0, 1000)
+    messages = decoder.feed(bad + b'{"type": "AFTER"}')
+    assert messages == [{'type': 'AFTER'}], messages
+
+
+def test_message_size_limit():
+    decoder = MessageDecoder(max_message_size=64)
+    messages = decoder.feed(b'{"data": "' + b'x' * 100)
+    messages += decoder.feed(b'"}{"type": "NEXT"}')
+    assert messages == [{'type': 'NEXT'}], messages
+
+
+if __name__ == '__main__':
+    # 잘못된 입력에 대한 오류 로그는 여기서 확인하지 않음
+    logging.disable(logging.CRITICAL)
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")
@@ -0,0 +1,172 @@
+import os
+import sys
+import math
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.gcode.gcode_transform import transform_gcode
+
+# 변환 전후 G-code를 같은 방식으로 실행해 보고 경로, 압출량, 이송 속도가 같은지 확인
+# 사용법: python tests/test_gcode_transform.py
+
+# 원호/직선을 이 간격(mm)으로 나눠서 비교
+SAMPLE_STEP = 0.005
+# 원래 점과 변환된 경로 사이 허용 거리 (arc_tolerance + 좌표 반올림)
+PATH_TOLERANCE = 0.02
+
+
+def simulate(path):
+    """이동마다 (x, y, z, e, feedrate, 이동 끝점 여부) 샘플 목록 반환"""
+    x = y = z = e = 0.0
+    feedrate = None
+    absolute, relative_e = True, False
+    samples = []
+    with open(path) as f:
+        for line in f:
+            words = line.split(';', 1)[0].split()
+            if not words:
+                continue
+            code = words[0].upper()
+            if code.startswith('N'):
+                # 줄 번호와 체크섬
+                words = [word for word in words[1:] if '*' not in word] + [
+                    word.split('*')[0] for word in words[1:] if '*' in word
+                ]
+                code = words[0].upper()
+            values = {}
+            for word in words[1:]:
+                try:
+                    values[word[0].upper()] = float(word[1:])
+                except ValueError:
+                    pass
+
+            if code == 'G90':
+                absolute, relative_e = True, False
+            elif code == 'G91':
+                absolute, relative_e = False, True
+            elif code == 'M82':
+                relative_e = False
+            elif code == 'M83':
+                relative_e = True
+            elif code == 'G92':
+                x, y, z, e = (values.get(axis, old) for axis, old in zip('XYZE', (x, y, z, e)))
+            elif code == 'G28':
+                x = y = z = 0.0
+                samples.append((x, y, z, e, feedrate, True))
+            elif code in ('G0', 'G1', 'G2', 'G3'):
+                if 'F' in values:
+                    feedrate = round(values['F'])
+                start = (x, y, z, e)
+                if absolute:
+                    x, y, z = (values.get(axis, old) for axis, old in zip('XYZ', (x, y, z)))
+                else:
+                    x, y, z = (old + values.get(axis, 0.0) for axis, old in zip('XYZ', (x, y, z)))
+                if 'E' in values:
+                    e = e + values['E'] if relative_e else values['E']
+                samples.extend(_interpolate(code, start, (x, y, z, e), values, feedrate))
+    return samples
+
+
+def _interpolate(code, start, end, values, feedrate):
+    sx, sy, sz, se = start
+    ex, ey, ez, ee = end
+    if code in ('G2', 'G3'):
+        cx, cy = sx + values.get('I', 0.0), sy + values.get('J', 0.0)
+        radius = math.hypot(sx - cx, sy - cy)
+        a0 = math.atan2(sy - cy, sx - cx)
+        sweep = math.atan2(ey - cy, ex - cx) - a0
+        if code == 'G2':
+            sweep = -((-sweep) % (2 * math.pi))
+        else:
+            sweep %= 2 * math.pi
+        count = max(1, int(abs(sweep) * radius / SAMPLE_STEP))
+        points = []
+        for i in range(1, count + 1):
+            t = i / count
+            angle = a0 + sweep * t
+            points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle),
+                           sz + (ez - sz) * t, se + (ee - se) * t, feedrate, False))
+        # 펌웨어는 마지막에 지정된 끝점으로 이동
+        points[-1] = (ex, ey, ez, ee, feedrate, True)
+        return points
+    count = max(1, int(math.dist((sx, sy, sz), (ex, ey, ez)) / SAMPLE_STEP))
+    return [
+        (sx + (ex - sx) * i / count, sy + (ey - sy) * i / count, sz + (ez - sz) * i / count,
+         se + (ee - se) * i / count, feedrate, i == count)
+        for i in range(1, count + 1)
+    ]
+
+
+def compare(source, target):
+    """원래 이동 끝점마다 변환된 경로에서 순서대로 가까운 점을 찾고 속도 비교,
+    변환된 이동 끝점의 압출량은 원래 끝점 중 하나와 같아야 함"""
+    expected = [sample for sample in simulate(source) if sample[5]]
+    actual = simulate(target)
+    j = 0
+    for x, y, z, e, feedrate, _ in expected:
+        while j < len(actual) and math.dist((x, y, z), actual[j][:3]) > PATH_TOLERANCE:
+            j += 1
+        assert j < len(actual), f"point {(x, y, z)} missing from transformed path"
+        # 같은 위치에서 속도만 바꾸는 줄이 이어질 수 있음
+        while actual[j][4] != feedrate and j + 1 < len(actual) \
+                and math.dist((x, y, z), actual[j + 1][:3]) <= PATH_TOLERANCE:
+            j += 1
+        assert actual[j][4] == feedrate, f"feedrate at {(x, y, z)}: {actual[j][4]} != {feedrate}"
+
+    source_ends = {(round(s[0], 3), round(s[1], 3), round(s[2], 3), round(s[3], 4)) for s in expected}
+    for x, y, z, e, _, is_end in actual:
+        if is_end:
+            assert (round(x, 3), round(y, 3), round(z, 3), round(e, 4)) in source_ends, \
+                f"move end {(x, y, z, e)} not in source"
+    assert math.dist(expected[-1][:4], actual[-1][:4]) < 1e-4, "final position/extrusion differ"
+
+
+def write_sample(path):
+    lines = ['G28', 'G90', 'M82', 'G92 E0', 'G1 Z0.2 F1200', 'G0 X130 Y100 F6000', 'G1 F1800']
+    e = 0.0
+    # 원호로 합쳐질 링
+    for i in range(1, 200):
+        angle = 2 * math.pi * i / 240
+        e += 0.04
+        lines.append(f"G1 X{100 + 30 * math.cos(angle):.3f} Y{100 + 30 * math.sin(angle):.3f} E{e:.5f} ; wall")
+    # 원래 있던 원호 뒤로 되돌아가는 이동
+    x, y = 100 + 30 * math.cos(2 * math.pi * 199 / 240), 100 + 30 * math.sin(2 * math.pi * 199 / 240)
+    e += 1
+    lines.append(f"G2 X{x + 10:.3f} Y{y:.3f} I5 J0 E{e:.5f} F900")
+    e += 1
+    lines.append(f"G1 X{x:.3f} Y{y:.3f} E{e:.5f}")
+    # 변환하지 않는 인자가 붙은 이동 뒤의 속도
+    e += 1
+    lines += [f"G1 X10 Y0 E{e:.5f} F600 T0", f"G1 X0 Y0 E{e + 1:.5f} F1200"]
+    e += 1
+    lines += ['N10 G1 X5 Y5 F700*33', 'G1 X6 Y6 F1200', 'G1 X6 Y6', '   ', 'M117 Hello   world ; msg']
+    # 상대 좌표 구간
+    lines += ['G91', 'G1 X1 Y1 E0.1', 'G1 X0 Y0 E0', 'G1 X1 E0.1 F900', 'G90', 'M82', f'G92 E{e:.5f}']
+    # 상대 압출 구간의 직선 합치기
+    lines += ['M83', 'G1 X20 Y20 Z0.2 F1500'] + [f"G1 X{20 + i * 0.5:.3f} Y20 E0.02" for i in range(1, 21)]
+    lines += ['G28 X', 'G1 X20 Y20 E0.5', 'M82']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def run_case(name, text=None):
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, 'source.gcode')
+        target = os.path.join(folder, 'target.gcode')
+        if text is None:
+            write_sample(source)
+        else:
+            with open(source, 'w') as f:
+                f.write(text)
+        stats = transform_gcode(source, target)
+        compare(source, target)
+        print(f"{name}: OK {stats['input_bytes']} -> {stats['output_bytes']} bytes, {stats['arcs']} arcs")
+        return stats
+
+
+if __name__ == '__main__':
+    run_case('arc passthrough', 'G90\nM82\nG92 E0\nG1 X10 Y0 E1\nG2 X20 Y0 I5 J0 E2\nG1 X10 Y0 E3\n')
+    run_case('feedrate after passthrough', 'G90\nM82\nG92 E0\nG1 X10 Y0 E1 F600 T0\nG1 X0 Y0 E1 F1200\n')
+    stats = run_case('mixed')
+    assert stats['arcs'] > 0 and stats['lines_merged'] > 0
@@ -0,0 +1,92 @@
+import os
+import sys
+import math
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.octoprint.temp_history import TemperatureHistory, lttb
+
+# 온도 링 버퍼의 구간/순번 조회와 LTTB 다운샘플링 확인
+# 사용법: python tests/test_temp_history.py
+
+
+def row(i):
+    return (float(i), 200.0 + i, 210.0, 60.0 + i, 60.0)
+
+
+def filled(capacity, count):
+    history = TemperatureHistory(capacity)
+    for i in range(1, count + 1):
+        history.append(*row(i))
+    return history
+
+
+def test_ring_buffer_wraps():
+    history = filled(5, 8)
+    assert len(history) == 5 and history.last_seq == 8
+    window = history.window()
+    assert list(window.timestamp) == [4.0, 5.0, 6.0, 7.0, 8.0]
+    assert list(window.tool0_actual) == [204.0, 205.0, 206.0, 207.0, 208.0]
+    assert list(history.window(2.5, now=8.0).timestamp) == [6.0, 7.0, 8.0]
+    assert list(history.between(5.0, 7.0).timestamp) == [5.0, 6.0]
+    assert history.latest() == row(8)
+
+    # extend도 append와 같은 결과
+    extended = TemperatureHistory(5)
+    extended.extend(row(i) for i in range(1, 4))
+    extended.extend(row(i) for i in range(4, 9))
+    assert extended.window() == history.window() and extended.last_seq == 8
+
+    try:
+        history.append(*row(1))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("appending an older timestamp must fail")
+
+
+def test_since():
+    history = filled(5, 8)
+    # 커서 다음 샘플부터
+    first_seq, window = history.since(6)
+    assert first_seq == 7 and list(window.timestamp) == [7.0, 8.0]
+    # 새 샘플 없음
+    first_seq, window = history.since(8)
+    assert first_seq == 9 and len(window.timestamp) == 0
+    # 커서 다음 샘플이 이미 덮어써짐: 남은 가장 오래된 샘플부터, 순번으로 빈틈을 알 수 있음
+    first_seq, window = history.since(1)
+    assert first_seq == 4 and list(window.timestamp) == [4.0, 5.0, 6.0, 7.0, 8.0]
+    # 최근 seconds초로 제한하면 오래된 커서도 구간 밖은 보내지 않음
+    first_seq, window = history.since(4, seconds=2.5, now=8.0)
+    assert first_seq == 6 and list(window.timestamp) == [6.0, 7.0, 8.0]
+    first_seq, window = history.since(7, seconds=2.5, now=8.0)
+    assert first_seq == 8 and list(window.timestamp) == [8.0]
+
+
+def test_lttb():
+    assert lttb([0, 1, 2], [[0, 0, 0]], 5) == [0, 1, 2]
+    assert lttb(list(range(10)), [[0] * 10], 2) == [0, 9]
+    assert lttb(list(range(10)), [[0] * 10], 0) == []
+
+    rng = random.Random(4)
+    size = 1000
+    timestamps = [float(i) for i in range(size)]
+    curve = [math.sin(i / 50) + rng.uniform(-0.01, 0.01) for i in range(size)]
+    flat = [60.0] * size
+    # 한 점짜리 급격한 변화는 남아야 함
+    curve[537] += 5
+    for threshold in (3, 10, 100, 999):
+        selected = lttb(timestamps, [curve, flat], threshold)
+        assert len(selected) == threshold
+        assert selected[0] == 0 and selected[-1] == size - 1
+        assert all(a < b for a, b in zip(selected, selected[1:]))
+        if threshold >= 10:
+            assert 537 in selected, threshold
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")
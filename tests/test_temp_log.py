@@ -0,0 +1,86 @@
+import os
+import sys
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.octoprint.temp_log import TemperatureLog, HEADER, RECORD
+
+# 온도 이력 파일의 구간 조회, 세그먼트 교체, 재시작 후 이어 쓰기 확인
+# 사용법: python tests/test_temp_log.py
+
+BASE_TS = 1_700_000_000.0
+
+
+def sample(i):
+    # float32로 저장되므로 정확히 표현되는 값만 사용
+    return (BASE_TS + i, 200.0 + i % 8, 210.0, 60.0 - i % 4, 60.0)
+
+
+def open_log(folder, **kwargs):
+    # 자동 flush가 일어나지 않도록 flush_interval을 크게 잡음
+    return TemperatureLog(folder, segment_records=10, max_segments=3, flush_interval=3600, **kwargs)
+
+
+def test_read_range_and_rotation():
+    with tempfile.TemporaryDirectory() as folder:
+        log = open_log(folder)
+        for i in range(35):
+            log.append(*sample(i))
+        # flush 전에는 디스크에 없음
+        assert log.read_range() == []
+        log.flush()
+
+        # 세그먼트 0..3 중 가장 오래된 0이 지워져 10..34만 남음
+        assert len(log._segment_paths()) == 3
+        assert log.read_range() == [sample(i) for i in range(10, 35)]
+        # start 이상 end 미만, 세그먼트 경계를 넘는 구간
+        assert log.read_range(BASE_TS + 18, BASE_TS + 23) == [sample(i) for i in range(18, 23)]
+        assert log.read_range(BASE_TS + 18.5, BASE_TS + 20) == [sample(19)]
+        assert log.read_range(start=BASE_TS + 33) == [sample(33), sample(34)]
+        assert log.read_range(end=BASE_TS + 11) == [sample(10)]
+        assert log.read_range(BASE_TS + 100, BASE_TS + 200) == []
+        log.close()
+
+
+def test_reopen_appends_and_trims_partial_record():
+    with tempfile.TemporaryDirectory() as folder:
+        log = open_log(folder)
+        for i in range(5):
+            log.append(*sample(i))
+        log.close()
+
+        # 전원이 꺼져 마지막 레코드가 잘린 경우
+        path = log._segment_paths()[-1]
+        with open(path, 'ab') as f:
+            f.write(RECORD.pack(*sample(5))[:7])
+        assert (os.path.getsize(path) - HEADER.size) % RECORD.size != 0
+
+        log = open_log(folder)
+        assert (os.path.getsize(path) - HEADER.size) % RECORD.size == 0
+        # 시계가 뒤로 간 샘플은 버림
+        log.append(*sample(3))
+        for i in range(5, 12):
+            log.append(*sample(i))
+        log.close()
+        assert open_log(folder).read_range() == [sample(i) for i in range(12)]
+
+
+def test_bad_header_starts_new_segment():
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, 'temperature-00000004.log'), 'wb') as f:
+            f.write(b'not a log file at all')
+        log = open_log(folder)
+        log.append(*sample(0))
+        log.close()
+        assert os.path.basename(log._segment_paths()[-1]) == 'temperature-00000005.log'
+        assert log.read_range() == [sample(0)]
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")
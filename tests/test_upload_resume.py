@@ -0,0 +1,123 @@
+import os
+import sys
+import random
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octo_src.gcode.upload_ranges import ByteRanges
+from octo_src.gcode.gcode_manager import GCodeManager
+
+# 수신 구간 병합과, 끊긴 업로드를 기록(journal)에서 이어받는 과정 확인
+# 사용법: python tests/test_upload_resume.py
+
+CHUNK_SIZE = 64
+
+
+def test_byte_ranges():
+    ranges = ByteRanges()
+    ranges.add(10, 20)
+    ranges.add(30, 40)
+    ranges.add(20, 30)          # 양쪽과 맞닿음
+    assert ranges.to_list() == [[10, 40]]
+    ranges.add(0, 5)
+    ranges.add(50, 60)
+    ranges.add(3, 55)           # 여러 구간과 겹침
+    assert ranges.to_list() == [[0, 60]]
+    ranges.add(5, 5)            # 빈 구간은 무시
+    assert ranges.to_list() == [[0, 60]]
+    assert ranges.contiguous_end() == 60
+    assert ranges.covers(10, 60) and not ranges.covers(10, 61)
+    assert ByteRanges([[5, 10]]).contiguous_end() == 0
+    assert ByteRanges([[5, 10], [20, 30]]).missing(40) == [[0, 5], [10, 20], [30, 40]]
+    assert ByteRanges([[0, 40]]).missing(40) == []
+
+
+def test_byte_ranges_random():
+    rng = random.Random(1)
+    for _ in range(200):
+        size = rng.randint(1, 300)
+        ranges = ByteRanges()
+        received = set()
+        for _ in range(rng.randint(0, 30)):
+            start = rng.randrange(size)
+            end = rng.randint(start, size)
+            ranges.add(start, end)
+            received.update(range(start, end))
+        # 구간 목록은 정렬되어 있고 겹치거나 맞닿지 않아야 함
+        listed = ranges.to_list()
+        assert all(a[1] < b[0] for a, b in zip(listed, listed[1:])), listed
+        assert ranges.total() == len(received)
+        missing = {i for start, end in ranges.missing(size) for i in range(start, end)}
+        assert missing == set(range(size)) - received
+        contiguous = 0
+        while contiguous in received:
+            contiguous += 1
+        assert ranges.contiguous_end() == contiguous
+
+
+def _offsets(total_size):
+    return list(range(0, total_size, CHUNK_SIZE))
+
+
+def _write(manager, upload_id, data, offsets):
+    for offset in offsets:
+        assert manager.write_chunk(upload_id, offset, data[offset:offset + CHUNK_SIZE])
+
+
+def test_resume_after_suspend():
+    with tempfile.TemporaryDirectory() as folder:
+        upload_folder = os.path.join(folder, 'uploads')
+        state_folder = os.path.join(folder, 'state')
+        data = bytes(random.Random(2).getrandbits(8) for _ in range(CHUNK_SIZE * 20 + 17))
+        offsets = _offsets(len(data))
+        rng = random.Random(3)
+        first = rng.sample(offsets[:-1], 12)
+
+        manager = GCodeManager(upload_folder, state_folder=state_folder, analysis_workers=0)
+        upload_id = manager.init_upload('part.gcode', len(data), chunk_size=CHUNK_SIZE, window=4)
+        _write(manager, upload_id, data, first)
+        manager.suspend_upload(upload_id)
+        manager.close()
+
+        # 서비스가 다시 시작된 상황: 기록에서 받은 구간을 복원해야 함
+        manager = GCodeManager(upload_folder, state_folder=state_folder, analysis_workers=0)
+        assert manager.find_resumable('part.gcode', len(data))
+        upload_id = manager.init_upload('part.gcode', len(data), chunk_size=CHUNK_SIZE, window=4)
+        progress = manager.get_upload_progress(upload_id)
+        expected = ByteRanges([[offset, min(offset + CHUNK_SIZE, len(data))] for offset in first])
+        assert progress['missing'] == expected.missing(len(data)), progress['missing']
+        assert progress['received_size'] == expected.total()
+
+        # 빠진 구간만 보내면 자동으로 완료
+        rest = [offset for offset in offsets if offset not in first]
+        rng.shuffle(rest)
+        _write(manager, upload_id, data, rest)
+        assert manager.get_upload_progress(upload_id) is None
+        with open(os.path.join(upload_folder, 'part.gcode'), 'rb') as f:
+            assert f.read() == data
+        # 완료된 업로드의 기록은 남지 않음
+        assert not manager.find_resumable('part.gcode', len(data))
+        manager.close()
+
+
+def test_abort_discards_journal():
+    with tempfile.TemporaryDirectory() as folder:
+        manager = GCodeManager(os.path.join(folder, 'uploads'), state_folder=os.path.join(folder, 'state'),
+                               analysis_workers=0)
+        data = b'G1 X1\n' * 100
+        upload_id = manager.init_upload('b.gcode', len(data), chunk_size=CHUNK_SIZE)
+        _write(manager, upload_id, data, _offsets(len(data))[:3])
+        assert manager.abort_upload(upload_id)
+        assert not manager.find_resumable('b.gcode', len(data))
+        assert os.listdir(manager.journal.folder) == []
+        manager.close()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")